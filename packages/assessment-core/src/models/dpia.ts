@@ -53,6 +53,8 @@ export const Condition = t.intersection([
   }),
   t.partial({
     value: t.union([t.string, t.boolean, t.null]),
+    // Set by the build for 'contains' conditions: index of the selected option
+    option_index: t.number,
   }),
 ])
 
@@ -1,6 +1,7 @@
 import { type AnswerValue } from '../stores/answers'
 import { type FlatTask, type TaskStoreType } from '../stores/tasks'
 import { type AnswerStoreType } from '../stores/answers'
+import { type Condition } from '../models/dpia'
 
 export function normalizeValue(value: string): string | boolean | null {
   if (value.toLowerCase() === 'true') {
@@ -17,6 +18,20 @@ export function hasInstanceMapping(task: FlatTask): boolean {
   return task.dependencies?.some((dep) => dep.type === 'instance_mapping') || false
 }
 
+/**
+ * The option value selected by a 'contains' condition. The build resolves
+ * these conditions to the index of the option (option_index), so the answer is
+ * compared with the option value as shipped in the condition task. Conditions
+ * without an index fall back to their own value.
+ */
+export function containsConditionValue(condition: Condition, taskStore: TaskStoreType): Condition['value'] {
+  if (condition.option_index === undefined) {
+    return condition.value
+  }
+  const option = taskStore.taskById(condition.id).options?.[condition.option_index]
+  return option === undefined ? condition.value : option.value
+}
+
 export function shouldShowTask(
   taskId: string,
   instanceId: string,
@@ -66,10 +81,11 @@ export function shouldShowTask(
       } else if (operator === 'any') {
         conditionMet = true
       } else if (operator === 'contains') {
+        const optionValue = containsConditionValue(dependency.condition, taskStore)
         if (!Array.isArray(normalizedValue)) {
-          conditionMet = normalizedValue === value
+          conditionMet = normalizedValue === optionValue
         } else {
-          conditionMet = normalizedValue.includes(value as string)
+          conditionMet = normalizedValue.includes(optionValue as string)
         }
       } else {
         // Add more operators if needed.
@@ -1,6 +1,6 @@
 import { parseInstanceId, type TaskStoreType, type FlatTask } from '../stores/tasks'
 import type { AnswerStoreType, AnswerValue } from '../stores/answers'
-import { normalizeValue, shouldShowTask } from './dependency'
+import { containsConditionValue, normalizeValue, shouldShowTask } from './dependency'
 import { getPlainTextWithoutDefinitions } from './stripHtml'
 
 export type ImpactReason = 'sync_cascade' | 'conditional_hidden'
@@ -276,9 +276,10 @@ function wouldBeHiddenUnder(
     if (operator === 'equals') conditionMet = normalized === value
     else if (operator === 'any') conditionMet = true
     else if (operator === 'contains') {
+      const optionValue = containsConditionValue(dep.condition, taskStore)
       conditionMet = Array.isArray(normalized)
-        ? normalized.includes(value as string)
-        : normalized === value
+        ? normalized.includes(optionValue as string)
+        : normalized === optionValue
     }
 
     if (dep.action === 'show' && !conditionMet) return true
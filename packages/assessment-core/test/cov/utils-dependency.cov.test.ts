@@ -184,6 +184,36 @@ describe('shouldShowTask', () => {
     expect(shouldShowTask('1.1', '1.1', taskStore, answerStore)).toBe(false)
   })
 
+  it('compares "contains" with the option selected by option_index', () => {
+    taskStore.init([
+      {
+        task: 'Group',
+        id: '1',
+        type: ['task_group'],
+        tasks: [
+          {
+            task: 'Field A',
+            id: '1.1',
+            type: ['text'],
+            dependencies: [
+              { type: 'conditional', action: 'show', condition: { id: '1.2', operator: 'contains', value: 'Naam', option_index: 1 } },
+            ],
+          },
+          {
+            task: 'Field B',
+            id: '1.2',
+            type: ['checkbox_option'],
+            options: [{ value: 'Adres' }, { value: 'Naam <span>verrijkt</span>' }],
+          },
+        ],
+      },
+    ] as unknown as Task[])
+    answerStore.setAnswer('1.2', ['Naam <span>verrijkt</span>'])
+    expect(shouldShowTask('1.1', '1.1', taskStore, answerStore)).toBe(true)
+    answerStore.setAnswer('1.2', ['Naam'])
+    expect(shouldShowTask('1.1', '1.1', taskStore, answerStore)).toBe(false)
+  })
+
   it('throws on an unsupported operator', () => {
     initWith([{ type: 'conditional', action: 'show', condition: { id: '1.2', operator: 'greaterThan', value: '5' } }])
     answerStore.setAnswer('1.2', '6')
@@ -0,0 +1,203 @@
+"""On-disk caches for the assessment build pipeline.
+
+The enriched output of a top-level task (deel/page) only depends on the task
+itself, the compiled begrippenkader, the enrichment options and the enricher
+code. PageCache stores enriched pages under a hash of exactly those inputs, so
+a rebuild after editing one paragraph only re-enriches the page that changed.
+
+Cache entries are plain JSON files written atomically; an unreadable entry is
+treated as a miss and overwritten. Every document gets its own scope directory,
+and after a build the entries of that scope that the build did not use are
+pruned, so edited pages do not pile up.
+
+TermIndexCache stores compiled term indexes, keyed on the content hash of the
+begrippenkader file, so builds that share a begrippenkader skip parsing and
+compiling it.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import pickle
+import tempfile
+from pathlib import Path
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+
+def content_hash(*parts: Any) -> str:
+    """Return the SHA-256 hex digest of the JSON serialization of ``parts``.
+
+    Dict key order is kept (not sorted): it is part of the generated output.
+    """
+    payload = json.dumps(parts, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def write_atomic(path: Path, content: str | bytes) -> None:
+    """Write ``content`` to ``path`` via a temporary file and an atomic rename.
+
+    Readers never see a partially written file. The file keeps the
+    permissions of the file it replaces, or gets 0o644 if it is new.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        permissions = path.stat().st_mode & 0o777
+    except FileNotFoundError:
+        permissions = 0o644
+    mode = "wb" if isinstance(content, bytes) else "w"
+    encoding = None if isinstance(content, bytes) else "utf-8"
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, mode, encoding=encoding) as file:
+            file.write(content)
+        Path(tmp_name).chmod(permissions)
+        Path(tmp_name).replace(path)
+    except BaseException:
+        Path(tmp_name).unlink(missing_ok=True)
+        raise
+
+
+class PageCache:
+    """Persistent cache of enriched top-level tasks.
+
+    Every entry is keyed on the content hash of the task subtree combined with
+    the cache context: the term index fingerprint, the enrichment mode and the
+    enricher version. Changing any of those yields new keys, so stale entries
+    are never reused; prune removes them after a complete build.
+    """
+
+    def __init__(self, cache_dir: Path | str, *context: Any, scope: Any = None) -> None:
+        """
+        Args:
+            cache_dir: Root directory of the build cache
+            context: Everything besides the task itself that the enriched
+                output depends on
+            scope: Identifies the document (and options) the pages belong to.
+                Entries are stored in a directory per scope, so pruning after
+                a build of one document keeps the pages of the others.
+        """
+        self.directory = Path(cache_dir) / "pages"
+        if scope is not None:
+            self.directory /= content_hash(scope)[:16]
+        self.context = content_hash(*context)
+        self.reused = 0
+        self.recomputed = 0
+        self._used: set[Path] = set()
+
+    def key(self, task: dict[str, Any]) -> str:
+        """Return the cache key for a top-level task."""
+        return content_hash(self.context, task)
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.json"
+
+    def get(self, key: str) -> dict[str, Any] | None:
+        """Return the cached enriched task for ``key``, or None on a miss."""
+        path = self._path(key)
+        try:
+            with path.open(encoding="utf-8") as file:
+                task = json.load(file)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning("Ignoring unreadable cache entry %s: %s", path, e)
+            return None
+        self.reused += 1
+        self._used.add(path)
+        return task
+
+    def put(self, key: str, task: dict[str, Any]) -> None:
+        """Store an enriched task under ``key``."""
+        self.recomputed += 1
+        path = self._path(key)
+        write_atomic(path, json.dumps(task, ensure_ascii=False))
+        self._used.add(path)
+
+    def prune(self) -> int:
+        """Remove the entries of this scope not used since the cache was created.
+
+        Call after a complete build only: the pages of the document that were
+        not looked up are outdated. Returns the number of removed entries.
+        """
+        removed = 0
+        for path in self.directory.glob("*/*.json"):
+            if path not in self._used:
+                path.unlink(missing_ok=True)
+                removed += 1
+        return removed
+
+
+class TermIndexCache:
+    """Persistent cache of compiled term indexes.
+
+    Entries are keyed on the SHA-256 of the begrippenkader file together with
+    the cache context (enricher version and matching options). Every entry
+    starts with the digest of its payload, so a truncated or corrupt file is
+    detected and rebuilt. Storing an index removes the entries of earlier
+    versions of the same begrippenkader file with the same context; other
+    files and other contexts keep their entries.
+    """
+
+    def __init__(self, cache_dir: Path | str, *context: Any) -> None:
+        """
+        Args:
+            cache_dir: Root directory of the build cache
+            context: Everything besides the begrippenkader that the compiled
+                index depends on
+        """
+        self.directory = Path(cache_dir) / "term-index"
+        self.context = content_hash(*context)
+        self.reused = 0
+        self.rebuilt = 0
+
+    def key(self, source: Path | str, content: bytes) -> str:
+        """Return the cache key for a begrippenkader file and its content.
+
+        The key is ``<stem>-<source>-<content>``: ``<source>`` hashes the
+        resolved path and the context, and identifies the entries that a new
+        version of the file replaces.
+        """
+        source_hash = content_hash(str(Path(source).resolve()), self.context)[:16]
+        digest = content_hash(self.context, hashlib.sha256(content).hexdigest())
+        return f"{Path(source).stem}-{source_hash}-{digest}"
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.pickle"
+
+    def get(self, key: str) -> Any | None:
+        """Return the cached index for ``key``, or None on a miss."""
+        path = self._path(key)
+        try:
+            digest, _, payload = path.read_bytes().partition(b"\n")
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            logger.warning("Ignoring unreadable term index cache %s: %s", path, e)
+            return None
+        if hashlib.sha256(payload).hexdigest().encode() != digest:
+            logger.warning("Ignoring corrupt term index cache %s", path)
+            return None
+        try:
+            # The cache directory is written by this build only
+            index = pickle.loads(payload)  # noqa: S301
+        except Exception as e:
+            logger.warning("Ignoring stale term index cache %s: %s", path, e)
+            return None
+        self.reused += 1
+        return index
+
+    def put(self, key: str, index: Any) -> None:
+        """Store a compiled index under ``key`` and drop older entries of its source."""
+        self.rebuilt += 1
+        payload = pickle.dumps(index, protocol=pickle.HIGHEST_PROTOCOL)
+        path = self._path(key)
+        write_atomic(path, hashlib.sha256(payload).hexdigest().encode() + b"\n" + payload)
+        source = key.rsplit("-", 1)[0]
+        for old in self.directory.glob(f"{source}-*.pickle"):
+            if old != path and old.stem.rsplit("-", 1)[0] == source:
+                old.unlink(missing_ok=True)
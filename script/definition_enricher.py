@@ -5,8 +5,13 @@ Injects terms from the begrippenkader as HTML tags for definitions.
 
 Term matching priority:
 1. Main terms (longest first)
-2. Alternative spellings (longest first)
-3. Alternative terms (longest first)
+2. Plural forms (longest first)
+3. Alternative spellings (longest first)
+4. Alternative terms (longest first)
+
+All terms are found in a single scan of each text (an Aho-Corasick automaton),
+so enrichment time depends on the length of the text, not on the size of the
+begrippenkader.
 
 Matching is case-insensitive, but the original casing in the text is preserved.
 Terms already inside an existing ``<span class="aiv-definition">`` tag are skipped
@@ -14,19 +19,46 @@ to avoid nested definition spans.
 """
 
 import argparse
+import hashlib
 import html
 import json
 import logging
+import os
 import re
+import time
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from html.parser import HTMLParser
 from pathlib import Path
 
-import yaml
+from build_cache import PageCache, TermIndexCache, write_atomic
+from task_tree import TaskIndexVisitor, TaskVisitor, walk_document
 
 logger = logging.getLogger(__name__)
 
+# Identifies the enrichment code in cache keys: any change to this module
+# invalidates previously cached output.
+ENRICHER_VERSION = hashlib.sha256(Path(__file__).read_bytes()).hexdigest()[:16]
+
+# How matched terms end up in the output: "inline" embeds the full tooltip in
+# every definition span; "references" emits a compact span that refers to an
+# entry in the top-level "definitions" table of the document. The table is keyed
+# by definition, so all variants of a term share one entry; a span for a
+# variant names its variant type in data-variant.
+OUTPUT_MODES = ("inline", "references")
+
+DEFINITION_REFERENCE_PATTERN = re.compile(
+    r'<span class="aiv-definition" data-definition="([^"]*)"(?: data-variant="([^"]*)")?>'
+    r"([^<]*)</span>"
+)
+
 
 def load_yaml(file_path):
     """Load YAML file and return its content as a dictionary."""
+    # Imported here: callers that pass loaded documents never need PyYAML
+    import yaml
+
     try:
         with Path(file_path).open(encoding="utf-8") as file:
             return yaml.safe_load(file)
@@ -35,110 +67,943 @@ def load_yaml(file_path):
         raise
 
 
+@dataclass(frozen=True, slots=True)
+class Definition:
+    """One definition of the begrippenkader, shared by the term and all its variants."""
+
+    id: str
+    term: str
+    definition: str
+    toelichting: str
+    voorbeelden: list | str
+
+    @property
+    def key(self):
+        """Key of the definition in the "references" definitions table.
+
+        The id, or the lowercase term for begrippenkaders without ids.
+        """
+        return self.id or self.term.lower()
+
+
+# Tooltip note per variant type of a TermEntry
+_VARIANT_NOTES = {
+    "term": "alternatieve term",
+    "spelling": "alternatieve spelling",
+    "meervoud": "meervoudsvorm",
+}
+
+# Keys of a term map entry, as read by the enrichment code and templates
+TERM_FIELDS = (
+    "id",
+    "term",
+    "definition",
+    "toelichting",
+    "voorbeelden",
+    "is_alternatief_term",
+    "is_alternatief_spelling",
+    "is_meervoudsvorm",
+    "hoofdterm",
+    "alt_type",
+)
+
+
+@dataclass(frozen=True, slots=True)
+class TermEntry:
+    """A surface form in the term map: a hoofdterm or one of its variants.
+
+    Only the surface form and the variant type ("" for the hoofdterm,
+    "meervoud", "spelling" or "term") are stored; everything else is read
+    through the shared Definition. Entries can be read like the dicts the
+    term map used to hold, e.g. ``entry["definition"]`` or
+    ``entry.get("hoofdterm")``.
+    """
+
+    term: str
+    record: Definition
+    alt_type: str = ""
+
+    @classmethod
+    def from_dict(cls, term_data):
+        """Build an entry from a term map dict in the format of TERM_FIELDS."""
+        if isinstance(term_data, cls):
+            return term_data
+        alt_type = term_data.get("alt_type", "")
+        record = Definition(
+            id=term_data.get("id", ""),
+            term=(term_data.get("hoofdterm") if alt_type else None) or term_data.get("term", ""),
+            definition=term_data.get("definition", ""),
+            toelichting=term_data.get("toelichting", ""),
+            voorbeelden=term_data.get("voorbeelden", []),
+        )
+        return cls(term_data.get("term", ""), record, alt_type)
+
+    @property
+    def id(self):
+        return "" if self.alt_type else self.record.id
+
+    @property
+    def definition(self):
+        return self.record.definition
+
+    @property
+    def toelichting(self):
+        return self.record.toelichting
+
+    @property
+    def voorbeelden(self):
+        return self.record.voorbeelden
+
+    @property
+    def is_alternatief_term(self):
+        return self.alt_type == "term"
+
+    @property
+    def is_alternatief_spelling(self):
+        return self.alt_type == "spelling"
+
+    @property
+    def is_meervoudsvorm(self):
+        return self.alt_type == "meervoud"
+
+    @property
+    def hoofdterm(self):
+        return self.record.term if self.alt_type else None
+
+    def __getitem__(self, key):
+        if key not in TERM_FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __contains__(self, key):
+        return key in TERM_FIELDS
+
+    def get(self, key, default=None):
+        return getattr(self, key) if key in TERM_FIELDS else default
+
+    def keys(self):
+        return TERM_FIELDS
+
+
+def _as_list(value):
+    """Return a metadata list field as a list; a single string becomes a one-item list."""
+    if value is None:
+        return []
+    if isinstance(value, str):
+        return [value]
+    return value
+
+
 def create_term_map(begrippenkader):
-    """Create a map of terms to their definitions and metadata."""
+    """Create a map of lowercase surface forms to their TermEntry.
+
+    Every definition is stored once; its meervoudsvormen, alternatieve
+    spellingen and alternatieve termen are entries that refer to it.
+    """
     term_map = {}
 
-    # First pass: process all main terms
     for definition in begrippenkader.get("definitions", []):
-        term_id = definition.get("id", "")
-        term = definition.get("term", "")
-        definition_text = definition.get("definition", "")
         metadata = definition.get("metadata", {}) or {}  # Ensure metadata is a dict
+        voorbeelden = metadata.get("voorbeelden", [])
+        record = Definition(
+            id=definition.get("id", ""),
+            term=definition.get("term", ""),  # Keep original capitalization for display
+            definition=definition.get("definition", ""),
+            toelichting=metadata.get("toelichting", ""),
+            # Voorbeelden can be a string or a list
+            voorbeelden=[] if voorbeelden is None else voorbeelden,
+        )
+        term_map[record.term.lower()] = TermEntry(record.term, record)
+
+        # Plural forms and alternative spellings refer to the main term
+        for alt_type, variants in (
+            ("meervoud", metadata.get("meervoudsvormen", [])),
+            ("spelling", metadata.get("alternatieve_spellingen", [])),
+        ):
+            for variant in _as_list(variants):
+                if variant and isinstance(variant, str):
+                    term_map[variant.lower()] = TermEntry(variant, record, alt_type)
+
+    # Alternative terms refer to the definition of their preferred term
+    for item in begrippenkader.get("alternative_terms", {}):
+        voorkeur_id = item["voorkeur_id"]
+        # Check if main term exists in our map - use lowercase for lookup
+        if isinstance(voorkeur_id, str) and voorkeur_id.lower() in term_map:
+            main_term = term_map[voorkeur_id.lower()]
+            term_map[item["term"].lower()] = TermEntry(item["term"], main_term.record, "term")
+    return term_map
 
-        toelichting = metadata.get("toelichting", "")
 
-        # Handle voorbeelden which could be a string or a list
-        voorbeelden = metadata.get("voorbeelden", [])
-        if voorbeelden is None:
-            voorbeelden = []
-
-        # Check for alternative spellings in metadata
-        alt_spellingen = metadata.get("alternatieve_spellingen", [])
-        if alt_spellingen is None:
-            alt_spellingen = []
-        if isinstance(alt_spellingen, str):
-            alt_spellingen = [alt_spellingen]
-
-        # Get plural forms (meervoudsvormen) - NEW CODE
-        meervoudsvormen = metadata.get("meervoudsvormen", [])
-        if meervoudsvormen is None:
-            meervoudsvormen = []
-        if isinstance(meervoudsvormen, str):
-            meervoudsvormen = [meervoudsvormen]
-
-        # Store main term information - use lowercase for keys
-        term_info = {
-            "id": term_id,
-            "term": term,  # Keep original capitalization for display
-            "definition": definition_text,
-            "toelichting": toelichting,
-            "voorbeelden": voorbeelden,
-            "is_alternatief_term": False,
-            "is_alternatief_spelling": False,
-            "is_meervoudsvorm": False,  # NEW CODE
-            "hoofdterm": None,
-            "alt_type": "",
-        }
+class _TextNodeParser(HTMLParser):
+    """Collects the offsets of the text nodes of a field that may be enriched.
 
-        term_map[term.lower()] = term_info
-
-        # Store plural forms with reference to main term - NEW CODE
-        for meervoud in meervoudsvormen:
-            if meervoud and isinstance(meervoud, str):
-                term_map[meervoud.lower()] = {
-                    "term": meervoud,  # Keep original capitalization for display
-                    "definition": definition_text,
-                    "toelichting": toelichting,
-                    "voorbeelden": voorbeelden,
-                    "is_alternatief_term": False,
-                    "is_alternatief_spelling": False,
-                    "is_meervoudsvorm": True,  # This is a plural form
-                    "hoofdterm": term,
-                    "alt_type": "meervoud",
-                }
+    Markup (tags with their attributes, comments, character references) is
+    never enriched, and neither is anything inside an existing
+    ``<span class="aiv-definition">`` or a script/style element.
+    """
+
+    def __init__(self, text):
+        super().__init__(convert_charrefs=False)
+        self.text_nodes = []
+        self._line_starts = [0]
+        self._line_starts.extend(i + 1 for i, char in enumerate(text) if char == "\n")
+        # Open <span> elements inside an existing definition span
+        self._definition_depth = 0
+        self._raw_text_tag = None
+
+    def _offset(self):
+        lineno, column = self.getpos()
+        return self._line_starts[lineno - 1] + column
+
+    def handle_starttag(self, tag, attrs):
+        if self._definition_depth:
+            self._definition_depth += tag == "span"
+        elif tag == "span" and ("class", "aiv-definition") in attrs:
+            self._definition_depth = 1
+        elif tag in ("script", "style"):
+            self._raw_text_tag = tag
+
+    def handle_startendtag(self, tag, attrs):
+        # Self-closing tags (e.g. <br/>) never open an element
+        pass
+
+    def handle_endtag(self, tag):
+        if self._definition_depth:
+            self._definition_depth -= tag == "span"
+        elif tag == self._raw_text_tag:
+            self._raw_text_tag = None
+
+    def handle_data(self, data):
+        if self._definition_depth or self._raw_text_tag:
+            return
+        start = self._offset()
+        end = start + len(data)
+        # The parser may split one text node into several chunks
+        if self.text_nodes and self.text_nodes[-1][1] == start:
+            start = self.text_nodes.pop()[0]
+        self.text_nodes.append((start, end))
+
+
+def segment_text_nodes(text):
+    """Split ``text`` once into markup and text nodes.
+
+    Returns:
+        List of ``(start, end)`` offsets of the text nodes that may be enriched,
+        in document order.
+    """
+    if "<" not in text and "&" not in text:
+        return [(0, len(text))]
+    parser = _TextNodeParser(text)
+    parser.feed(text)
+    parser.close()
+    return parser.text_nodes
+
+
+def categorize_terms(term_map):
+    """Split the term keys of a map of TermEntry into their matching categories.
+
+    Returns a dict with the hoofdtermen, meervoudsvormen, alternatieve
+    spellingen and alternatieve termen, each sorted longest first.
+    """
+    hoofdtermen = []
+    meervoudsvormen = []
+    alt_spellingen = []
+    alt_termen = []
+
+    categories = {
+        "": hoofdtermen,
+        "meervoud": meervoudsvormen,
+        "spelling": alt_spellingen,
+        "term": alt_termen,
+    }
+    for term_key, entry in term_map.items():
+        # Term keys are already lowercase from create_term_map
+        categories[entry.alt_type].append(term_key)
+
+    return {
+        "hoofdtermen": sorted(hoofdtermen, key=len, reverse=True),
+        "meervoudsvormen": sorted(meervoudsvormen, key=len, reverse=True),
+        "alternatieve_spellingen": sorted(alt_spellingen, key=len, reverse=True),
+        "alternatieve_termen": sorted(alt_termen, key=len, reverse=True),
+    }
+
+
+def _is_word_char(char):
+    return char.isalnum() or char == "_"
+
+
+def _is_word_boundary(text, pos):
+    """Equivalent of the regex ``\\b`` assertion at ``pos`` in ``text``."""
+    before = pos > 0 and _is_word_char(text[pos - 1])
+    after = pos < len(text) and _is_word_char(text[pos])
+    return before != after
+
+
+def _fold_case(text):
+    """Lowercase ``text`` without changing its length, so offsets stay valid."""
+    folded = text.lower()
+    if len(folded) == len(text):
+        return folded
+    # A few characters (e.g. "İ") expand when lowercased; keep those as-is.
+    return "".join(c.lower() if len(c.lower()) == 1 else c for c in text)
+
+
+_VOWELS = "aeiouy"
+# Diminutive endings ("-je", "-tje", "-pje", "-etje"), each with its plural "-s"
+_DIMINUTIVE_SUFFIXES = ("je", "jes", "tje", "tjes", "pje", "pjes", "etje", "etjes")
+# All-uppercase terms (acronyms) only take a plural "-s", e.g. "DPIA's"
+_ACRONYM_SUFFIXES = ("'s", "\u2019s", "s")
+
+
+def dutch_inflections(term):
+    """Return the regular Dutch plural and diminutive forms of a lowercase term.
+
+    Only the end of the term (its last word) is inflected. The rules are
+    generous on purpose: a derived form that is not a Dutch word never occurs
+    in a text. Stem changes, vowel reduction ("systeem" -> "systemen") and
+    voicing ("bewijs" -> "bewijzen"), get their own stem that only takes "-en".
+
+    Returns:
+        List of ``(stem, suffixes)`` tuples, starting with the term itself.
+        Only the first stem also matches without a suffix.
+    """
+    last = term[-1:]
+    if not last.isalpha():
+        return [(term, ())]
+
+    suffixes = []
+    if last == "e":
+        suffixes += ["s", "n"]
+    elif last in _VOWELS:
+        suffixes += ["'s", "\u2019s"]
+    else:
+        suffixes.append("en")
+        if term.endswith(("el", "em", "en", "er", "aar", "eur", "ier")):
+            suffixes.append("s")
+        # Consonant doubling after a short vowel: "bak" -> "bakken"
+        if term[-2:-1] in _VOWELS and term[-3:-2] not in _VOWELS and last not in "wj":
+            suffixes.append(last + "en")
+    suffixes += _DIMINUTIVE_SUFFIXES
+    stems = [(term, tuple(sorted(suffixes, key=len, reverse=True)))]
+
+    if last not in _VOWELS and term[-2:-1] in _VOWELS + "j":
+        voiced = {"s": "z", "f": "v"}.get(last, last)
+        if term[-3:-2] == term[-2] and term[-2] != "j":
+            stems.append((term[:-2] + voiced, ("en",)))
+        elif voiced != last:
+            stems.append((term[:-1] + voiced, ("en",)))
+    return stems
+
+
+class TermMatcher:
+    """Aho-Corasick automaton over every term of a term map.
+
+    A text is scanned once for all terms together, so the cost depends on the
+    length of the text and the number of hits, not on the size of the
+    begrippenkader. Hits follow the same rules as a per-term
+    ``re.finditer(r"\\b<term>\\b", text, re.IGNORECASE)``: word boundaries on
+    both sides, case-insensitive except for all-uppercase terms (e.g. "DAT"),
+    and non-overlapping occurrences per term.
+
+    With ``inflections`` enabled, hoofdtermen also match their regular Dutch
+    plural and diminutive forms (see dutch_inflections) without listing them
+    in the begrippenkader. A form that is a term itself (e.g. an explicit
+    meervoudsvorm) is never matched as an inflection, so explicit entries
+    keep their own definition.
+    """
+
+    def __init__(self, term_map, terms, inflections=False):
+        """
+        Args:
+            term_map: Dictionary mapping lowercase terms to their definitions.
+            terms: The keys of ``term_map`` in matching priority order.
+            inflections: Also match regular inflections of the hoofdtermen.
+        """
+        self.terms = terms
+        # Pattern id -> (rank, length, suffixes, matches without suffix); a
+        # term has one pattern per stem.
+        self._patterns = []
+        # Rank -> original spelling for all-uppercase terms that must match exactly.
+        self._exact = {}
+        # Folded terms that inflection must not produce
+        self._explicit = {_fold_case(term_key) for term_key in term_map} if inflections else ()
+
+        goto = [{}]
+        outputs = [[]]
+        for rank, term_key in enumerate(self.terms):
+            entry = term_map[term_key]
+            original_term = entry.term or term_key
+            if len(original_term) > 1 and original_term.isupper():
+                self._exact[rank] = original_term
+                keyword = _fold_case(original_term)
+                stems = [(keyword, _ACRONYM_SUFFIXES)]
+            else:
+                keyword = _fold_case(term_key)
+                stems = dutch_inflections(keyword)
+            if not inflections or entry.alt_type:
+                stems = [(keyword, ())]
+
+            for stem, suffixes in stems:
+                if not stem:
+                    continue
+                state = 0
+                for char in stem:
+                    next_state = goto[state].get(char)
+                    if next_state is None:
+                        next_state = len(goto)
+                        goto[state][char] = next_state
+                        goto.append({})
+                        outputs.append([])
+                    state = next_state
+                outputs[state].append(len(self._patterns))
+                self._patterns.append((rank, len(stem), suffixes, stem == keyword))
+
+        # Breadth-first construction of the failure links; each state also
+        # inherits the outputs of the longest proper suffix that is a state.
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in goto[state].items():
+                queue.append(next_state)
+                fallback = fail[state]
+                while fallback and char not in goto[fallback]:
+                    fallback = fail[fallback]
+                fail[next_state] = goto[fallback].get(char, 0)
+                outputs[next_state] = outputs[next_state] + outputs[fail[next_state]]
+
+        self._goto = goto
+        self._fail = fail
+        self._outputs = outputs
+
+    def find_all(self, text, text_nodes=None):
+        """Scan ``text`` once and return the occurrences of every term.
+
+        Args:
+            text: The text to scan.
+            text_nodes: Optional ``(start, end)`` ranges to scan, in order; a
+                match never spans two ranges. Defaults to the whole text.
+
+        Returns:
+            List of ``(term_key, [(start, end), ...])`` tuples in matching
+            priority order, containing only terms that occur in the text.
+        """
+        goto = self._goto
+        fail = self._fail
+        outputs = self._outputs
+
+        if text_nodes is None:
+            text_nodes = [(0, len(text))]
+
+        folded = _fold_case(text)
+        hits = {}
+        for node_start, node_end in text_nodes:
+            state = 0
+            for end in range(node_start + 1, node_end + 1):
+                char = folded[end - 1]
+                while state and char not in goto[state]:
+                    state = fail[state]
+                state = goto[state].get(char, 0)
+                for pattern_id in outputs[state]:
+                    hits.setdefault(pattern_id, []).append(end)
+
+        candidates = {}
+        for pattern_id, ends in hits.items():
+            rank, length, suffixes, bare = self._patterns[pattern_id]
+            matches = candidates.setdefault(rank, [])
+            if matches:
+                # A second stem of the same term: keep the matches in text order
+                matches.extend((end - length, end, suffixes, bare) for end in ends)
+                matches.sort()
+            else:
+                matches.extend((end - length, end, suffixes, bare) for end in ends)
+
+        found = []
+        for rank in sorted(candidates):
+            exact = self._exact.get(rank)
+            occurrences = []
+            last_end = 0
+            # Like re.finditer, an occurrence starting inside the previous one
+            # is not reported.
+            for start, end, suffixes, bare in candidates[rank]:
+                if start < last_end:
+                    continue
+                if not _is_word_boundary(text, start):
+                    continue
+                if exact is not None and text[start:end] != exact:
+                    continue
+                inflected_end = None
+                if suffixes:
+                    inflected_end = self._inflected_end(text, folded, start, end, suffixes)
+                if inflected_end is not None:
+                    end = inflected_end
+                elif not (bare and _is_word_boundary(text, end)):
+                    continue
+                occurrences.append((start, end))
+                last_end = end
+            if occurrences:
+                found.append((self.terms[rank], occurrences))
+        return found
+
+    def _inflected_end(self, text, folded, start, end, suffixes):
+        """Return the end of the inflected form at ``start``, or None if there is none."""
+        for suffix in suffixes:
+            suffix_end = end + len(suffix)
+            if (
+                folded.startswith(suffix, end)
+                and _is_word_boundary(text, suffix_end)
+                and folded[start:suffix_end] not in self._explicit
+            ):
+                return suffix_end
+        return None
+
+
+class TermIndex:
+    """Compiled term map, built once per begrippenkader.
+
+    Holds the term keys per matching category (longest first), the matching
+    automaton and a casefolded lookup table, so enriching a text never has to
+    re-sort the term map or compile patterns.
+    """
+
+    def __init__(self, term_map, inflections=False):
+        """
+        Args:
+            term_map: Dictionary mapping lowercase terms to their TermEntry, as
+                returned by create_term_map. Plain dicts in the format of
+                TERM_FIELDS are converted.
+            inflections: Also match the regular Dutch plural and diminutive
+                forms of the hoofdtermen, see TermMatcher.
+        """
+        if not all(isinstance(entry, TermEntry) for entry in term_map.values()):
+            term_map = {key: TermEntry.from_dict(entry) for key, entry in term_map.items()}
+        self.term_map = term_map
+        self.inflections = inflections
+        self.categories = categorize_terms(term_map)
+        self.terms = [key for keys in self.categories.values() for key in keys]
+        self.matcher = TermMatcher(term_map, self.terms, inflections)
+        # Content hash of the term map (in priority-relevant order) and the
+        # matching options, used to key memoized enrichment results.
+        self.fingerprint = hashlib.sha256(
+            json.dumps(
+                [[(key, dict(entry)) for key, entry in term_map.items()], inflections],
+                sort_keys=True,
+                ensure_ascii=False,
+            ).encode()
+        ).hexdigest()
+
+        self._lookup = {}
+        for term_key in term_map:
+            self._lookup.setdefault(term_key.casefold(), term_key)
+        # Definitions by key, for the "references" definitions table
+        self.definitions = {}
+        for entry in term_map.values():
+            self.definitions.setdefault(entry.record.key, entry.record)
+        # Rendered tooltip bodies per (term key, variant type)
+        self._tooltips = {}
+        # Rendered definition texts (without variant note) per definition key
+        self._definition_texts = {}
+
+    @classmethod
+    def from_begrippenkader(cls, begrippenkader, inflections=False):
+        """Build the index straight from a parsed begrippenkader."""
+        return cls(create_term_map(begrippenkader), inflections)
+
+    def __len__(self):
+        return len(self.term_map)
+
+    def regular_variants(self):
+        """Return the explicit meervoudsvormen that dutch_inflections derives as well.
+
+        Those entries only add the "meervoudsvorm" note to the tooltip once
+        inflection matching is enabled, and could be dropped from the
+        begrippenkader.
+        """
+        regular = []
+        for term_key in self.categories["meervoudsvormen"]:
+            hoofdterm = self.term_map[term_key].hoofdterm
+            for stem, suffixes in dutch_inflections(_fold_case(hoofdterm)):
+                form = _fold_case(term_key)
+                if form.startswith(stem) and form[len(stem) :] in suffixes:
+                    regular.append(term_key)
+                    break
+        return regular
+
+    def lookup(self, text):
+        """Return the term data for ``text`` regardless of its casing, or None."""
+        term_key = self._lookup.get(text.casefold())
+        return None if term_key is None else self.term_map[term_key]
+
+    def tooltip_text(self, term_key):
+        """Return the rendered tooltip text of a term, rendered once per term variant."""
+        entry = self.term_map[term_key]
+        cache_key = (term_key, entry.alt_type)
+        tooltip_text = self._tooltips.get(cache_key)
+        if tooltip_text is None:
+            tooltip_text = self._tooltips[cache_key] = render_tooltip_text(entry)
+        return tooltip_text
+
+    def definition_text(self, definition_key):
+        """Return the rendered text of a definition without a variant note."""
+        text = self._definition_texts.get(definition_key)
+        if text is None:
+            text = self._definition_texts[definition_key] = render_definition_text(
+                self.definitions[definition_key]
+            )
+        return text
+
+    def tooltip(self, matched_text, output_mode="inline", term_key=None):
+        """Return the definition span for ``matched_text``, or None if it is no term.
+
+        Only the matched text is escaped per call; the tooltip text is rendered
+        once per term variant and reused. In "references" output mode the span
+        only refers to the definition (and the variant type), see OUTPUT_MODES.
+        Pass ``term_key`` when the matched text is an inflected form of the term.
+        """
+        if term_key is None:
+            term_key = self._lookup.get(matched_text.casefold())
+        if term_key is None:
+            return None
+        if output_mode == "references":
+            entry = self.term_map[term_key]
+            variant = f' data-variant="{entry.alt_type}"' if entry.alt_type else ""
+            return (
+                f'<span class="aiv-definition" data-definition="{html.escape(entry.record.key)}"'
+                f"{variant}>{html.escape(matched_text)}</span>"
+            )
+        return (
+            f'<span class="aiv-definition">{html.escape(matched_text)}'
+            f'<span class="aiv-definition-text">{self.tooltip_text(term_key)}</span></span>'
+        )
+
+    def find_all(self, text, text_nodes=None):
+        """Return the occurrences of every term in ``text``, see TermMatcher.find_all."""
+        return self.matcher.find_all(text, text_nodes)
+
+
+def as_term_index(terms):
+    """Return ``terms`` as a TermIndex, compiling it if a plain term map is given."""
+    if isinstance(terms, TermIndex):
+        return terms
+    return TermIndex(terms)
 
-        # Store alternative spellings with reference to main term - use lowercase for keys
-        for alt_spelling in alt_spellingen:
-            if alt_spelling and isinstance(alt_spelling, str):
-                term_map[alt_spelling.lower()] = {
-                    "term": alt_spelling,  # Keep original capitalization for display
-                    "definition": definition_text,
-                    "toelichting": toelichting,
-                    "voorbeelden": voorbeelden,
-                    "is_alternatief_term": False,
-                    "is_alternatief_spelling": True,
-                    "is_meervoudsvorm": False,
-                    "hoofdterm": term,
-                    "alt_type": "spelling",
+
+class EnrichmentMemo:
+    """Bounded LRU memo of enriched texts, shared by all fields of a build.
+
+    Entries are keyed on ``(text, mode, term index fingerprint)``. In
+    once-per-page mode the result also depends on which terms were already
+    matched on the page, so every entry remembers the terms occurring in its
+    text and stores one result per subset of those already matched.
+    """
+
+    def __init__(self, maxsize=4096):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    @staticmethod
+    def page_state(terms, already_matched_terms):
+        """The part of the page state that influences enriching a text."""
+        if already_matched_terms is None:
+            return None
+        return frozenset(terms.intersection(already_matched_terms))
+
+    def get(self, key, already_matched_terms=None):
+        """Return the memoized ``(result, matched_terms)`` for ``key``, or None."""
+        entry = self._entries.get(key)
+        if entry is not None:
+            terms, results = entry
+            cached = results.get(self.page_state(terms, already_matched_terms))
+            if cached is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return cached
+        self.misses += 1
+        return None
+
+    def put(self, key, terms, page_state, result, matched_terms):
+        """Memoize the result of enriching a text whose occurring terms are ``terms``."""
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = self._entries[key] = (terms, {})
+        entry[1][page_state] = (result, matched_terms)
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def stats(self):
+        """Return the hit and miss counters as a dict."""
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
+
+
+class TermProfiler:
+    """Per-term match statistics of a build, to find hot-spot terms.
+
+    For every term key it counts the candidate matches found in the texts and
+    their outcome: accepted, or rejected because the occurrence overlaps a
+    higher priority match, the term was already enriched on the page, the
+    term was already enriched earlier in the same field, or the tooltip budget
+    was exhausted. The matching time of a field is not separable per term
+    (all terms are found in one scan), so it is attributed to the terms found
+    in the field per candidate match.
+    """
+
+    OUTCOMES = ("accepted", "overlap", "once_per_page", "repeat_in_field", "budget")
+
+    def __init__(self):
+        self.fields = 0
+        self.seconds = 0.0
+        # Term key -> {"attempted": n, <outcome>: n, "seconds": s}
+        self.terms = {}
+
+    def _stats(self, term):
+        stats = self.terms.get(term)
+        if stats is None:
+            stats = self.terms[term] = dict.fromkeys(("attempted", *self.OUTCOMES), 0)
+            stats["seconds"] = 0.0
+        return stats
+
+    def record(self, found, matches, selected, already_matched_terms, seconds):
+        """Record the outcome of enriching one field.
+
+        Args:
+            found: The occurrences per term, as returned by TermIndex.find_all
+            matches: The resolved ``(start, end, term_key)`` matches
+            selected: The matches left after the tooltip budget
+            already_matched_terms: The terms enriched earlier on the page
+                (before this field), or None
+            seconds: Time spent matching and resolving the field
+        """
+        self.fields += 1
+        self.seconds += seconds
+        candidates = sum(len(occurrences) for _, occurrences in found)
+        chosen = {term: (start, end) for start, end, term in matches}
+        kept = {term for _, _, term in selected}
+        for term, occurrences in found:
+            stats = self._stats(term)
+            stats["attempted"] += len(occurrences)
+            stats["seconds"] += seconds * len(occurrences) / candidates
+            if already_matched_terms is not None and term in already_matched_terms:
+                stats["once_per_page"] += len(occurrences)
+                continue
+            if term not in chosen:
+                stats["overlap"] += len(occurrences)
+                continue
+            position = occurrences.index(chosen[term])
+            stats["overlap"] += position
+            stats["repeat_in_field"] += len(occurrences) - position - 1
+            stats["accepted" if term in kept else "budget"] += 1
+
+    def merge(self, other):
+        """Add the statistics of another profiler (e.g. from a worker process)."""
+        self.fields += other.fields
+        self.seconds += other.seconds
+        for term, other_stats in other.terms.items():
+            stats = self._stats(term)
+            for name, value in other_stats.items():
+                stats[name] += value
+
+    def report(self, term_index=None):
+        """Return the statistics as a dict, hottest terms first.
+
+        With a term index, the terms that never matched are listed as well.
+        """
+        terms = sorted(
+            self.terms.items(), key=lambda item: (-item[1]["seconds"], -item[1]["attempted"])
+        )
+        report = {
+            "fields": self.fields,
+            "seconds": round(self.seconds, 6),
+            "terms": [
+                {
+                    "term": term,
+                    "attempted": stats["attempted"],
+                    "accepted": stats["accepted"],
+                    "rejected": {name: stats[name] for name in self.OUTCOMES[1:]},
+                    "seconds": round(stats["seconds"], 6),
                 }
+                for term, stats in terms
+            ],
+        }
+        if term_index is not None:
+            report["never_matched"] = sorted(set(term_index.term_map) - set(self.terms))
+        return report
+
+    @staticmethod
+    def format_report(report):
+        """Render a report from TermProfiler.report as a plain text table."""
+        header = ("term", "attempted", "accepted", *TermProfiler.OUTCOMES[1:], "ms")
+        rows = [
+            (
+                entry["term"],
+                entry["attempted"],
+                entry["accepted"],
+                *entry["rejected"].values(),
+                f"{entry['seconds'] * 1000:.2f}",
+            )
+            for entry in report["terms"]
+        ]
+        width = max([len(header[0])] + [len(row[0]) for row in rows])
+        lines = [
+            f"{report['fields']} fields, {report['seconds'] * 1000:.1f} ms matching",
+            "",
+            f"{header[0]:<{width}}  " + "  ".join(f"{name:>15}" for name in header[1:]),
+        ]
+        lines.extend(
+            f"{row[0]:<{width}}  " + "  ".join(f"{value:>15}" for value in row[1:]) for row in rows
+        )
+        never_matched = report.get("never_matched")
+        if never_matched:
+            lines += ["", f"Never matched ({len(never_matched)}):"]
+            lines.extend(f"  {term}" for term in never_matched)
+        return "\n".join(lines) + "\n"
 
-    # Check for alternative terms section
-    alt_terms = begrippenkader.get("alternative_terms", {})
 
-    # Process alternative terms
-    for item in alt_terms:
-        term = item["term"]
-        voorkeur_id = item["voorkeur_id"]
-        # Check if main term exists in our map - use lowercase for lookup
-        if isinstance(voorkeur_id, str) and voorkeur_id.lower() in term_map:
-            main_term_info = term_map[voorkeur_id.lower()]
-            term_map[term.lower()] = {
-                "id": "",
-                "term": term,  # Keep original capitalization for display
-                "definition": main_term_info["definition"],
-                "toelichting": main_term_info["toelichting"],
-                "voorbeelden": main_term_info["voorbeelden"],
-                "is_alternatief_term": True,
-                "is_alternatief_spelling": False,
-                "is_meervoudsvorm": False,
-                "hoofdterm": main_term_info["term"],
-                "alt_type": "term",
-            }
-    return term_map
+class TooltipBudget:
+    """Limits on the number of tooltips per field, per page and per term per page.
 
+    One budget is shared by all fields of a build; process_tasks starts a new
+    page at every top-level task. Matches beyond a limit are not enriched and
+    are counted in ``suppressed``. A suppressed match still hides the lower
+    priority terms inside it (e.g. "gegeven" in "persoonsgegeven").
 
-def inject_terms(text, term_map, already_matched_terms=None):
+    Once the page budget is exhausted, the remaining fields of the page are
+    not matched at all; they are counted in ``skipped_fields``.
+    """
+
+    def __init__(self, per_field=None, per_page=None, per_term_per_page=None):
+        """
+        Args:
+            per_field: Maximum number of tooltips in one field
+            per_page: Maximum number of tooltips on one page (top-level task)
+            per_term_per_page: Maximum number of tooltips of one term on a page
+        """
+        self.per_field = per_field
+        self.per_page = per_page
+        self.per_term_per_page = per_term_per_page
+        self.suppressed = 0
+        self.skipped_fields = 0
+        self.start_page()
+
+    def limits(self):
+        """Return the limits as a dict, e.g. to rebuild the budget in a worker."""
+        return {
+            "per_field": self.per_field,
+            "per_page": self.per_page,
+            "per_term_per_page": self.per_term_per_page,
+        }
+
+    def start_page(self):
+        """Reset the page and per-term counters at the start of a page."""
+        self._page_count = 0
+        self._term_counts = {}
+
+    def exhausted(self):
+        """Whether no tooltip fits on the current page anymore."""
+        return self.per_page is not None and self._page_count >= self.per_page
+
+    def select(self, matches):
+        """Return the ``(start, end, term_key)`` matches that fit in the budget.
+
+        Matches are taken in text order. Once the field or page budget is
+        exhausted the remaining matches are suppressed without looking at them.
+        """
+        selected = []
+        for position, match in enumerate(sorted(matches)):
+            if self.exhausted() or (self.per_field is not None and len(selected) >= self.per_field):
+                self.suppressed += len(matches) - position
+                break
+            term = match[2]
+            count = self._term_counts.get(term, 0)
+            if self.per_term_per_page is not None and count >= self.per_term_per_page:
+                self.suppressed += 1
+                continue
+            self._term_counts[term] = count + 1
+            self._page_count += 1
+            selected.append(match)
+        return selected
+
+
+class ProtectedRanges:
+    """Sorted, non-overlapping ``[start, end)`` ranges of a text that may not be enriched.
+
+    Overlap checks and insertions are binary searches over the range
+    boundaries, so protecting a match never requires rescanning the text.
+    """
+
+    def __init__(self):
+        self._starts = []
+        self._ends = []
+
+    def add(self, start, end):
+        """Protect ``[start, end)``, merging it with ranges it touches."""
+        first = bisect_left(self._ends, start)
+        last = bisect_right(self._starts, end)
+        if first < last:
+            start = min(start, self._starts[first])
+            end = max(end, self._ends[last - 1])
+        self._starts[first:last] = [start]
+        self._ends[first:last] = [end]
+
+    def overlaps(self, start, end):
+        """Return True if any position in ``[start, end)`` is protected."""
+        index = bisect_right(self._ends, start)
+        return index < len(self._starts) and self._starts[index] < end
+
+
+def render_tooltip_text(entry):
+    """Render the tooltip text of a TermEntry: its definition, details and variant note.
+
+    The result only depends on the entry, so it can be reused for every
+    occurrence of the term.
+    """
+    return render_definition_text(entry) + render_variant_note(entry.alt_type, entry.hoofdterm)
+
+
+def render_definition_text(entry):
+    """Render the definition, toelichting and voorbeelden of a TermEntry or Definition."""
+    # Begrippenkader content is (partly) synced from external
+    # sources and must not be trusted as HTML: escape every text
+    # field before interpolating it into the tooltip markup.
+    term_html = html.escape(entry.definition)
+
+    # Add toelichting if available
+    toelichting = html.escape(entry.toelichting)
+    if toelichting:
+        term_html += f"\n<br><strong>Toelichting</strong>: {toelichting}"
+
+    # Add voorbeelden if available
+    voorbeelden = entry.voorbeelden
+    if voorbeelden:
+        if isinstance(voorbeelden, list):
+            voorbeelden_text = html.escape("; ".join(voorbeelden))
+            term_html += f"\n<br><strong>Voorbeeld(en)</strong>: {voorbeelden_text}"
+        elif isinstance(voorbeelden, str):
+            voorbeelden_text = html.escape(voorbeelden)
+            term_html += f"\n<br><strong>Voorbeeld(en)</strong>: {voorbeelden_text}"
+
+    return term_html
+
+
+def render_variant_note(alt_type, hoofdterm):
+    """Render the note that a term is an alternative term, alternative spelling or plural form."""
+    hoofdterm = html.escape(hoofdterm or "")
+    if hoofdterm and alt_type in _VARIANT_NOTES:
+        return f"\n<br><i>Dit is een {_VARIANT_NOTES[alt_type]} van {hoofdterm}</i>"
+    return ""
+
+
+def inject_terms(
+    text,
+    term_index,
+    already_matched_terms=None,
+    memo=None,
+    output_mode="inline",
+    budget=None,
+    profiler=None,
+):
     """
     Inject HTML tags around terms found in the text.
     Returns the modified text with HTML tags.
@@ -149,6 +1014,9 @@ def inject_terms(text, term_map, already_matched_terms=None):
     3. Alternatieve spellingen (longest first)
     4. Alternatieve termen (longest first)
 
+    Each term is enriched at its first occurrence that does not overlap an
+    earlier (higher priority) match.
+
     Matching is case-insensitive, EXCEPT for terms that are all uppercase in the
     begrippenkader (e.g. "DAT") — these only match when written in uppercase in
     the text, to avoid false positives with common Dutch words.
@@ -158,235 +1026,461 @@ def inject_terms(text, term_map, already_matched_terms=None):
 
     Args:
         text: The text to process.
-        term_map: Dictionary mapping lowercase terms to their definitions.
+        term_index: TermIndex to match against. A plain term map is accepted
+            too, but is then compiled on every call.
         already_matched_terms: Optional set of term keys already matched earlier
             on the same page. When provided, each term is only enriched once per
             page and newly matched terms are added to this set.
+        memo: Optional EnrichmentMemo consulted before any matching is done.
+        output_mode: "inline" (default) embeds the full tooltip, "references"
+            emits a span referring to the document's definitions table.
+        budget: Optional TooltipBudget limiting the number of tooltips.
+        profiler: Optional TermProfiler recording per-term statistics. The
+            memo is bypassed while profiling, so every field is measured.
     """
     if not text or not isinstance(text, str):
         return text
+    if budget is not None and budget.exhausted():
+        # Nothing more fits on this page: skip the matching altogether
+        budget.skipped_fields += 1
+        return text
 
-    # Group terms by type
-    hoofdtermen = []
-    meervoudsvormen = []  # NEW: separate list for plural forms
-    alt_spellingen = []
-    alt_termen = []
+    term_index = as_term_index(term_index)
+    if profiler is not None:
+        memo = None
+        started = time.perf_counter()
+
+    cached = None
+    if memo is not None:
+        mode = "every_occurrence" if already_matched_terms is None else "once_per_page"
+        # With a budget the result also depends on the budget spent so far, so
+        # only the resolved matches are memoized and the budget is applied on
+        # every call.
+        variant = output_mode if budget is None else "matches"
+        memo_key = (text, f"{mode}:{variant}", term_index.fingerprint)
+        cached = memo.get(memo_key, already_matched_terms)
+        if cached is not None and budget is None:
+            result, matched_terms = cached
+            if already_matched_terms is not None:
+                already_matched_terms.update(matched_terms)
+            return result
+
+    if cached is not None:
+        matches = cached[0]
+    else:
+        # Only text nodes are matched: markup, attributes (e.g. href URLs) and
+        # existing definition spans are skipped by the segmentation.
+        found = term_index.find_all(text, segment_text_nodes(text))
+        matches = _resolve_matches(found, already_matched_terms)
+        if memo is not None:
+            found_terms = frozenset(term for term, _ in found)
+            page_state = memo.page_state(found_terms, already_matched_terms)
+            if budget is not None:
+                memo.put(memo_key, found_terms, page_state, matches, ())
+
+    selected = matches if budget is None else budget.select(matches)
+    if profiler is not None:
+        profiler.record(
+            found, matches, selected, already_matched_terms, time.perf_counter() - started
+        )
+    matches = selected
+
+    matched_terms = tuple(term for _, _, term in matches)
+    # Record the enriched terms so they are only enriched once per page
+    if already_matched_terms is not None:
+        already_matched_terms.update(matched_terms)
+
+    result = _splice(
+        text,
+        [
+            (start, end, term_index.tooltip(text[start:end], output_mode, term))
+            for start, end, term in matches
+        ],
+    )
+    if memo is not None and budget is None:
+        memo.put(memo_key, found_terms, page_state, result, matched_terms)
+    return result
 
-    for term_key, term_data in term_map.items():
-        # Term keys are already lowercase from create_term_map
-        if term_data.get("is_meervoudsvorm", False):  # NEW: check for plural forms
-            meervoudsvormen.append(term_key)
-        elif term_data.get("is_alternatief_spelling", False):
-            alt_spellingen.append(term_key)
-        elif term_data.get("is_alternatief_term", False):
-            alt_termen.append(term_key)
+
+def _resolve_matches(found, already_matched_terms=None):
+    """Pick the occurrence to enrich for every found term.
+
+    All positions refer to the original text: terms claim their first
+    occurrence that does not overlap an earlier (higher priority) match, and
+    terms already matched on the page are skipped.
+
+    Returns:
+        Tuple of ``(start, end, term_key)`` in priority order
+    """
+    # Ranges matched so far, to prevent overlapping/nested tags
+    protected = ProtectedRanges()
+    matches = []
+    for term, occurrences in found:
+        # Skip terms already matched on this page (once-per-page logic)
+        if already_matched_terms is not None and term in already_matched_terms:
+            continue
+
+        for start, end in occurrences:
+            # Skip if any part of this match overlaps with ranges already matched
+            if not protected.overlaps(start, end):
+                break
         else:
-            hoofdtermen.append(term_key)
-
-    # Sort each category by length (longest first)
-    hoofdtermen.sort(key=len, reverse=True)
-    meervoudsvormen.sort(key=len, reverse=True)  # NEW: sort plural forms
-    alt_spellingen.sort(key=len, reverse=True)
-    alt_termen.sort(key=len, reverse=True)
-
-    # Combine all term lists in processing order with the new priority
-    all_term_lists = [
-        hoofdtermen,
-        meervoudsvormen,
-        alt_spellingen,
-        alt_termen,
-    ]  # Updated order
-
-    # Create a record of all matched positions to prevent overlapping/nested tags
-    matched_positions = set()
-
-    # Create an array of characters to be modified
-    # This approach allows us to mark positions as "processed" to avoid overlapping tags
-    chars = list(text)
-
-    # Find all existing aiv-definition spans first and mark their positions as matched
-    span_pattern = r'<span class="aiv-definition">.*?</span></span>'
-    for match in re.finditer(span_pattern, text, re.DOTALL):
-        start, end = match.span()
-        # Mark all positions in this span as already matched
-        for pos in range(start, end):
-            matched_positions.add(pos)
-
-    # Mark positions inside any HTML tag (<...>) so terms in attributes
-    # (e.g. href URLs) are not enriched.
-    for match in re.finditer(r"<[^>]+>", text, re.DOTALL):
-        start, end = match.span()
-        for pos in range(start, end):
-            matched_positions.add(pos)
-
-    # Process each term list in order
-    for _term_list_index, term_list in enumerate(all_term_lists):
-        if not term_list:
             continue
 
-        # Process each term in the current list
-        for term in term_list:
-            # Skip terms already matched on this page (once-per-page logic)
-            if already_matched_terms is not None and term in already_matched_terms:
-                continue
+        matches.append((start, end, term))
+        protected.add(start, end)
+    return tuple(matches)
 
-            # Determine case sensitivity: terms that are all uppercase in the
-            # begrippenkader (e.g. "DAT") are matched case-sensitively to avoid
-            # false positives with common Dutch words like "dat".
-            original_term = term_map.get(term, {}).get("term", term)
-            if len(original_term) > 1 and original_term.isupper():
-                # Use the original uppercase term in the pattern
-                term_pattern = r"\b" + re.escape(original_term) + r"\b"
-                regex_flags = 0  # case-sensitive
+
+def _splice(text, replacements):
+    """Replace the given ``(start, end, html)`` ranges of ``text``."""
+    if not replacements:
+        return text
+
+    replacements.sort()
+    parts = []
+    position = 0
+    for start, end, term_html in replacements:
+        parts.append(text[position:start])
+        parts.append(term_html)
+        position = end
+    parts.append(text[position:])
+    return "".join(parts)
+
+
+def collect_definition_refs(value, refs=None):
+    """Collect the definition keys referenced by definition spans anywhere in ``value``.
+
+    Returns:
+        Dict with the referenced definition keys in order of first appearance (as keys)
+    """
+    if refs is None:
+        refs = {}
+    if isinstance(value, str):
+        if "data-definition=" in value:
+            for match in DEFINITION_REFERENCE_PATTERN.finditer(value):
+                refs.setdefault(html.unescape(match.group(1)), None)
+    elif isinstance(value, dict):
+        for item in value.values():
+            collect_definition_refs(item, refs)
+    elif isinstance(value, list):
+        for item in value:
+            collect_definition_refs(item, refs)
+    return refs
+
+
+def build_definitions_table(document, term_index):
+    """Build the shared definitions table for a document in "references" output mode.
+
+    Every referenced definition appears once, keyed by Definition.key, with
+    its display term and its text. Spans for a variant of the term add the
+    variant note (see render_variant_note) to that text.
+    """
+    term_index = as_term_index(term_index)
+    return {
+        key: {
+            "term": term_index.definitions[key].term,
+            "text": term_index.definition_text(key),
+        }
+        for key in collect_definition_refs(document)
+    }
+
+
+def _expand_definition_reference(match, term_index):
+    """Render the inline tooltip for one DEFINITION_REFERENCE_PATTERN match."""
+    key, variant, matched_text = match.groups()
+    text = term_index.definition_text(html.unescape(key))
+    if variant:
+        text += render_variant_note(variant, term_index.definitions[html.unescape(key)].term)
+    return (
+        f'<span class="aiv-definition">{matched_text}'
+        f'<span class="aiv-definition-text">{text}</span></span>'
+    )
+
+
+def expand_definition_references(value, term_index):
+    """Turn the definition references in ``value`` back into inline tooltips.
+
+    Expanding a document enriched in "references" mode gives exactly the
+    document the "inline" mode produces.
+    """
+    term_index = as_term_index(term_index)
+    if isinstance(value, str):
+        if "data-definition=" not in value:
+            return value
+        return DEFINITION_REFERENCE_PATTERN.sub(
+            lambda match: _expand_definition_reference(match, term_index), value
+        )
+    if isinstance(value, dict):
+        return {key: expand_definition_references(item, term_index) for key, item in value.items()}
+    if isinstance(value, list):
+        return [expand_definition_references(item, term_index) for item in value]
+    return value
+
+
+def _contains_conditions(task_index):
+    """Yield ``(task, condition)`` for every conditional ``contains`` dependency."""
+    for dependencies in task_index.dependents.values():
+        for task, dependency in dependencies:
+            condition = dependency.get("condition")
+            if (
+                dependency.get("type") == "conditional"
+                and isinstance(condition, dict)
+                and condition.get("operator") == "contains"
+            ):
+                yield task, condition
+
+
+class ContainsConditionVisitor(TaskVisitor):
+    """Resolves every ``contains`` condition to the option it selects.
+
+    A ``contains`` condition names an option of the referenced task by its
+    value, optionally in single quotes. The condition gets the index of that
+    option (``option_index``) and its exact value; after enrichment
+    sync_contains_conditions copies the enriched option value into it, so the
+    condition always equals the option the form stores as answer.
+
+    Register it before an EnrichmentVisitor of the same walk: the options are
+    matched as they are in the source. A condition on a task that comes later
+    in the document is resolved when the walk ends, from the value it had when
+    it was visited.
+
+    Attributes:
+        resolved: Number of resolved conditions
+
+    Raises:
+        ValueError: At the end of the walk, if a condition value matches no
+            option of the referenced task, or the source sets an
+            ``option_index`` that is not the index of that option; all such
+            conditions are listed.
+    """
+
+    def __init__(self):
+        self.resolved = 0
+        self._options = {}
+        self._pending = []
+        self._errors = []
+
+    def enter_task(self, task, context):
+        # The option values as in the source, before enrichment changes them
+        options = task.get("options")
+        values = [
+            option.get("value") if isinstance(option, dict) else None
+            for option in (options if isinstance(options, list) else ())
+        ]
+        self._options.setdefault(task.get("id"), values)
+        for dependency in task.get("dependencies") or ():
+            if not isinstance(dependency, dict) or dependency.get("type") != "conditional":
+                continue
+            condition = dependency.get("condition")
+            if not isinstance(condition, dict) or condition.get("operator") != "contains":
+                continue
+            value = condition.get("value")
+            if not isinstance(value, str):
+                continue
+            if condition.get("id") in self._options:
+                self._resolve(task, condition, value)
             else:
-                term_pattern = r"\b" + re.escape(term) + r"\b"
-                regex_flags = re.IGNORECASE
-
-            # Find all matches for this term in the current state of the text
-            current_text = "".join(chars)
-            for match in re.finditer(term_pattern, current_text, regex_flags):
-                start, end = match.span()
-
-                # Skip if any part of this match overlaps with positions already matched
-                overlap = False
-                for pos in range(start, end):
-                    if pos in matched_positions:
-                        overlap = True
-                        break
-
-                if overlap:
-                    continue
+                self._pending.append((task, condition, value))
+
+    def leave_document(self, document):
+        for task, condition, value in self._pending:
+            self._resolve(task, condition, value)
+        self._pending = []
+        if self._errors:
+            raise ValueError("Unresolved 'contains' conditions:\n" + "\n".join(self._errors))
+
+    def _resolve(self, task, condition, value):
+        wanted = value.strip("'")
+        options = self._options.get(condition.get("id"), ())
+        index = next((i for i, option in enumerate(options) if option == wanted), None)
+        if index is None:
+            self._errors.append(
+                f"task {task.get('id')}: value {value!r} matches no option of task "
+                f"{condition.get('id')!r}"
+            )
+            return
+        if condition.get("option_index", index) != index:
+            self._errors.append(
+                f"task {task.get('id')}: option_index {condition['option_index']!r} does not "
+                f"match value {value!r}, which is option {index} of task {condition.get('id')!r}"
+            )
+            return
+        condition["value"] = wanted
+        condition["option_index"] = index
+        self.resolved += 1
 
-                # This is a valid match that doesn't overlap with existing spans
-                matched_text = current_text[start:end]
-                term_lower = matched_text.lower()
 
-                # Get the term data
-                term_data = term_map.get(term_lower)
-                if not term_data:
-                    # Try again with case-insensitive lookup
-                    for key in term_map:
-                        if key.lower() == term_lower:
-                            term_data = term_map[key]
-                            break
+def resolve_contains_conditions(document):
+    """Resolve every ``contains`` condition of ``document`` in place.
 
-                if not term_data:
-                    continue
+    Walks the source data on its own; enrich_document resolves the conditions
+    in its enrichment walk instead. See ContainsConditionVisitor.
 
-                # Begrippenkader content is (partly) synced from external
-                # sources and must not be trusted as HTML: escape every text
-                # field before interpolating it into the tooltip markup.
-                definition = html.escape(term_data["definition"])
-                hoofdterm = html.escape(term_data.get("hoofdterm") or "")
+    Returns:
+        Number of resolved conditions
 
-                # Create the HTML with the original matched text
-                term_html = (
-                    f'<span class="aiv-definition">{html.escape(matched_text)}'
-                    f'<span class="aiv-definition-text">{definition}'
-                )
+    Raises:
+        ValueError: If a condition cannot be resolved
+    """
+    visitor = ContainsConditionVisitor()
+    walk_document(document, [visitor])
+    return visitor.resolved
+
+
+def sync_contains_conditions(document, task_index=None):
+    """Set resolved ``contains`` conditions to the value of their (enriched) option.
 
-                # Add toelichting if available
-                toelichting = html.escape(term_data.get("toelichting", ""))
-                if toelichting:
-                    term_html += f"\n<br><strong>Toelichting</strong>: {toelichting}"
-
-                # Add voorbeelden if available
-                voorbeelden = term_data.get("voorbeelden", [])
-                if voorbeelden:
-                    if isinstance(voorbeelden, list):
-                        voorbeelden_text = html.escape("; ".join(voorbeelden))
-                        term_html += f"\n<br><strong>Voorbeeld(en)</strong>: {voorbeelden_text}"
-                    elif isinstance(voorbeelden, str):
-                        voorbeelden_text = html.escape(voorbeelden)
-                        term_html += f"\n<br><strong>Voorbeeld(en)</strong>: {voorbeelden_text}"
-
-                # Add alternative term information
-                if term_data.get("is_alternatief_term", False) and hoofdterm:
-                    term_html += f"\n<br><i>Dit is een alternatieve term van {hoofdterm}</i>"
-
-                if term_data.get("is_alternatief_spelling", False) and hoofdterm:
-                    term_html += f"\n<br><i>Dit is een alternatieve spelling van {hoofdterm}</i>"
-
-                # Add plural form information - NEW CODE
-                if term_data.get("is_meervoudsvorm", False) and hoofdterm:
-                    term_html += f"\n<br><i>Dit is een meervoudsvorm van {hoofdterm}</i>"
-
-                term_html += "</span></span>"
-
-                # Replace the matched text with the HTML in chars list
-                chars[start:end] = list(term_html)
-
-                # Mark these positions as matched
-                for i in range(start, start + len(term_html)):
-                    matched_positions.add(i)
-
-                # Update the text based on the current state of chars
-                current_text = "".join(chars)
-
-                # We need to re-find all spans after this replacement
-                # to properly update matched_positions for the next iterations
-                updated_matched_positions = set()
-                for span_match in re.finditer(span_pattern, current_text, re.DOTALL):
-                    s, e = span_match.span()
-                    for pos in range(s, e):
-                        updated_matched_positions.add(pos)
-
-                # Re-mark positions inside HTML tags to keep protecting URLs in attributes
-                for html_match in re.finditer(r"<[^>]+>", current_text, re.DOTALL):
-                    s, e = html_match.span()
-                    for pos in range(s, e):
-                        updated_matched_positions.add(pos)
-
-                # Add the original matched positions that weren't part of spans
-                for pos in matched_positions:
-                    if pos < start or pos >= start + len(term_html):
-                        updated_matched_positions.add(pos)
-
-                # Update with the new positions
-                matched_positions = updated_matched_positions
-                chars = list(current_text)
-
-                # Record this term so it is only enriched once per page
-                if already_matched_terms is not None:
-                    already_matched_terms.add(term)
-                    break  # stop after first match for this term on this page
-
-    # Return the final text with all replacements
-    return "".join(chars)
-
-
-def process_dpia(dpia_data, term_map, once_per_page=False):
+    See ContainsConditionVisitor. Conditions without ``option_index`` are
+    left alone. Pass the TaskIndexVisitor of a walk over ``document`` to skip
+    walking it again.
+
+    Raises:
+        ValueError: If an ``option_index`` refers to no option of the
+            referenced task (e.g. one set in the source for a task that does
+            not exist); all such conditions are listed.
+    """
+    if task_index is None:
+        task_index = TaskIndexVisitor()
+        walk_document(document, [task_index])
+    errors = []
+    for task, condition in _contains_conditions(task_index):
+        if "option_index" not in condition:
+            continue
+        index = condition["option_index"]
+        options = (task_index.tasks.get(condition.get("id")) or {}).get("options")
+        if not (
+            isinstance(options, list)
+            and isinstance(index, int)
+            and 0 <= index < len(options)
+            and isinstance(options[index], dict)
+            and "value" in options[index]
+        ):
+            errors.append(
+                f"task {task.get('id')}: option_index {index!r} refers to no option of task "
+                f"{condition.get('id')!r}"
+            )
+            continue
+        condition["value"] = options[index]["value"]
+
+    if errors:
+        raise ValueError("Invalid 'contains' conditions:\n" + "\n".join(errors))
+
+
+def process_dpia(
+    dpia_data,
+    term_index,
+    once_per_page=False,
+    memo=None,
+    jobs=1,
+    page_cache=None,
+    in_place=False,
+    output_mode="inline",
+    budget=None,
+    profiler=None,
+    visitors=(),
+):
     """Process the DPIA data and inject terms from the begrippenkader.
 
     Handles main structure elements and delegates to process_tasks for handling tasks.
+    ``contains`` conditions resolved by a ContainsConditionVisitor get the
+    enriched value of their option.
+
+    Other stages can share the traversal by passing TaskVisitors. They see
+    every task of dpia_data before it is enriched. When enriching in place,
+    sequentially and without page cache, enrichment itself runs as an
+    EnrichmentVisitor in the same single walk; otherwise the visitors walk
+    the source first and the pages are enriched as usual.
 
     Args:
         dpia_data: The parsed YAML data to enrich.
-        term_map: Dictionary mapping terms to their definitions.
+        term_index: TermIndex to match against (a plain term map is compiled
+            once here).
         once_per_page: When True, each definition is enriched at most once per
             page (top-level task). When False (default), every occurrence is
             enriched.
+        memo: Optional EnrichmentMemo shared by all fields of the document.
+        jobs: Number of worker processes for the top-level tasks; 1 (default)
+            enriches sequentially, 0 uses all CPU cores.
+        page_cache: Optional PageCache with previously enriched top-level tasks.
+        in_place: When True, enrich the dictionaries of dpia_data directly
+            instead of copying them. Only for callers that own the data and do
+            not need the original afterwards.
+        output_mode: How matched terms are written, see OUTPUT_MODES. In
+            "references" mode the caller adds the definitions table, see
+            build_definitions_table.
+        budget: Optional TooltipBudget; fields outside the pages count as one
+            page of their own.
+        profiler: Optional TermProfiler recording per-term statistics.
+        visitors: Optional TaskVisitors (see task_tree) to run on the source.
     """
     if not dpia_data:
         return dpia_data
 
-    # Create a deep copy of the data to avoid modifying the original
-    result = {}
+    # Compile the term map once for the whole document
+    term_index = as_term_index(term_index)
+
+    if in_place and jobs == 1 and page_cache is None:
+        task_index = TaskIndexVisitor()
+        enrichment = EnrichmentVisitor(
+            term_index, once_per_page, memo, output_mode, budget, profiler
+        )
+        walk_document(dpia_data, [*visitors, enrichment, task_index])
+        sync_contains_conditions(dpia_data, task_index)
+        return dpia_data
+    if visitors:
+        walk_document(dpia_data, list(visitors))
+
+    # Copy the data to avoid modifying the original, unless the caller owns it
+    result = dpia_data if in_place else {}
+
+    if budget is not None:
+        budget.start_page()
 
     # Process top-level fields
     for key, value in dpia_data.items():
         if key == "description" and isinstance(value, str):
-            result[key] = inject_terms(value, term_map)
+            result[key] = inject_terms(
+                value,
+                term_index,
+                memo=memo,
+                output_mode=output_mode,
+                budget=budget,
+                profiler=profiler,
+            )
         elif key == "tasks" and isinstance(value, list):
             # Process tasks with level 0
-            result[key] = process_tasks(value, term_map, level=0, once_per_page=once_per_page)
+            result[key] = process_pages(
+                value,
+                term_index,
+                once_per_page,
+                memo=memo,
+                jobs=jobs,
+                page_cache=page_cache,
+                in_place=in_place,
+                output_mode=output_mode,
+                budget=budget,
+                profiler=profiler,
+            )
         else:
             result[key] = value
 
+    sync_contains_conditions(result)
     return result
 
 
-def process_tasks(tasks, term_map, level=0, already_matched_terms=None, once_per_page=False):
+def process_tasks(
+    tasks,
+    term_index,
+    level=0,
+    already_matched_terms=None,
+    once_per_page=False,
+    memo=None,
+    in_place=False,
+    output_mode="inline",
+    budget=None,
+    profiler=None,
+):
     """
     Process tasks recursively based on their level:
     - At level 0 (top level): Only process description
@@ -399,10 +1493,17 @@ def process_tasks(tasks, term_map, level=0, already_matched_terms=None, once_per
 
     Args:
         tasks: List of task dictionaries
-        term_map: Dictionary mapping terms to their definitions
+        term_index: TermIndex to match against (a plain term map is compiled
+            once here)
         level: Current nesting level of tasks (0 for top level)
         already_matched_terms: Set of term keys already matched on this page
         once_per_page: Enrich each definition at most once per page when True
+        memo: Optional EnrichmentMemo shared by all fields
+        in_place: Enrich the task, option and dependency dictionaries directly
+            instead of copying them
+        output_mode: How matched terms are written, see OUTPUT_MODES
+        budget: Optional TooltipBudget; a new page starts at every top-level task
+        profiler: Optional TermProfiler recording per-term statistics
 
     Returns:
         Processed list of tasks with terms injected according to rules
@@ -410,82 +1511,45 @@ def process_tasks(tasks, term_map, level=0, already_matched_terms=None, once_per
     if not tasks:
         return tasks
 
+    term_index = as_term_index(term_index)
+
     result = []
 
     for task in tasks:
-        # Create a copy of the task to modify
-        task_copy = task.copy()
+        # Create a copy of the task to modify, unless the caller owns the data
+        task_copy = task if in_place else task.copy()
 
         # At the top level each task (deel) starts fresh: a set enables
         # once-per-page enrichment, None enriches every occurrence.
         page_matched = (set() if once_per_page else None) if level == 0 else already_matched_terms
-
-        # For top level (level 0), only process description
-        if level == 0:
-            if "description" in task_copy and isinstance(task_copy["description"], str):
-                task_copy["description"] = inject_terms(
-                    task_copy["description"], term_map, page_matched
-                )
-        # For deeper levels, process both task and description
-        else:
-            if "task" in task_copy and isinstance(task_copy["task"], str):
-                task_copy["task"] = inject_terms(task_copy["task"], term_map, page_matched)
-            if "description" in task_copy and isinstance(task_copy["description"], str):
-                task_copy["description"] = inject_terms(
-                    task_copy["description"], term_map, page_matched
-                )
-
-        # Process options values for both checkbox_option and radio_option type tasks
-        task_type = task_copy.get("type", [])
-        # Handle both string and list types
-        if isinstance(task_type, str):
-            is_option_task = task_type in ["checkbox_option", "radio_option"]
-        elif isinstance(task_type, list):
-            is_option_task = any(t in ["checkbox_option", "radio_option"] for t in task_type)
-        else:
-            is_option_task = False
-
-        if is_option_task and "options" in task_copy and isinstance(task_copy["options"], list):
-            options_copy = []
-            for option in task_copy["options"]:
-                option_copy = option.copy()
-                if "value" in option_copy and isinstance(option_copy["value"], str):
-                    option_copy["value"] = inject_terms(
-                        option_copy["value"], term_map, page_matched
-                    )
-                # Process label if it exists and is a string
-                if "label" in option_copy and isinstance(option_copy["label"], str):
-                    option_copy["label"] = inject_terms(
-                        option_copy["label"], term_map, page_matched
-                    )
-                options_copy.append(option_copy)
-            task_copy["options"] = options_copy
-
-        # Process dependencies with 'contains' operator
-        if "dependencies" in task_copy and isinstance(task_copy["dependencies"], list):
-            dependencies_copy = []
-            for dependency in task_copy["dependencies"]:
-                dependency_copy = dependency.copy()
-                if (
-                    isinstance(dependency_copy, dict)
-                    and dependency_copy.get("type") == "conditional"
-                    and dependency_copy.get("condition", {}).get("operator") == "contains"
-                ):
-                    # Include the value in the processing if it exists
-                    condition = dependency_copy.get("condition", {}).copy()
-                    value = condition.get("value")
-                    if isinstance(value, str):
-                        # Process the value using inject_terms
-                        replaced_value = inject_terms(value, term_map)
-                        condition["value"] = replaced_value.strip("'")
-                        dependency_copy["condition"] = condition
-                dependencies_copy.append(dependency_copy)
-            task_copy["dependencies"] = dependencies_copy
+        if level == 0 and budget is not None:
+            budget.start_page()
+
+        _enrich_task(
+            task_copy,
+            term_index,
+            level,
+            page_matched,
+            memo,
+            in_place,
+            output_mode,
+            budget,
+            profiler,
+        )
 
         # Recursively process subtasks with incremented level
         if "tasks" in task_copy and isinstance(task_copy["tasks"], list):
             task_copy["tasks"] = process_tasks(
-                task_copy["tasks"], term_map, level + 1, page_matched, once_per_page
+                task_copy["tasks"],
+                term_index,
+                level + 1,
+                page_matched,
+                once_per_page,
+                memo,
+                in_place,
+                output_mode,
+                budget,
+                profiler,
             )
 
         result.append(task_copy)
@@ -493,6 +1557,407 @@ def process_tasks(tasks, term_map, level=0, already_matched_terms=None, once_per
     return result
 
 
+def _enrich_task(
+    task, term_index, level, page_matched, memo, in_place, output_mode, budget, profiler
+):
+    """Enrich the fields of a single task, not its subtasks; see process_tasks.
+
+    ``task`` is modified; its options and dependencies are copied first unless
+    ``in_place`` is set.
+    """
+    # For top level (level 0), only process description
+    if level == 0:
+        if "description" in task and isinstance(task["description"], str):
+            task["description"] = inject_terms(
+                task["description"],
+                term_index,
+                page_matched,
+                memo,
+                output_mode,
+                budget,
+                profiler,
+            )
+    # For deeper levels, process both task and description
+    else:
+        if "task" in task and isinstance(task["task"], str):
+            task["task"] = inject_terms(
+                task["task"], term_index, page_matched, memo, output_mode, budget, profiler
+            )
+        if "description" in task and isinstance(task["description"], str):
+            task["description"] = inject_terms(
+                task["description"],
+                term_index,
+                page_matched,
+                memo,
+                output_mode,
+                budget,
+                profiler,
+            )
+
+    # Process options values for both checkbox_option and radio_option type tasks
+    task_type = task.get("type", [])
+    # Handle both string and list types
+    if isinstance(task_type, str):
+        is_option_task = task_type in ["checkbox_option", "radio_option"]
+    elif isinstance(task_type, list):
+        is_option_task = any(t in ["checkbox_option", "radio_option"] for t in task_type)
+    else:
+        is_option_task = False
+
+    if is_option_task and "options" in task and isinstance(task["options"], list):
+        options_copy = []
+        for option in task["options"]:
+            option_copy = option if in_place else option.copy()
+            if "value" in option_copy and isinstance(option_copy["value"], str):
+                option_copy["value"] = inject_terms(
+                    option_copy["value"],
+                    term_index,
+                    page_matched,
+                    memo,
+                    output_mode,
+                    budget,
+                    profiler,
+                )
+            # Process label if it exists and is a string
+            if "label" in option_copy and isinstance(option_copy["label"], str):
+                option_copy["label"] = inject_terms(
+                    option_copy["label"],
+                    term_index,
+                    page_matched,
+                    memo,
+                    output_mode,
+                    budget,
+                    profiler,
+                )
+            options_copy.append(option_copy)
+        task["options"] = options_copy
+
+    # Process dependencies with 'contains' operator
+    if "dependencies" in task and isinstance(task["dependencies"], list):
+        dependencies_copy = []
+        for dependency in task["dependencies"]:
+            dependency_copy = dependency if in_place else dependency.copy()
+            if (
+                isinstance(dependency_copy, dict)
+                and dependency_copy.get("type") == "conditional"
+                and dependency_copy.get("condition", {}).get("operator") == "contains"
+            ):
+                # Include the value in the processing if it exists
+                condition = dependency_copy.get("condition", {})
+                if not in_place:
+                    condition = condition.copy()
+                value = condition.get("value")
+                # Resolved conditions take the enriched value of their
+                # option, see sync_contains_conditions
+                if isinstance(value, str) and "option_index" not in condition:
+                    # Process the value using inject_terms
+                    replaced_value = inject_terms(
+                        value, term_index, memo=memo, output_mode=output_mode
+                    )
+                    condition["value"] = replaced_value.strip("'")
+                dependency_copy["condition"] = condition
+            dependencies_copy.append(dependency_copy)
+        task["dependencies"] = dependencies_copy
+
+
+class EnrichmentVisitor(TaskVisitor):
+    """Enriches a document in place during a walk_document traversal.
+
+    Produces the same result as process_dpia with ``in_place=True``, so other
+    stages can share its tree walk. Register read-only visitors before it.
+    """
+
+    def __init__(
+        self,
+        term_index,
+        once_per_page=False,
+        memo=None,
+        output_mode="inline",
+        budget=None,
+        profiler=None,
+    ):
+        self.term_index = as_term_index(term_index)
+        self.once_per_page = once_per_page
+        self.memo = memo
+        self.output_mode = output_mode
+        self.budget = budget
+        self.profiler = profiler
+        self._page_matched = None
+
+    def enter_document(self, document):
+        if self.budget is not None:
+            self.budget.start_page()
+        if isinstance(document.get("description"), str):
+            document["description"] = inject_terms(
+                document["description"],
+                self.term_index,
+                memo=self.memo,
+                output_mode=self.output_mode,
+                budget=self.budget,
+                profiler=self.profiler,
+            )
+
+    def enter_task(self, task, context):
+        # Every top-level task (deel) starts a new page
+        if context.level == 0:
+            self._page_matched = set() if self.once_per_page else None
+            if self.budget is not None:
+                self.budget.start_page()
+        _enrich_task(
+            task,
+            self.term_index,
+            context.level,
+            self._page_matched,
+            self.memo,
+            True,
+            self.output_mode,
+            self.budget,
+            self.profiler,
+        )
+
+
+def process_pages(
+    tasks,
+    term_index,
+    once_per_page=False,
+    memo=None,
+    jobs=1,
+    page_cache=None,
+    in_place=False,
+    output_mode="inline",
+    budget=None,
+    profiler=None,
+):
+    """
+    Enrich the top-level tasks (pages) of a document.
+
+    Pages found in page_cache are reused as-is. The others are enriched
+    sequentially or, when jobs is not 1, in a pool of worker processes, and
+    are then added to the cache.
+
+    Args:
+        tasks: List of top-level task dictionaries
+        term_index: TermIndex to match against
+        once_per_page: Enrich each definition at most once per page when True
+        memo: Optional EnrichmentMemo shared by all fields
+        jobs: Number of worker processes; 1 enriches sequentially, 0 uses all CPU cores
+        page_cache: Optional PageCache with previously enriched pages
+        in_place: Enrich the task dictionaries directly instead of copying them
+        output_mode: How matched terms are written, see OUTPUT_MODES
+        budget: Optional TooltipBudget; pages reused from page_cache do not
+            add to its suppressed count
+        profiler: Optional TermProfiler; pages reused from page_cache are not
+            profiled
+
+    Returns:
+        Processed list of tasks, in the original order
+    """
+    if not tasks:
+        return tasks
+
+    term_index = as_term_index(term_index)
+
+    result = list(tasks)
+    cache_keys = {}
+    pending = []
+    for index, task in enumerate(tasks):
+        if page_cache is not None:
+            cache_keys[index] = page_cache.key(task)
+            cached = page_cache.get(cache_keys[index])
+            if cached is not None:
+                result[index] = cached
+                continue
+        pending.append(index)
+
+    pending_tasks = [tasks[index] for index in pending]
+    if jobs == 1:
+        enriched = process_tasks(
+            pending_tasks,
+            term_index,
+            level=0,
+            once_per_page=once_per_page,
+            memo=memo,
+            in_place=in_place,
+            output_mode=output_mode,
+            budget=budget,
+            profiler=profiler,
+        )
+    else:
+        enriched = process_pages_in_parallel(
+            pending_tasks,
+            term_index,
+            once_per_page,
+            memo=memo,
+            jobs=jobs,
+            output_mode=output_mode,
+            budget=budget,
+            profiler=profiler,
+        )
+
+    for index, task in zip(pending, enriched, strict=True):
+        result[index] = task
+        if page_cache is not None:
+            page_cache.put(cache_keys[index], task)
+    return result
+
+
+# Per-process state of the page workers, set once by _init_page_worker
+_page_worker = {}
+
+
+def _init_page_worker(term_index, once_per_page, output_mode, budget_limits, profile):
+    _page_worker["term_index"] = term_index
+    _page_worker["once_per_page"] = once_per_page
+    _page_worker["output_mode"] = output_mode
+    _page_worker["memo"] = EnrichmentMemo()
+    _page_worker["budget"] = None if budget_limits is None else TooltipBudget(**budget_limits)
+    _page_worker["profile"] = profile
+
+
+def _enrich_page(task):
+    """Enrich one top-level task in a worker; returns it with the counter deltas."""
+    memo = _page_worker["memo"]
+    budget = _page_worker["budget"]
+    profiler = TermProfiler() if _page_worker["profile"] else None
+    hits, misses = memo.hits, memo.misses
+    suppressed = 0 if budget is None else budget.suppressed
+    skipped_fields = 0 if budget is None else budget.skipped_fields
+    (result,) = process_tasks(
+        [task],
+        _page_worker["term_index"],
+        level=0,
+        once_per_page=_page_worker["once_per_page"],
+        memo=memo,
+        # The worker owns its unpickled copy of the task
+        in_place=True,
+        output_mode=_page_worker["output_mode"],
+        budget=budget,
+        profiler=profiler,
+    )
+    counters = {
+        "hits": memo.hits - hits,
+        "misses": memo.misses - misses,
+        "suppressed": 0 if budget is None else budget.suppressed - suppressed,
+        "skipped_fields": 0 if budget is None else budget.skipped_fields - skipped_fields,
+        "profiler": profiler,
+    }
+    return result, counters
+
+
+def process_pages_in_parallel(
+    tasks,
+    term_index,
+    once_per_page=False,
+    memo=None,
+    jobs=0,
+    output_mode="inline",
+    budget=None,
+    profiler=None,
+):
+    """
+    Enrich the top-level tasks (pages) in a pool of worker processes.
+
+    Pages are independent, even in once-per-page mode where every page starts
+    with its own set of matched terms, so the result is identical to
+    process_tasks(tasks, term_index, level=0, once_per_page=once_per_page).
+    The term index is sent to every worker once; each worker keeps its own memo
+    and tooltip budget.
+
+    Args:
+        tasks: List of top-level task dictionaries
+        term_index: TermIndex to match against
+        once_per_page: Enrich each definition at most once per page when True
+        memo: Optional EnrichmentMemo that receives the workers' hit and miss counts
+        jobs: Number of worker processes; 0 uses all CPU cores
+        output_mode: How matched terms are written, see OUTPUT_MODES
+        budget: Optional TooltipBudget that receives the workers' suppressed and
+            skipped counts
+        profiler: Optional TermProfiler that receives the workers' statistics
+
+    Returns:
+        Processed list of tasks, in the original order
+    """
+    if not tasks:
+        return tasks
+
+    term_index = as_term_index(term_index)
+    workers = min(jobs or os.cpu_count() or 1, len(tasks))
+
+    # Imported here, as sequential builds do not need multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_page_worker,
+        initargs=(
+            term_index,
+            once_per_page,
+            output_mode,
+            None if budget is None else budget.limits(),
+            profiler is not None,
+        ),
+    ) as executor:
+        results = list(executor.map(_enrich_page, tasks))
+
+    for _, counters in results:
+        if memo is not None:
+            memo.hits += counters["hits"]
+            memo.misses += counters["misses"]
+        if budget is not None:
+            budget.suppressed += counters["suppressed"]
+            budget.skipped_fields += counters["skipped_fields"]
+        if profiler is not None:
+            profiler.merge(counters["profiler"])
+    return [task for task, _ in results]
+
+
+def enrich_document(
+    document,
+    term_index,
+    once_per_page=False,
+    output_mode="inline",
+    memo=None,
+    jobs=1,
+    page_cache=None,
+    budget=None,
+    profiler=None,
+    visitors=(),
+):
+    """
+    Enrich a loaded source document in place, without file I/O.
+
+    Resolves the 'contains' conditions to the options they select, injects the
+    definitions (see process_dpia for the arguments) and, in "references"
+    output mode, adds the shared definitions table. The conditions are
+    resolved by a ContainsConditionVisitor in the same walk as the visitors.
+
+    Returns:
+        The enriched document
+
+    Raises:
+        ValueError: If a 'contains' condition matches none of the options
+    """
+    contains = ContainsConditionVisitor()
+    document = process_dpia(
+        document,
+        term_index,
+        once_per_page,
+        memo=memo,
+        jobs=jobs,
+        page_cache=page_cache,
+        in_place=True,
+        output_mode=output_mode,
+        budget=budget,
+        profiler=profiler,
+        visitors=[*visitors, contains],
+    )
+    if contains.resolved:
+        logger.info("Resolved %d 'contains' conditions to option indexes", contains.resolved)
+    if output_mode == "references":
+        document["definitions"] = build_definitions_table(document, term_index)
+    return document
+
+
 # Add the DefinitionEnricher class here
 class DefinitionEnricher:
     """
@@ -507,8 +1972,79 @@ class DefinitionEnricher:
             script_dir: Path object for the script directory
         """
         self.script_dir = script_dir if script_dir else Path(__file__).parent
+        # Compiled term indexes per begrippenkader path, reused across exports
+        self.term_indexes = {}
 
-    def enrich_and_export(self, source_path, begrippen_yaml_path, output_path, once_per_page=False):
+    def load_term_index(self, begrippen_yaml_path, inflections=False, cache_dir=None):
+        """
+        Load a begrippenkader and compile it into a TermIndex.
+
+        The index is built once per begrippenkader path (and inflection
+        setting) and reused by later calls on this enricher. With a cache
+        directory the compiled index is also stored on disk, keyed on the
+        content of the begrippenkader, so later runs skip parsing it.
+
+        Args:
+            begrippen_yaml_path: Path to the begrippenkader YAML file
+            inflections: Also match regular Dutch inflections of the hoofdtermen
+            cache_dir: Optional build cache directory, see TermIndexCache
+
+        Returns:
+            TermIndex for the begrippenkader
+        """
+        cache_key = (Path(begrippen_yaml_path).resolve(), inflections)
+        if cache_key in self.term_indexes:
+            return self.term_indexes[cache_key]
+
+        term_index = None
+        if cache_dir is not None:
+            # The module name is part of the context: pickles refer to classes by module
+            index_cache = TermIndexCache(
+                cache_dir, ENRICHER_VERSION, __name__, {"inflections": inflections}
+            )
+            disk_key = index_cache.key(begrippen_yaml_path, Path(begrippen_yaml_path).read_bytes())
+            term_index = index_cache.get(disk_key)
+            if term_index is not None and not isinstance(term_index, TermIndex):
+                logger.warning("Ignoring term index cache entry of the wrong type")
+                term_index = None
+            if term_index is not None:
+                logger.info("Term index loaded from cache for: %s", begrippen_yaml_path)
+
+        if term_index is None:
+            logger.info("Reading begrippenkader from: %s", begrippen_yaml_path)
+            begrippenkader_data = load_yaml(begrippen_yaml_path)
+            term_index = TermIndex.from_begrippenkader(begrippenkader_data, inflections)
+            if cache_dir is not None:
+                index_cache.put(disk_key, term_index)
+            logger.info(
+                "Term index built: %d definitions; %s",
+                len({id(entry.record) for entry in term_index.term_map.values()}),
+                ", ".join(f"{len(keys)} {name}" for name, keys in term_index.categories.items()),
+            )
+            if inflections:
+                logger.info(
+                    "Inflection matching enabled; %d of %d meervoudsvormen follow the rules",
+                    len(term_index.regular_variants()),
+                    len(term_index.categories["meervoudsvormen"]),
+                )
+        self.term_indexes[cache_key] = term_index
+        return term_index
+
+    def enrich_and_export(
+        self,
+        source_path,
+        begrippen_yaml_path,
+        output_path,
+        once_per_page=False,
+        jobs=1,
+        cache_dir=None,
+        output_mode="inline",
+        inflections=False,
+        tooltip_budget=None,
+        profile_path=None,
+        source_data=None,
+        visitors=(),
+    ):
         """
         Enrich a DPIA YAML file with definitions and export as JSON.
 
@@ -519,9 +2055,35 @@ class DefinitionEnricher:
             once_per_page: When True, enrich each definition at most once per
                 page (top-level task). When False (default), enrich every
                 occurrence.
+            jobs: Number of worker processes that enrich the top-level tasks;
+                1 (default) enriches sequentially, 0 uses all CPU cores. The
+                output is identical either way.
+            cache_dir: Optional directory for the persistent build cache. The
+                compiled term index is stored per begrippenkader content, and
+                pages whose content, begrippenkader, mode and enricher version
+                are unchanged since an earlier run are copied from the cache.
+            output_mode: "inline" (default) embeds the tooltip HTML at every
+                matched term. "references" emits a compact marker per term and
+                writes each definition once into a top-level "definitions"
+                table; the size reduction is logged.
+            inflections: Also enrich regular Dutch plural and diminutive forms
+                of the hoofdtermen that the begrippenkader does not list.
+                Explicit meervoudsvormen keep precedence.
+            tooltip_budget: Optional TooltipBudget limiting the tooltips per
+                field, per page and per term per page; the number of
+                suppressed matches is logged.
+            profile_path: Optional path of a term profile report (JSON); a
+                text version is written next to it with a .txt suffix. While
+                profiling, the memo and the page cache are bypassed so every
+                field is measured. See TermProfiler.
+            source_data: The already loaded source document, to skip parsing
+                source_path again. It is enriched in place; source_path then
+                only determines the file type.
+            visitors: TaskVisitors of other stages that share the enrichment
+                traversal, see process_dpia.
 
         Returns:
-            None
+            The enriched document
         """
         # Ensure output directory exists
         output_dir = Path(output_path).parent
@@ -530,52 +2092,131 @@ class DefinitionEnricher:
             logger.info("Output directory created: %s", output_dir)
 
         # Load the YAML files
-        logger.info("Reading input YAML from: %s", source_path)
-        dpia_data = load_yaml(source_path)
+        if source_data is None:
+            logger.info("Reading input YAML from: %s", source_path)
+            dpia_data = load_yaml(source_path)
+        else:
+            dpia_data = source_data
 
-        logger.info("Reading begrippenkader from: %s", begrippen_yaml_path)
-        begrippenkader_data = load_yaml(begrippen_yaml_path)
+        # Compile the begrippenkader into a term index (once per path)
+        term_index = self.load_term_index(begrippen_yaml_path, inflections, cache_dir)
 
         logger.info("YAML files successfully loaded.")
 
-        # Create a map of terms to their definitions
-        term_map = create_term_map(begrippenkader_data)
-
-        # Count terms by category for logging
-        hoofdtermen = []
-        alt_spellingen = []
-        alt_termen = []
-
-        for term_key, term_data in term_map.items():
-            if term_data.get("is_alternatief_spelling", False):
-                alt_spellingen.append(term_key)
-            elif term_data.get("is_alternatief_term", False):
-                alt_termen.append(term_key)
-            else:
-                hoofdtermen.append(term_key)
-
         # Determine if it's a DPIA or PreScan based on the filename
         file_type = "PrescanDPIA" if "prescan" in str(source_path).lower() else "DPIA"
         mode = "once-per-page" if once_per_page else "every occurrence"
         logger.info("Processing %s data (definition mode: %s)...", file_type, mode)
 
-        # Process the DPIA data and inject terms
-        processed_dpia = process_dpia(dpia_data, term_map, once_per_page)
+        # Process the DPIA data and inject terms; recurring strings (option
+        # labels, repeated descriptions) are enriched once per build.
+        memo = EnrichmentMemo()
+        profiler = None if profile_path is None else TermProfiler()
+        page_cache = None
+        if cache_dir is not None and profiler is None:
+            options = {
+                "once_per_page": once_per_page,
+                "output_mode": output_mode,
+                "tooltip_budget": None if tooltip_budget is None else tooltip_budget.limits(),
+            }
+            page_cache = PageCache(
+                cache_dir,
+                ENRICHER_VERSION,
+                term_index.fingerprint,
+                options,
+                scope=(str(Path(source_path).resolve()), options),
+            )
+        # The loaded document is owned by this call, so it is enriched in place
+        processed_dpia = enrich_document(
+            dpia_data,
+            term_index,
+            once_per_page,
+            output_mode=output_mode,
+            memo=memo,
+            jobs=jobs,
+            page_cache=page_cache,
+            budget=tooltip_budget,
+            profiler=profiler,
+            visitors=visitors,
+        )
 
         logger.info("%s data processed and terms injected.", file_type)
+        logger.info("Enrichment memo: %(hits)d hits, %(misses)d misses", memo.stats())
+        if tooltip_budget is not None:
+            # Pages reused from the page cache were not matched in this run
+            logger.info(
+                "Tooltip budget (%s): %d candidate matches suppressed, %d fields not matched "
+                "in enriched pages",
+                ", ".join(
+                    f"{name} {limit}"
+                    for name, limit in tooltip_budget.limits().items()
+                    if limit is not None
+                ),
+                tooltip_budget.suppressed,
+                tooltip_budget.skipped_fields,
+            )
+        if page_cache is not None:
+            logger.info(
+                "Page cache: %d pages reused, %d recomputed, %d outdated entries pruned",
+                page_cache.reused,
+                page_cache.recomputed,
+                page_cache.prune(),
+            )
+        if profiler is not None:
+            self._write_profile(profiler, term_index, profile_path)
 
         # Convert to JSON
         json_output = json.dumps(processed_dpia, indent=2, ensure_ascii=False)
+        if output_mode == "references":
+            self._log_size_reduction(file_type, processed_dpia, term_index, json_output)
 
-        # Write the output to a file
+        # Write the output to a file; replaced atomically so a dev server
+        # watching it never reads a partial file
         logger.info("Writing output to: %s", output_path)
-        with Path(output_path).open("w", encoding="utf-8") as file:
-            file.write(json_output)
+        write_atomic(Path(output_path), json_output)
 
         logger.info("Successfully enriched and exported to: %s", output_path)
 
         return processed_dpia
 
+    @staticmethod
+    def _write_profile(profiler, term_index, profile_path):
+        """Write the term profile as JSON and as text, and log the hottest terms."""
+        report = profiler.report(term_index)
+        profile_path = Path(profile_path)
+        profile_path.parent.mkdir(parents=True, exist_ok=True)
+        profile_path.write_text(
+            json.dumps(report, indent=2, ensure_ascii=False) + "\n", encoding="utf-8"
+        )
+        profile_path.with_suffix(".txt").write_text(
+            TermProfiler.format_report(report), encoding="utf-8"
+        )
+        logger.info(
+            "Term profile written to %s: %d terms matched, %d never matched; hottest: %s",
+            profile_path,
+            len(report["terms"]),
+            len(report["never_matched"]),
+            ", ".join(entry["term"] for entry in report["terms"][:5]),
+        )
+
+    @staticmethod
+    def _log_size_reduction(file_type, processed_dpia, term_index, json_output):
+        """Log how much smaller the "references" output is than the inline output."""
+        inline_document = expand_definition_references(
+            {key: value for key, value in processed_dpia.items() if key != "definitions"},
+            term_index,
+        )
+        inline_size = len(json.dumps(inline_document, indent=2, ensure_ascii=False).encode("utf-8"))
+        size = len(json_output.encode("utf-8"))
+        logger.info(
+            "%s definitions table: %d definitions, output %d bytes instead of %d inline (-%.1f%%)",
+            file_type,
+            len(processed_dpia["definitions"]),
+            size,
+            inline_size,
+            100 * (inline_size - size) / inline_size if inline_size else 0.0,
+        )
+
 
 def main():
     # Set up argument parser for custom paths with new parameter names
@@ -597,7 +2238,55 @@ def main():
         help="Injecteer elke definitie maximaal één keer per pagina (deel) "
         "in plaats van bij elke voorkomen.",
     )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="Aantal processen dat de delen (pagina's) parallel verrijkt; 0 gebruikt alle "
+        "processorkernen (standaard: 1, sequentieel).",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        type=Path,
+        help="Map voor de verrijkingscache; ongewijzigde delen worden uit de cache "
+        "overgenomen in plaats van opnieuw verrijkt.",
+    )
+    parser.add_argument(
+        "--definitions-output",
+        choices=OUTPUT_MODES,
+        default="inline",
+        help="'inline' (standaard) neemt de volledige tooltip op bij elk begrip; 'references' "
+        "verwijst naar een gedeelde tabel 'definitions' in de output.",
+    )
+    parser.add_argument(
+        "--definitions-inflections",
+        action="store_true",
+        help="Herken ook regelmatige meervouds- en verkleinvormen van hoofdtermen die niet "
+        "in het begrippenkader staan.",
+    )
+    parser.add_argument(
+        "--max-tooltips-per-field", type=int, help="Maximaal aantal definities per veld."
+    )
+    parser.add_argument(
+        "--max-tooltips-per-page", type=int, help="Maximaal aantal definities per pagina (deel)."
+    )
+    parser.add_argument(
+        "--max-tooltips-per-term-per-page",
+        type=int,
+        help="Maximaal aantal keer dat dezelfde definitie op een pagina (deel) wordt toegevoegd.",
+    )
+    parser.add_argument(
+        "--profile-terms",
+        type=Path,
+        help="Schrijf per begrip een profiel (pogingen, treffers, afwijzingen, tijd) naar dit "
+        "JSON-bestand, met een tekstversie (.txt) ernaast.",
+    )
     args = parser.parse_args()
+    limits = (
+        args.max_tooltips_per_field,
+        args.max_tooltips_per_page,
+        args.max_tooltips_per_term_per_page,
+    )
 
     try:
         # Create a DefinitionEnricher instance and use it
@@ -607,6 +2296,12 @@ def main():
             args.definitions,
             args.output,
             once_per_page=args.definitions_once_per_page,
+            jobs=args.jobs,
+            cache_dir=args.cache_dir,
+            output_mode=args.definitions_output,
+            inflections=args.definitions_inflections,
+            tooltip_budget=TooltipBudget(*limits) if any(x is not None for x in limits) else None,
+            profile_path=args.profile_terms,
         )
 
     except Exception as e:
@@ -0,0 +1,469 @@
+#!/usr/bin/env python3
+"""Differential check of the active enrichment engine against the reference engine.
+
+Runs the frozen reference engine (reference_enricher.inject_terms) and the
+active engine (definition_enricher.inject_terms) side by side on every field
+that process_dpia enriches, in the same order and with the same page rules,
+and compares the results field by field. For every divergence it records a
+minimal reproduction: the smallest text and set of terms found that still
+make the engines disagree.
+
+The active engine deliberately diverges from the reference (it does not
+lose matches after an earlier tooltip, see reference_enricher), so known
+divergences are accepted through a checked-in baseline
+(enrichment_diff_baseline.json). Each entry names the source, the mode, the
+field path and the terms only one engine enriched, with its classification,
+and a digest of both outputs: any change in an accepted field, even one that
+keeps the same divergent terms, has to be accepted again.
+
+Usage:
+    python script/enrichment_diff.py --source sources/dpia.yaml \\
+        --definitions sources/begrippenkader_dpia.yaml --report diff.json
+
+Exits with status 1 when the engines diverge on a field in a way the
+baseline does not accept. Run with --update-baseline to accept the current
+divergences of the compared sources after reviewing them.
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import re
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+import reference_enricher
+from definition_enricher import TermIndex, create_term_map, inject_terms, load_yaml
+
+logger = logging.getLogger(__name__)
+
+MODES = {"every-occurrence": False, "once-per-page": True}
+
+DEFAULT_BASELINE = Path(__file__).parent / "enrichment_diff_baseline.json"
+
+# Text of a definition span in the inline output
+_ENRICHED_TERM_PATTERN = re.compile(
+    r'<span class="aiv-definition">([^<]*)<span class="aiv-definition-text">'
+)
+
+# Classification of a divergence, see classify_divergence
+CLASSIFICATIONS = {
+    "missed-by-reference": "only the active engine enriches these terms: the reference engine "
+    "loses matches after an earlier tooltip in the same field",
+    "cascade": "follows from an earlier divergence on the same page (once-per-page mode)",
+    "changed": "the engines enrich different terms",
+}
+
+_OPTION_TYPES = ("checkbox_option", "radio_option")
+
+
+def iter_enrichable_fields(document):
+    """Yield every field that process_dpia enriches, in processing order.
+
+    Yields:
+        ``(path, text, page)`` tuples. ``path`` is the tuple of keys and list
+        indexes leading to the field, ``page`` the index of the top-level task
+        whose page state applies, or None for fields that are always enriched
+        at every occurrence (the document description and unresolved
+        ``contains`` dependency values).
+    """
+    if isinstance(document.get("description"), str):
+        yield ("description",), document["description"], None
+    if isinstance(document.get("tasks"), list):
+        for index, task in enumerate(document["tasks"]):
+            yield from _iter_task_fields(task, ("tasks", index), 0, index)
+
+
+def _iter_task_fields(task, path, level, page):
+    keys = ("description",) if level == 0 else ("task", "description")
+    for key in keys:
+        if isinstance(task.get(key), str):
+            yield (*path, key), task[key], page
+
+    task_type = task.get("type", [])
+    if isinstance(task_type, str):
+        task_type = [task_type]
+    if (
+        isinstance(task_type, list)
+        and any(t in _OPTION_TYPES for t in task_type)
+        and isinstance(task.get("options"), list)
+    ):
+        for index, option in enumerate(task["options"]):
+            for key in ("value", "label"):
+                if isinstance(option.get(key), str):
+                    yield (*path, "options", index, key), option[key], page
+
+    if isinstance(task.get("dependencies"), list):
+        for index, dependency in enumerate(task["dependencies"]):
+            if (
+                isinstance(dependency, dict)
+                and dependency.get("type") == "conditional"
+                and dependency.get("condition", {}).get("operator") == "contains"
+                and isinstance(dependency["condition"].get("value"), str)
+                and "option_index" not in dependency["condition"]
+            ):
+                value_path = (*path, "dependencies", index, "condition", "value")
+                yield value_path, dependency["condition"]["value"], None
+
+    if isinstance(task.get("tasks"), list):
+        for index, subtask in enumerate(task["tasks"]):
+            yield from _iter_task_fields(subtask, (*path, "tasks", index), level + 1, page)
+
+
+def _reference_term_map(term_map):
+    """The term map in the plain-dict form the reference engine was written for."""
+    return {key: dict(entry) for key, entry in term_map.items()}
+
+
+def _relevant_terms(text, term_map):
+    """Term keys that can possibly match in ``text`` (their surface form occurs in it)."""
+    folded = text.lower()
+    return [
+        key
+        for key, entry in term_map.items()
+        if key and (key in folded or (entry.term.isupper() and entry.term in text))
+    ]
+
+
+def _run_both(text, term_map, already_matched):
+    reference = reference_enricher.inject_terms(
+        text,
+        _reference_term_map(term_map),
+        None if already_matched is None else set(already_matched),
+    )
+    active = inject_terms(
+        text, TermIndex(term_map), None if already_matched is None else set(already_matched)
+    )
+    return reference, active
+
+
+def minimize_divergence(text, term_map, already_matched=None, max_steps=2000):
+    """Shrink a divergent field to a minimal reproduction.
+
+    First drops every term that is not needed for the divergence, then
+    removes as much of the text as possible (whole words, then characters
+    around the remaining words).
+
+    Args:
+        text: The field text on which the engines diverge
+        term_map: Term map of TermEntry
+        already_matched: Terms matched earlier on the page (once-per-page
+            mode), or None for every-occurrence mode
+        max_steps: Upper bound on the number of engine runs
+
+    Returns:
+        Dict with the minimal text, terms, page state and both outputs, or
+        None if the engines agree on ``text``.
+    """
+    steps = 0
+
+    def diverges(candidate_text, keys):
+        nonlocal steps
+        steps += 1
+        sub_map = {key: term_map[key] for key in keys}
+        matched = None if already_matched is None else set(already_matched) & set(keys)
+        reference, active = _run_both(candidate_text, sub_map, matched)
+        return reference != active
+
+    keys = _relevant_terms(text, term_map)
+    if not diverges(text, keys):
+        keys = list(term_map)
+        if not diverges(text, keys):
+            return None
+
+    for key in list(keys):
+        if steps >= max_steps:
+            break
+        remaining = [k for k in keys if k != key]
+        if diverges(text, remaining):
+            keys = remaining
+
+    # Remove chunks of words, halving the chunk size (a simple ddmin)
+    tokens = re.split(r"(\s+)", text)
+    chunk = max(1, len(tokens) // 2)
+    while chunk >= 1 and steps < max_steps:
+        index = 0
+        while index < len(tokens) and steps < max_steps:
+            candidate = tokens[:index] + tokens[index + chunk :]
+            if candidate and diverges("".join(candidate), keys):
+                tokens = candidate
+            else:
+                index += chunk
+        chunk //= 2
+    text = "".join(tokens)
+
+    sub_map = {key: term_map[key] for key in keys}
+    matched = None if already_matched is None else sorted(set(already_matched) & set(keys))
+    reference, active = _run_both(text, sub_map, matched)
+    return {
+        "text": text,
+        "terms": {key: dict(entry) for key, entry in sub_map.items()},
+        "already_matched": matched,
+        "reference": reference,
+        "active": active,
+    }
+
+
+def compare_engines(document, term_map, once_per_page=False, minimize=True):
+    """Run both engines on every enrichable field of ``document`` and diff the results.
+
+    Each engine keeps its own page state, so a divergence in once-per-page
+    mode can cause follow-up divergences later on the same page; those are
+    marked as cascades and are not minimized.
+
+    Args:
+        document: Parsed assessment source (dpia.yaml, prescan.yaml, iama.yaml)
+        term_map: Term map of TermEntry, as returned by create_term_map
+        once_per_page: Compare in once-per-page instead of every-occurrence mode
+        minimize: Attach a minimal reproduction to every divergence
+
+    Returns:
+        Dict with the number of fields, the time spent per engine and the
+        list of divergences.
+    """
+    reference_map = _reference_term_map(term_map)
+    term_index = TermIndex(term_map)
+    reference_pages = {}
+    active_pages = {}
+    timings = {"reference": 0.0, "active": 0.0}
+    divergences = []
+    fields = 0
+
+    for path, text, page in iter_enrichable_fields(document):
+        fields += 1
+        if once_per_page and page is not None:
+            reference_matched = reference_pages.setdefault(page, set())
+            active_matched = active_pages.setdefault(page, set())
+        else:
+            reference_matched = active_matched = None
+        before = None if reference_matched is None else frozenset(reference_matched)
+        cascade = reference_matched != active_matched
+
+        started = time.perf_counter()
+        reference = reference_enricher.inject_terms(text, reference_map, reference_matched)
+        timings["reference"] += time.perf_counter() - started
+        started = time.perf_counter()
+        active = inject_terms(text, term_index, active_matched)
+        timings["active"] += time.perf_counter() - started
+
+        if reference == active:
+            continue
+        divergence = {
+            "path": list(path),
+            "text": text,
+            "cascade": cascade,
+            "reference": reference,
+            "active": active,
+            "terms": divergent_terms(reference, active),
+        }
+        divergence["classification"] = classify_divergence(divergence)
+        if minimize and not cascade:
+            divergence["repro"] = minimize_divergence(text, term_map, before)
+        divergences.append(divergence)
+
+    return {
+        "mode": "once-per-page" if once_per_page else "every-occurrence",
+        "fields": fields,
+        "seconds": {name: round(value, 6) for name, value in timings.items()},
+        "divergences": divergences,
+    }
+
+
+def divergent_terms(reference, active):
+    """Return the enriched terms (casefolded) that differ between the two outputs.
+
+    Returns:
+        Dict with "added" (enriched more often by the active engine) and
+        "removed" (enriched more often by the reference engine), both sorted
+    """
+    reference_terms = Counter(term.casefold() for term in _ENRICHED_TERM_PATTERN.findall(reference))
+    active_terms = Counter(term.casefold() for term in _ENRICHED_TERM_PATTERN.findall(active))
+    return {
+        "added": sorted(active_terms - reference_terms),
+        "removed": sorted(reference_terms - active_terms),
+    }
+
+
+def classify_divergence(divergence):
+    """Classify a divergence of compare_engines, see CLASSIFICATIONS."""
+    if divergence["cascade"]:
+        return "cascade"
+    terms = divergence["terms"]
+    if terms["added"] and not terms["removed"]:
+        return "missed-by-reference"
+    return "changed"
+
+
+def output_digest(divergence):
+    """Return the SHA-256 hex digest of the reference and active output of a divergence."""
+    outputs = json.dumps([divergence["reference"], divergence["active"]], ensure_ascii=False)
+    return hashlib.sha256(outputs.encode("utf-8")).hexdigest()
+
+
+def baseline_entry(source, mode, divergence):
+    """Turn a divergence of ``source`` in ``mode`` into a baseline entry."""
+    return {
+        "source": Path(source).name,
+        "mode": mode,
+        "path": divergence["path"],
+        "added": divergence["terms"]["added"],
+        "removed": divergence["terms"]["removed"],
+        "classification": divergence["classification"],
+        "digest": output_digest(divergence),
+    }
+
+
+def _entry_key(entry):
+    # Entries without a digest (older baselines) match nothing and are replaced
+    # by --update-baseline
+    return (
+        entry["source"],
+        entry["mode"],
+        tuple(entry["path"]),
+        tuple(entry["added"]),
+        tuple(entry["removed"]),
+        entry.get("digest"),
+    )
+
+
+def baseline_key(source, mode, divergence):
+    """Identify a divergence by source, mode, field path, divergent terms and output digest."""
+    return _entry_key(baseline_entry(source, mode, divergence))
+
+
+def load_baseline(path):
+    """Return the accepted divergences of a baseline file by baseline_key; {} if it is missing."""
+    if not Path(path).exists():
+        return {}
+    entries = json.loads(Path(path).read_text(encoding="utf-8"))["accepted"]
+    return {_entry_key(entry): entry for entry in entries}
+
+
+def baseline_entries(report):
+    """Turn the divergences of a report into baseline entries."""
+    return [
+        baseline_entry(result["source"], result["mode"], divergence)
+        for result in report
+        for divergence in result["divergences"]
+    ]
+
+
+def write_baseline(path, report, baseline):
+    """Accept the divergences in ``report``, replacing the baseline entries of its sources."""
+    compared = {(Path(result["source"]).name, result["mode"]) for result in report}
+    entries = [
+        entry for entry in baseline.values() if (entry["source"], entry["mode"]) not in compared
+    ]
+    entries += baseline_entries(report)
+    entries.sort(
+        key=lambda entry: (entry["source"], entry["mode"], [str(x) for x in entry["path"]])
+    )
+    Path(path).write_text(
+        json.dumps({"accepted": entries}, indent=2, ensure_ascii=False) + "\n", encoding="utf-8"
+    )
+
+
+def new_divergences(report, baseline):
+    """Return the divergences of ``report`` that the baseline does not accept.
+
+    Returns:
+        List of ``(source, mode, divergence)`` tuples
+    """
+    return [
+        (result["source"], result["mode"], divergence)
+        for result in report
+        for divergence in result["divergences"]
+        if baseline_key(result["source"], result["mode"], divergence) not in baseline
+    ]
+
+
+def format_summary(source, result):
+    """One-line summary of a compare_engines result."""
+    seconds = result["seconds"]
+    cascades = sum(divergence["cascade"] for divergence in result["divergences"])
+    speedup = seconds["reference"] / seconds["active"] if seconds["active"] else float("inf")
+    return (
+        f"{source} ({result['mode']}): {len(result['divergences'])} of {result['fields']} "
+        f"fields differ ({cascades} cascades); reference {seconds['reference'] * 1000:.1f} ms, "
+        f"active {seconds['active'] * 1000:.1f} ms ({speedup:.1f}x)"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare the active definition enricher with the frozen reference engine."
+    )
+    parser.add_argument(
+        "--source", type=Path, required=True, nargs="+", help="Source YAML file(s) to compare"
+    )
+    parser.add_argument(
+        "--definitions", type=Path, required=True, help="Path to the begrippenkader YAML file"
+    )
+    parser.add_argument(
+        "--mode",
+        choices=[*MODES, "both"],
+        default="both",
+        help="Definition mode to compare (default: both)",
+    )
+    parser.add_argument("--report", type=Path, help="Write the full JSON report to this file")
+    parser.add_argument(
+        "--no-minimize", action="store_true", help="Skip the minimal reproductions (faster)"
+    )
+    parser.add_argument(
+        "--baseline",
+        type=Path,
+        default=DEFAULT_BASELINE,
+        help=f"File with the accepted divergences (default: {DEFAULT_BASELINE.name})",
+    )
+    parser.add_argument(
+        "--update-baseline",
+        action="store_true",
+        help="Accept the current divergences of the compared sources in the baseline",
+    )
+    args = parser.parse_args()
+
+    term_map = create_term_map(load_yaml(args.definitions))
+    modes = list(MODES) if args.mode == "both" else [args.mode]
+    report = []
+    for source in args.source:
+        document = load_yaml(source)
+        for mode in modes:
+            result = compare_engines(document, term_map, MODES[mode], minimize=not args.no_minimize)
+            logger.info(format_summary(source, result))
+            report.append({"source": str(source), **result})
+
+    if args.report:
+        args.report.parent.mkdir(parents=True, exist_ok=True)
+        args.report.write_text(
+            json.dumps(report, indent=2, ensure_ascii=False) + "\n", encoding="utf-8"
+        )
+        logger.info("Report written to %s", args.report)
+
+    baseline = load_baseline(args.baseline)
+    if args.update_baseline:
+        write_baseline(args.baseline, report, baseline)
+        logger.info("Baseline written to %s", args.baseline)
+        sys.exit(0)
+
+    new = new_divergences(report, baseline)
+    for source, mode, divergence in new:
+        logger.error(
+            "New divergence in %s (%s) at %s: %s, added %s, removed %s",
+            source,
+            mode,
+            divergence["path"],
+            divergence["classification"],
+            divergence["terms"]["added"],
+            divergence["terms"]["removed"],
+        )
+    accepted = sum(len(result["divergences"]) for result in report) - len(new)
+    logger.info("%d divergences accepted by %s, %d new", accepted, args.baseline.name, len(new))
+    sys.exit(1 if new else 0)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    main()
@@ -0,0 +1,156 @@
+"""Wait for changes to a set of input files, for run_all --watch.
+
+FileWatcher compares a stat() signature (modification time, size, inode) of
+every watched file. On Linux it also registers inotify watches, through
+ctypes, on the directories of the files, so a write or an editor's
+write-and-rename wakes it up immediately. Polling keeps running alongside
+inotify because bind mounts in dev containers do not always deliver inotify
+events; without inotify the poll interval bounds the latency.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import sys
+import time
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+# inotify event mask (linux/inotify.h): anything that can replace or change a file
+_IN_MODIFY = 0x002
+_IN_ATTRIB = 0x004
+_IN_CLOSE_WRITE = 0x008
+_IN_MOVED_FROM = 0x040
+_IN_MOVED_TO = 0x080
+_IN_CREATE = 0x100
+_IN_DELETE = 0x200
+_WATCH_MASK = (
+    _IN_MODIFY
+    | _IN_ATTRIB
+    | _IN_CLOSE_WRITE
+    | _IN_MOVED_FROM
+    | _IN_MOVED_TO
+    | _IN_CREATE
+    | _IN_DELETE
+)
+
+
+def file_signature(path: Path) -> tuple[int, int, int] | None:
+    """Return what identifies the current version of ``path``, None if missing."""
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+
+def _open_inotify(directories: list[Path]) -> int | None:
+    """Return an inotify file descriptor watching ``directories``, or None."""
+    if not sys.platform.startswith("linux"):
+        return None
+    import ctypes
+
+    try:
+        # The running interpreter links libc (glibc or musl)
+        libc = ctypes.CDLL(None, use_errno=True)
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+    except (OSError, AttributeError) as e:
+        logger.debug("inotify unavailable: %s", e)
+        return None
+    if fd < 0:
+        logger.debug("inotify unavailable: %s", os.strerror(ctypes.get_errno()))
+        return None
+    for directory in directories:
+        if libc.inotify_add_watch(fd, os.fsencode(directory), _WATCH_MASK) < 0:
+            logger.debug(
+                "Cannot watch %s with inotify: %s", directory, os.strerror(ctypes.get_errno())
+            )
+    return fd
+
+
+class FileWatcher:
+    """Reports which of a set of files changed since the previous check.
+
+    Usable as a context manager; close() releases the inotify descriptor.
+    """
+
+    def __init__(
+        self,
+        paths,
+        interval: float = 0.25,
+        debounce: float = 0.05,
+        use_inotify: bool = True,
+    ) -> None:
+        """
+        Args:
+            paths: The files to watch; they do not need to exist yet
+            interval: Seconds between stat() polls
+            debounce: Seconds to wait after a change for related writes
+                (e.g. a file and the begrippenkader saved together)
+            use_inotify: Use inotify where available, next to polling
+        """
+        self.paths = list(dict.fromkeys(Path(path) for path in paths))
+        self.interval = interval
+        self.debounce = debounce
+        self.signatures = {path: file_signature(path) for path in self.paths}
+        directories = list(dict.fromkeys(path.parent for path in self.paths))
+        self.inotify_fd = _open_inotify(directories) if use_inotify else None
+
+    def __enter__(self) -> FileWatcher:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if self.inotify_fd is not None:
+            os.close(self.inotify_fd)
+            self.inotify_fd = None
+
+    def changed(self) -> set[Path]:
+        """Return the watched files that changed, appeared or disappeared since the last call."""
+        changed = set()
+        for path in self.paths:
+            signature = file_signature(path)
+            if signature != self.signatures[path]:
+                self.signatures[path] = signature
+                changed.add(path)
+        return changed
+
+    def _sleep(self, timeout: float) -> None:
+        """Sleep up to ``timeout`` seconds, waking up early on an inotify event."""
+        if self.inotify_fd is None:
+            time.sleep(timeout)
+            return
+        import select
+
+        readable, _, _ = select.select([self.inotify_fd], [], [], timeout)
+        if readable:
+            # The events only serve as a wake-up; changed() compares signatures
+            try:
+                while os.read(self.inotify_fd, 65536):
+                    pass
+            except BlockingIOError:
+                pass
+
+    def wait(self, timeout: float | None = None) -> set[Path]:
+        """
+        Block until one or more watched files change, and return them.
+
+        Args:
+            timeout: Give up after this many seconds and return an empty set;
+                None waits indefinitely
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            changed = self.changed()
+            if changed:
+                # Collect the rest of a burst of saves before reporting
+                time.sleep(self.debounce)
+                return changed | self.changed()
+            remaining = self.interval if deadline is None else deadline - time.monotonic()
+            if remaining <= 0:
+                return set()
+            self._sleep(min(self.interval, remaining))
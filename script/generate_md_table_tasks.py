@@ -3,29 +3,22 @@ import logging
 import sys
 from pathlib import Path
 
-import yaml
+from task_tree import TaskVisitor, walk_tasks
 
 logger = logging.getLogger(__name__)
 
 
-def extract_task_info(task, parent_path=""):
+def task_row(task, current_path):
     """
-    Recursively extract information from tasks and their subtasks.
+    Build the table row of a single task.
 
     Args:
         task: The task dictionary
-        parent_path: The path to this task for display purposes
+        current_path: Display path of the task, including its own text
 
     Returns:
-        List of dictionaries containing task information
+        Dictionary containing the task information
     """
-    result = []
-
-    # Skip tasks that don't have an ID
-    if "id" not in task:
-        return result
-
-    task_id = task["id"]
     task_text = task.get("task", "")
     task_description = task.get("description", "")
     task_type = (
@@ -34,8 +27,7 @@ def extract_task_info(task, parent_path=""):
         else task.get("type", "")
     )
 
-    # Calculate display path for the visual hierarchy (not affecting the ID)
-    current_path = parent_path + " > " + task_text if parent_path else task_text
+    # Display depth for the visual hierarchy (not affecting the ID)
     display_depth = current_path.count(">")
 
     # Extract options if available
@@ -72,25 +64,56 @@ def extract_task_info(task, parent_path=""):
 
     related_str = "; ".join(related) if related else ""
 
-    # Add current task to results
-    result.append(
-        {
-            "id": task_id,
-            "text": task_text,
-            "description": task_description,
-            "type": task_type,
-            "options": options_str,
-            "related": related_str,
-            "depth": display_depth,
-        }
-    )
+    return {
+        "id": task["id"],
+        "text": task_text,
+        "description": task_description,
+        "type": task_type,
+        "options": options_str,
+        "related": related_str,
+        "depth": display_depth,
+    }
+
+
+class TaskRowVisitor(TaskVisitor):
+    """Collects the table rows of all tasks during a task_tree walk.
+
+    Tasks without an ID are skipped together with their subtasks.
+    """
+
+    def __init__(self, parent_path=""):
+        self.rows = []
+        # Display path per entered task; None for skipped subtrees
+        self._paths = [parent_path]
+
+    def enter_task(self, task, context):
+        parent_path = self._paths[-1]
+        if parent_path is None or "id" not in task:
+            self._paths.append(None)
+            return
+        task_text = task.get("task", "")
+        current_path = parent_path + " > " + task_text if parent_path else task_text
+        self._paths.append(current_path)
+        self.rows.append(task_row(task, current_path))
 
-    # Process subtasks recursively
-    if task.get("tasks"):
-        for subtask in task["tasks"]:
-            result.extend(extract_task_info(subtask, current_path))
+    def leave_task(self, task, context):
+        self._paths.pop()
 
-    return result
+
+def extract_task_info(task, parent_path=""):
+    """
+    Recursively extract information from tasks and their subtasks.
+
+    Args:
+        task: The task dictionary
+        parent_path: The path to this task for display purposes
+
+    Returns:
+        List of dictionaries containing task information
+    """
+    visitor = TaskRowVisitor(parent_path)
+    walk_tasks([task], [visitor])
+    return visitor.rows
 
 
 def process_yaml_file(file_path):
@@ -101,25 +124,34 @@ def process_yaml_file(file_path):
         file_path: Path to the YAML file
 
     Returns:
-        List of dictionaries containing task information
+        Tuple of the list of task information dictionaries and the document name
+
+    Raises:
+        OSError: If the file cannot be read
+        yaml.YAMLError: If the file is not valid YAML
     """
-    try:
-        with Path(file_path).open(encoding="utf-8") as f:
-            data = yaml.safe_load(f)
+    import yaml
 
-        all_tasks = []
+    with Path(file_path).open(encoding="utf-8") as f:
+        data = yaml.safe_load(f)
 
-        if "tasks" in data:
-            for task in data["tasks"]:
-                all_tasks.extend(extract_task_info(task))
+    return process_yaml_data(data, Path(file_path).name)
 
-        return all_tasks, data.get("name", Path(file_path).name)
-    except yaml.YAMLError as e:
-        logger.error("Error parsing YAML file: %s", e)
-        sys.exit(1)
-    except Exception as e:
-        logger.error("Error processing file: %s", e)
-        sys.exit(1)
+
+def process_yaml_data(data, default_name):
+    """
+    Extract task information from an already loaded YAML document.
+
+    Args:
+        data: The parsed YAML document
+        default_name: Name to use when the document has no name
+
+    Returns:
+        Tuple of the list of task information dictionaries and the document name
+    """
+    visitor = TaskRowVisitor()
+    walk_tasks(data.get("tasks"), [visitor])
+    return visitor.rows, data.get("name", default_name)
 
 
 def generate_markdown_table(tasks, file_name):
@@ -221,7 +253,16 @@ def main():
         logger.error("Error: Source file not found: %s", yaml_file)
         sys.exit(1)
 
-    tasks, file_name = process_yaml_file(yaml_file)
+    import yaml
+
+    try:
+        tasks, file_name = process_yaml_file(yaml_file)
+    except yaml.YAMLError as e:
+        logger.error("Error parsing YAML file: %s", e)
+        sys.exit(1)
+    except Exception as e:
+        logger.error("Error processing file: %s", e)
+        sys.exit(1)
     md_content = generate_markdown_table(tasks, file_name)
 
     # Write the result to a Markdown file
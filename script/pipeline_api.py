@@ -0,0 +1,159 @@
+"""In-process API for the assessment pipeline.
+
+build() validates, enriches and renders one source document held in memory,
+and returns the enriched document, the questions Markdown and the
+diagnostics. It reads and writes no files, does not exit the process and
+adds no logging handlers: the pipeline modules log to their module loggers
+and the application decides where that output goes.
+
+To run many builds in one process, compile each begrippenkader once with
+compile_begrippenkader and pass the TermIndex to every build::
+
+    term_index = compile_begrippenkader(begrippenkader)
+    result = build(source, term_index, schema)
+    if result.ok:
+        use(result.document, result.markdown)
+"""
+
+from __future__ import annotations
+
+import copy
+from dataclasses import dataclass
+from typing import Any
+
+from definition_enricher import (
+    OUTPUT_MODES,
+    EnrichmentMemo,
+    TermIndex,
+    TooltipBudget,
+    enrich_document,
+)
+from generate_md_table_tasks import TaskRowVisitor, generate_markdown_table
+from schema_validator import schema_errors
+
+
+@dataclass(frozen=True, slots=True)
+class Diagnostic:
+    """A message about a build."""
+
+    level: str
+    """"error" (the build failed) or "info"."""
+    message: str
+
+
+@dataclass(frozen=True, slots=True)
+class BuildResult:
+    """The outcome of build()."""
+
+    document: dict[str, Any] | None
+    """The validated and enriched document; None if the build failed."""
+    markdown: str | None
+    """The questions table; None if it was not requested or the build failed."""
+    diagnostics: tuple[Diagnostic, ...]
+
+    @property
+    def ok(self) -> bool:
+        """Whether the build succeeded, i.e. there are no error diagnostics."""
+        return not any(diagnostic.level == "error" for diagnostic in self.diagnostics)
+
+    @property
+    def errors(self) -> list[str]:
+        """The messages of the error diagnostics."""
+        return [d.message for d in self.diagnostics if d.level == "error"]
+
+
+def compile_begrippenkader(begrippenkader: dict[str, Any], inflections: bool = False) -> TermIndex:
+    """Compile a parsed begrippenkader into a TermIndex that builds can share."""
+    return TermIndex.from_begrippenkader(begrippenkader, inflections)
+
+
+def build(
+    source: dict[str, Any],
+    begrippenkader: TermIndex | dict[str, Any],
+    schema: dict[str, Any] | None = None,
+    *,
+    name: str = "<document>",
+    once_per_page: bool = False,
+    output_mode: str = "inline",
+    tooltip_limits: tuple[int | None, int | None, int | None] | None = None,
+    markdown: bool = True,
+    in_place: bool = False,
+) -> BuildResult:
+    """
+    Validate, enrich and render one source document, like run_all.py does.
+
+    Problems with the document (schema violations, 'contains' conditions
+    that match no option) are reported as error diagnostics rather than
+    raised.
+
+    Args:
+        source: The parsed source document
+        begrippenkader: A compiled TermIndex, or a parsed begrippenkader
+            (compiled for this call only)
+        schema: The parsed JSON schema; None skips validation
+        name: Name of the document in messages, and in the Markdown title
+            if the document has no name
+        once_per_page: Enrich each definition at most once per page (deel)
+        output_mode: "inline" or "references", see DefinitionEnricher.enrich_and_export
+        tooltip_limits: Maximum number of tooltips per field, per page and
+            per term per page; None (or None for a limit) is unlimited
+        markdown: Also render the questions table
+        in_place: Enrich ``source`` itself instead of a copy
+
+    Returns:
+        BuildResult with the enriched document, the Markdown and the diagnostics
+
+    Raises:
+        ValueError: If output_mode is unknown
+    """
+    if output_mode not in OUTPUT_MODES:
+        raise ValueError(f"output_mode must be one of {list(OUTPUT_MODES)}")
+    term_index = (
+        begrippenkader
+        if isinstance(begrippenkader, TermIndex)
+        else compile_begrippenkader(begrippenkader)
+    )
+
+    if schema is not None:
+        errors = schema_errors(source, schema, name)
+        if errors:
+            return BuildResult(None, None, tuple(Diagnostic("error", e) for e in errors))
+
+    document = source if in_place else copy.deepcopy(source)
+    task_rows = TaskRowVisitor() if markdown else None
+    memo = EnrichmentMemo()
+    budget = (
+        TooltipBudget(*tooltip_limits)
+        if tooltip_limits is not None and any(limit is not None for limit in tooltip_limits)
+        else None
+    )
+    try:
+        document = enrich_document(
+            document,
+            term_index,
+            once_per_page,
+            output_mode,
+            memo=memo,
+            budget=budget,
+            visitors=[task_rows] if task_rows is not None else [],
+        )
+    except ValueError as e:
+        return BuildResult(None, None, (Diagnostic("error", str(e)),))
+
+    diagnostics = [
+        Diagnostic("info", "Enrichment memo: {hits} hits, {misses} misses".format(**memo.stats()))
+    ]
+    if budget is not None:
+        diagnostics.append(
+            Diagnostic(
+                "info",
+                f"Tooltip budget: {budget.suppressed} candidate matches suppressed, "
+                f"{budget.skipped_fields} fields not matched",
+            )
+        )
+    rendered = (
+        generate_markdown_table(task_rows.rows, document.get("name", name))
+        if task_rows is not None
+        else None
+    )
+    return BuildResult(document, rendered, tuple(diagnostics))
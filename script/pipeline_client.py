@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""Client for the pipeline server (pipeline_server.py).
+
+Sends build, enrich and validate requests to a running server over its Unix
+domain socket (--socket, by default .cache/pipeline.sock in the repository)
+or, with --port, its localhost HTTP port. Only uses the
+standard library, so a call costs little more than the interpreter start;
+the schemas, begrippenkaders and term indexes stay loaded in the server.
+
+Paths are resolved against the working directory of the client before they
+are sent, so client and server do not need to share one.
+"""
+
+from __future__ import annotations
+
+import argparse
+import http.client
+import json
+import socket
+import sys
+import time
+from pathlib import Path
+from typing import Any
+
+# Unix domain socket the server listens on unless given another socket or a port
+DEFAULT_SOCKET = Path(__file__).resolve().parent.parent / ".cache" / "pipeline.sock"
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    """HTTPConnection over a Unix domain socket."""
+
+    def __init__(self, socket_path: str | Path, timeout: float | None = None) -> None:
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = str(socket_path)
+
+    def connect(self) -> None:
+        # With a timeout the socket is non-blocking, and connecting fails with
+        # BlockingIOError instead of waiting while the listen queue of the
+        # server is full; retry until the timeout has passed.
+        deadline = None if self.timeout is None else time.monotonic() + self.timeout
+        delay = 0.001
+        while True:
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            if self.timeout is not None:
+                self.sock.settimeout(self.timeout)
+            try:
+                self.sock.connect(self.socket_path)
+                return
+            except BlockingIOError:
+                self.sock.close()
+                if deadline is not None and time.monotonic() + delay > deadline:
+                    raise
+            time.sleep(delay)
+            delay = min(delay * 2, 0.1)
+
+
+class PipelineError(Exception):
+    """The server rejected a request or failed to handle it."""
+
+
+class PipelineClient:
+    """Sends requests to a pipeline server.
+
+    Every method performs one HTTP request on a new connection, so a client
+    can be shared between threads.
+    """
+
+    def __init__(
+        self,
+        socket_path: str | Path | None = None,
+        port: int | None = None,
+        timeout: float | None = None,
+    ) -> None:
+        """
+        Args:
+            socket_path: Unix domain socket of the server; DEFAULT_SOCKET if
+                neither a socket nor a port is given
+            port: Localhost HTTP port of the server, instead of a socket
+            timeout: Socket timeout in seconds, None to wait indefinitely
+        """
+        if socket_path is not None and port is not None:
+            raise ValueError("give a socket path or a port, not both")
+        self.socket_path = DEFAULT_SOCKET if socket_path is None and port is None else socket_path
+        self.port = port
+        self.timeout = timeout
+
+    def _connection(self) -> http.client.HTTPConnection:
+        if self.socket_path is not None:
+            return _UnixHTTPConnection(self.socket_path, self.timeout)
+        return http.client.HTTPConnection("127.0.0.1", self.port, timeout=self.timeout)
+
+    def request(self, method: str, path: str, payload: dict[str, Any] | None = None) -> Any:
+        """
+        Send a request and return the decoded JSON response.
+
+        Raises:
+            PipelineError: If the server answers with an error status
+            OSError: If the server cannot be reached
+        """
+        connection = self._connection()
+        try:
+            body = None if payload is None else json.dumps(payload).encode("utf-8")
+            connection.request(method, path, body, {"Content-Type": "application/json"})
+            response = connection.getresponse()
+            result = json.loads(response.read() or b"null")
+        finally:
+            connection.close()
+        if response.status != 200:
+            message = result.get("error") if isinstance(result, dict) else None
+            raise PipelineError(f"{response.status} {response.reason}: {message or result}")
+        return result
+
+    def status(self) -> dict[str, Any]:
+        """Return the server status: uptime, requests handled and loaded inputs."""
+        return self.request("GET", "/status")
+
+    def build(self, **payload: Any) -> list[dict[str, Any]]:
+        """
+        Build assessments; see Pipeline.build in pipeline_server for the payload.
+
+        Returns:
+            Per-assessment results (name, ok, skipped, seconds, error)
+        """
+        return self.request("POST", "/build", payload)["results"]
+
+    def enrich(self, **payload: Any) -> dict[str, Any]:
+        """Enrich a text or a document; see Pipeline.enrich in pipeline_server."""
+        return self.request("POST", "/enrich", payload)
+
+    def validate(self, **payload: Any) -> dict[str, Any]:
+        """Validate a source against a schema; see Pipeline.validate in pipeline_server."""
+        return self.request("POST", "/validate", payload)
+
+
+def _absolute(path: Path | None) -> str | None:
+    return None if path is None else str(path.resolve())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Client for the pipeline server")
+    transport = parser.add_mutually_exclusive_group()
+    transport.add_argument(
+        "--socket",
+        type=Path,
+        help="Unix domain socket of the server (default .cache/pipeline.sock in the repository)",
+    )
+    transport.add_argument(
+        "--port", type=int, help="Localhost HTTP port of the server, instead of a Unix socket"
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("status", help="Show the server status")
+
+    build = commands.add_parser("build", help="Build assessments, like run_all.py")
+    build.add_argument("--manifest", type=Path, help="Build the assessments in this manifest")
+    build.add_argument(
+        "--name", action="append", help="With --manifest: only build this assessment (repeatable)"
+    )
+    build.add_argument("--schema", type=Path)
+    build.add_argument("--source", type=Path)
+    build.add_argument("--begrippen-yaml", type=Path)
+    build.add_argument("--output-json", type=Path)
+    build.add_argument("--output-md", type=Path)
+    build.add_argument("--definitions-once-per-page", action="store_true")
+    build.add_argument("--definitions-output", choices=("inline", "references"))
+    build.add_argument("--definitions-inflections", action="store_true")
+    build.add_argument("--skip-validation", action="store_true")
+    build.add_argument("--no-markdown", action="store_true")
+    build.add_argument("--force", action="store_true")
+
+    enrich = commands.add_parser(
+        "enrich", help="Enrich a text snippet (--text, or standard input) with definitions"
+    )
+    enrich.add_argument("--begrippen-yaml", type=Path, required=True)
+    enrich.add_argument("--text", help="Text to enrich; read from standard input if omitted")
+    enrich.add_argument("--definitions-output", choices=("inline", "references"))
+    enrich.add_argument("--definitions-inflections", action="store_true")
+
+    validate = commands.add_parser("validate", help="Validate a source YAML against a schema")
+    validate.add_argument("--schema", type=Path, required=True)
+    validate.add_argument("--source", type=Path, required=True)
+
+    args = parser.parse_args()
+    client = PipelineClient(args.socket, args.port)
+
+    try:
+        if args.command == "status":
+            sys.stdout.write(json.dumps(client.status(), indent=2) + "\n")
+            sys.exit(0)
+
+        if args.command == "enrich":
+            text = args.text if args.text is not None else sys.stdin.read()
+            result = client.enrich(
+                text=text,
+                begrippenkader=_absolute(args.begrippen_yaml),
+                output_mode=args.definitions_output or "inline",
+                inflections=args.definitions_inflections,
+            )
+            sys.stdout.write(result["text"] + "\n")
+            sys.exit(0)
+
+        if args.command == "validate":
+            result = client.validate(schema=_absolute(args.schema), source=_absolute(args.source))
+            for error in result["errors"]:
+                sys.stderr.write(error + "\n")
+            sys.exit(0 if result["valid"] else 1)
+
+        options = {
+            "skip_validation": args.skip_validation,
+            "inflections": args.definitions_inflections,
+            "markdown": not args.no_markdown,
+            "force": args.force,
+        }
+        if args.definitions_output is not None:
+            options["output_mode"] = args.definitions_output
+        if args.manifest is not None:
+            payload = {"manifest": _absolute(args.manifest), "names": args.name}
+        else:
+            payload = {
+                "assessment": {
+                    "name": args.source.stem if args.source else None,
+                    "source": _absolute(args.source),
+                    "schema": _absolute(args.schema),
+                    "begrippenkader": _absolute(args.begrippen_yaml),
+                    "output_json": _absolute(args.output_json),
+                    "output_md": _absolute(args.output_md),
+                    "definitions_once_per_page": args.definitions_once_per_page,
+                }
+            }
+        results = client.build(**payload, options=options)
+    except (OSError, PipelineError) as e:
+        sys.stderr.write(f"Error: {e}\n")
+        sys.exit(1)
+
+    for result in results:
+        status = "skipped" if result["skipped"] else "ok" if result["ok"] else "FAILED"
+        line = f"{result['name']}  {status}  {result['seconds']:.2f}s"
+        if result["error"]:
+            line += f"  {result['error']}"
+        sys.stdout.write(line + "\n")
+    sys.exit(0 if all(result["ok"] for result in results) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,459 @@
+#!/usr/bin/env python3
+"""Long-running pipeline server for previews and authoring tools.
+
+Tools that shell out to run_all.py for every preview pay for the interpreter
+start, the imports and loading the schema and begrippenkader on every call.
+The server keeps those loaded: schemas, parsed begrippenkaders and compiled
+term indexes stay in memory, and requests are served over a Unix domain
+socket (--socket, by default .cache/pipeline.sock in the repository) or, with
+--port, over localhost HTTP. Use pipeline_client.py, or any HTTP client, to
+talk to it.
+
+Endpoints (JSON in, JSON out):
+    GET  /status    uptime, number of requests and the loaded inputs
+    POST /build     build assessments like run_all.py, see Pipeline.build
+    POST /enrich    enrich a text snippet or a document, see Pipeline.enrich
+    POST /validate  validate a source against a schema, see Pipeline.validate
+
+Requests are handled concurrently, one thread each; builds write files and
+run one at a time, and validations wait for a running build. Before an input
+is used, its stat() signature is compared with the one it had when it was
+loaded, and a changed schema or begrippenkader is loaded again.
+
+The server has no authentication, so it only serves requests that a web page
+cannot forge: POST bodies must be sent as application/json (a cross-site form
+cannot), the Host header must be localhost or 127.0.0.1 (which DNS rebinding
+cannot fake), and every path in a request must lie inside the repository
+(or, for a manifest, its directory). The Unix socket is only accessible to
+the user running the server.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import os
+import signal
+import socket
+import socketserver
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any
+
+from definition_enricher import (
+    OUTPUT_MODES,
+    DefinitionEnricher,
+    enrich_document,
+    inject_terms,
+    load_yaml,
+)
+from file_watcher import file_signature
+from pipeline_client import DEFAULT_SOCKET
+from run_all import LOG_FORMAT, assessment_from_entry, build_and_report, load_manifest
+from schema_validator import SchemaValidator
+
+logger = logging.getLogger(__name__)
+
+# Build options a request may set, with the run_all defaults
+_BUILD_OPTIONS = {
+    "skip_validation": False,
+    "output_mode": "inline",
+    "inflections": False,
+    "tooltip_limits": (None, None, None),
+    "markdown": True,
+    "force": False,
+}
+
+# Host header values (without port) the server answers to
+_ALLOWED_HOSTS = ("localhost", "127.0.0.1")
+
+# Connections waiting to be accepted; the socketserver default of 5 refuses
+# parallel client calls of a build
+REQUEST_QUEUE_SIZE = 128
+
+
+class Pipeline:
+    """The loaded inputs of the server and the handlers of its requests.
+
+    Invalid requests raise ValueError, KeyError, TypeError or OSError, which
+    the server answers with 400 Bad Request; paths outside the allowed
+    directories raise PermissionError (403 Forbidden).
+    """
+
+    def __init__(
+        self, script_dir: Path, cache_dir: Path | None = None, root: Path | None = None
+    ) -> None:
+        """
+        Args:
+            script_dir: Directory of the pipeline scripts
+            cache_dir: Optional build cache directory for builds, see run_all --cache-dir
+            root: Directory that every path in a request must lie in; the
+                parent of ``script_dir`` (the repository) by default
+        """
+        self.enricher = DefinitionEnricher(script_dir)
+        self.validator = SchemaValidator(script_dir)
+        self.cache_dir = cache_dir
+        self.root = Path(root if root is not None else Path(script_dir).parent).resolve()
+        # File signatures of the loaded schemas and begrippenkaders
+        self.signatures = {}
+        # Guards the loaded inputs
+        self.lock = threading.Lock()
+        # Builds write their outputs and run one at a time
+        self.build_lock = threading.Lock()
+        self.started = time.monotonic()
+        self.requests = 0
+        self.reloads = 0
+
+    def _fresh(self, path: str | Path) -> Path:
+        """Forget what was loaded from ``path`` if the file changed since; hold self.lock."""
+        path = Path(path).resolve()
+        signature = file_signature(path)
+        if self.signatures.get(path, signature) != signature:
+            logger.info("%s changed, loading it again", path)
+            for key in [key for key in self.enricher.term_indexes if key[0] == path]:
+                del self.enricher.term_indexes[key]
+            self.validator.schemas.pop(path.stem, None)
+            self.reloads += 1
+        self.signatures[path] = signature
+        return path
+
+    def _allowed(self, path: str | Path, *roots: Path) -> Path:
+        """
+        Return ``path`` resolved, if it lies inside self.root or one of ``roots``.
+
+        Raises:
+            PermissionError: If the path lies outside those directories
+        """
+        resolved = Path(path).resolve()
+        if not any(resolved.is_relative_to(root) for root in (self.root, *roots)):
+            raise PermissionError(f"{path} is outside {self.root}")
+        return resolved
+
+    def _check_assessment(self, assessment, *roots: Path) -> None:
+        """Check that the inputs and outputs of an assessment are allowed paths."""
+        for path in (
+            assessment.source,
+            assessment.schema,
+            assessment.begrippenkader,
+            assessment.output_json,
+            assessment.output_md,
+            assessment.profile_terms,
+        ):
+            if path is not None:
+                self._allowed(path, *roots)
+
+    def term_index(self, path: str | Path, inflections: bool = False):
+        """Return the compiled term index of a begrippenkader, loading it if needed."""
+        path = self._allowed(path)
+        with self.lock:
+            path = self._fresh(path)
+            return self.enricher.load_term_index(path, inflections, self.cache_dir)
+
+    def status(self) -> dict[str, Any]:
+        """Return the uptime, the number of requests and the loaded inputs."""
+        with self.lock:
+            term_indexes = {str(path) for path, _inflections in self.enricher.term_indexes}
+            schemas = sorted(self.validator.schemas)
+        return {
+            "uptime": round(time.monotonic() - self.started, 3),
+            "requests": self.requests,
+            "reloads": self.reloads,
+            "term_indexes": sorted(term_indexes),
+            "schemas": schemas,
+        }
+
+    def build(self, payload: dict[str, Any]) -> dict[str, Any]:
+        """
+        Build assessments with the loaded inputs.
+
+        Payload:
+            manifest: Path of a manifest; all its assessments are built, or
+                only those listed in ``names``
+            assessment: Instead of a manifest, one manifest entry
+            options: Overrides of the build options (skip_validation,
+                output_mode, inflections, tooltip_limits, markdown, force)
+
+        Returns:
+            ``results``: the status of every assessment, as in run_all's batch
+            summary (name, ok, skipped, seconds, error)
+        """
+        overrides = payload.get("options") or {}
+        unknown = set(overrides) - set(_BUILD_OPTIONS)
+        if unknown:
+            raise ValueError(f"unknown build options {sorted(unknown)}")
+        options = {**_BUILD_OPTIONS, **overrides, "jobs": 1, "cache_dir": self.cache_dir}
+        options["tooltip_limits"] = tuple(options["tooltip_limits"])
+        if options["output_mode"] not in OUTPUT_MODES:
+            raise ValueError(f"output_mode must be one of {list(OUTPUT_MODES)}")
+
+        if payload.get("manifest") is not None:
+            manifest = self._allowed(payload["manifest"])
+            assessments = load_manifest(manifest)
+            names = payload.get("names")
+            if names:
+                unknown = set(names) - {assessment.name for assessment in assessments}
+                if unknown:
+                    raise ValueError(f"not in the manifest: {sorted(unknown)}")
+                assessments = [assessment for assessment in assessments if assessment.name in names]
+            roots = (manifest.parent,)
+        elif isinstance(payload.get("assessment"), dict):
+            assessments = [assessment_from_entry(payload["assessment"], self.root)]
+            roots = ()
+        else:
+            raise ValueError("expected a 'manifest' or an 'assessment'")
+        for assessment in assessments:
+            self._check_assessment(assessment, *roots)
+
+        with self.build_lock:
+            with self.lock:
+                for assessment in assessments:
+                    self._fresh(assessment.begrippenkader)
+                    self._fresh(assessment.schema)
+            results = [
+                build_and_report(assessment, options, self.enricher, self.validator)
+                for assessment in assessments
+            ]
+        return {"results": results}
+
+    def enrich(self, payload: dict[str, Any]) -> dict[str, Any]:
+        """
+        Enrich a text snippet or a whole document with definitions.
+
+        Payload:
+            begrippenkader: Path of the begrippenkader
+            text: A snippet to enrich; or
+            document: A source document (as parsed from its YAML) to enrich
+            output_mode: "inline" (default) or "references"
+            inflections: Also match regular inflections of the hoofdtermen
+            already_matched: With ``text``: terms not to enrich again, e.g.
+                the ``matched`` terms of earlier snippets on the same page
+            once_per_page: With ``document``: the definition mode
+
+        Returns:
+            ``text`` and ``matched`` (the matched terms, including
+            already_matched), or ``document``
+        """
+        term_index = self.term_index(payload["begrippenkader"], bool(payload.get("inflections")))
+        output_mode = payload.get("output_mode", "inline")
+        if output_mode not in OUTPUT_MODES:
+            raise ValueError(f"output_mode must be one of {list(OUTPUT_MODES)}")
+
+        if "text" in payload:
+            if not isinstance(payload["text"], str):
+                raise TypeError("'text' must be a string")
+            matched = set(payload.get("already_matched") or ())
+            text = inject_terms(payload["text"], term_index, matched, output_mode=output_mode)
+            return {"text": text, "matched": sorted(matched)}
+
+        document = payload.get("document")
+        if not isinstance(document, dict):
+            raise ValueError("expected a 'text' or a 'document'")
+        document = enrich_document(
+            document, term_index, bool(payload.get("once_per_page")), output_mode
+        )
+        return {"document": document}
+
+    def validate(self, payload: dict[str, Any]) -> dict[str, Any]:
+        """
+        Validate a source against a schema.
+
+        Payload:
+            schema: Path of the JSON schema
+            source: Path of the source YAML; or
+            data: The parsed document
+
+        Returns:
+            ``valid`` and the validation ``errors``
+        """
+        schema_path = self._allowed(payload["schema"])
+        if "data" in payload:
+            data, name = payload["data"], "<data>"
+        else:
+            source = self._allowed(payload["source"])
+            data, name = load_yaml(source), source.name
+        # The validator's schemas and results are shared with builds, which
+        # use them under build_lock
+        with self.build_lock, self.lock:
+            schema_path = self._fresh(schema_path)
+            valid, errors, _data = self.validator.validate_data(data, schema_path, name)
+        return {"valid": valid, "errors": errors}
+
+
+class _RequestHandler(BaseHTTPRequestHandler):
+    server_version = "par-pipeline"
+
+    def _respond(self, status: int, body: Any) -> None:
+        content = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def _handle(self, handler, payload) -> None:
+        pipeline = self.server.pipeline
+        with pipeline.lock:
+            pipeline.requests += 1
+        try:
+            result = handler(payload)
+        except PermissionError as e:
+            self._respond(403, {"error": str(e)})
+        except (ValueError, KeyError, TypeError, OSError) as e:
+            message = f"missing {e}" if isinstance(e, KeyError) else str(e)
+            self._respond(400, {"error": message})
+        except Exception as e:
+            logger.exception("%s failed", self.path)
+            self._respond(500, {"error": str(e)})
+        else:
+            self._respond(200, result)
+
+    def _allowed_host(self) -> bool:
+        """Whether the Host header names this machine; answers 403 if not."""
+        host = (self.headers.get("Host") or "").rsplit(":", 1)[0]
+        if host in _ALLOWED_HOSTS:
+            return True
+        self._respond(403, {"error": f"Host must be one of {list(_ALLOWED_HOSTS)}"})
+        return False
+
+    def do_GET(self) -> None:
+        if not self._allowed_host():
+            return
+        if self.path == "/status":
+            self._handle(lambda _payload: self.server.pipeline.status(), None)
+        else:
+            self._respond(404, {"error": f"no such endpoint: GET {self.path}"})
+
+    def do_POST(self) -> None:
+        if not self._allowed_host():
+            return
+        pipeline = self.server.pipeline
+        handler = {
+            "/build": pipeline.build,
+            "/enrich": pipeline.enrich,
+            "/validate": pipeline.validate,
+        }.get(self.path)
+        if handler is None:
+            self._respond(404, {"error": f"no such endpoint: POST {self.path}"})
+            return
+        if self.headers.get_content_type() != "application/json":
+            self._respond(415, {"error": "the request body must be application/json"})
+            return
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            payload = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError as e:
+            self._respond(400, {"error": f"invalid JSON: {e}"})
+            return
+        if not isinstance(payload, dict):
+            self._respond(400, {"error": "expected a JSON object"})
+            return
+        self._handle(handler, payload)
+
+    def log_message(self, format, *args) -> None:  # noqa: A002 - BaseHTTPRequestHandler API
+        # The client address of a Unix socket is empty, so it is left out
+        logger.debug(format, *args)
+
+
+class _ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+    request_queue_size = REQUEST_QUEUE_SIZE
+
+
+class _ThreadingLocalHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = REQUEST_QUEUE_SIZE
+
+
+def _remove_stale_socket(socket_path: Path) -> None:
+    """Remove a socket file left by a server that is no longer running."""
+    if not socket_path.exists():
+        return
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+        try:
+            probe.connect(str(socket_path))
+        except OSError:
+            socket_path.unlink()
+            return
+    raise OSError(f"a server is already listening on {socket_path}")
+
+
+def create_server(
+    pipeline: Pipeline, socket_path: Path | None = None, port: int | None = None
+) -> socketserver.BaseServer:
+    """
+    Create a server for ``pipeline`` on a Unix domain socket or a localhost port.
+
+    Without a port the server listens on ``socket_path`` (DEFAULT_SOCKET by
+    default), which only the current user can connect to. Port 0 binds a free
+    port; see ``server.server_address``. Call serve_forever() to start
+    serving and server_close() when done.
+    """
+    if port is None:
+        socket_path = Path(socket_path or DEFAULT_SOCKET)
+        socket_path.parent.mkdir(parents=True, exist_ok=True)
+        _remove_stale_socket(socket_path)
+        # The socket is created by bind with the permissions the umask allows,
+        # so restrict those: a chmod afterwards leaves a window in which other
+        # users can connect
+        umask = os.umask(0o177)
+        try:
+            server = _ThreadingUnixHTTPServer(str(socket_path), _RequestHandler)
+        finally:
+            os.umask(umask)
+    elif socket_path is not None:
+        raise ValueError("give a socket path or a port, not both")
+    else:
+        server = _ThreadingLocalHTTPServer(("127.0.0.1", port), _RequestHandler)
+    server.pipeline = pipeline
+    return server
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Long-running pipeline server")
+    transport = parser.add_mutually_exclusive_group()
+    transport.add_argument(
+        "--socket",
+        type=Path,
+        help="Listen on this Unix domain socket (default .cache/pipeline.sock in the repository)",
+    )
+    transport.add_argument(
+        "--port", type=int, help="Listen on this localhost HTTP port instead of a Unix socket"
+    )
+    parser.add_argument(
+        "--cache-dir",
+        type=Path,
+        help="Persistent build cache for builds (e.g. .cache/build), see run_all.py",
+    )
+    args = parser.parse_args()
+
+    pipeline = Pipeline(Path(__file__).parent, args.cache_dir)
+    try:
+        server = create_server(pipeline, args.socket, args.port)
+    except OSError as e:
+        logger.error("Error: %s", e)
+        sys.exit(1)
+
+    # Stop cleanly (and remove the socket) when a container is stopped
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    socket_path = None if args.port is not None else args.socket or DEFAULT_SOCKET
+    where = socket_path or f"http://127.0.0.1:{server.server_address[1]}"
+    logger.info("Pipeline server listening on %s", where)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        server.server_close()
+        if socket_path is not None:
+            socket_path.unlink(missing_ok=True)
+        logger.info("Pipeline server stopped")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format=LOG_FORMAT)
+    main()
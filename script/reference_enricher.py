@@ -0,0 +1,236 @@
+"""Frozen reference implementation of the definition enricher.
+
+``inject_terms`` below is the enrichment algorithm as it was before the
+single-scan matcher (definition_enricher.TermMatcher) replaced it: one regex
+per term, in priority order, rescanning the text after every replacement. It
+is kept verbatim, including its known defects, as the reference engine for
+enrichment_diff. Do not optimize or fix it; changes to the active engine are
+measured against it.
+
+Known defects of this engine (fixed in the active engine):
+- in every-occurrence mode the matches of a term are iterated over the text
+  as it was before the first replacement, so later occurrences are checked at
+  stale offsets and are usually rejected as overlapping;
+- protected positions after a replacement are not shifted, so text just after
+  an earlier tooltip can be protected by mistake.
+"""
+
+import html
+import re
+
+
+def inject_terms(text, term_map, already_matched_terms=None):
+    """
+    Inject HTML tags around terms found in the text.
+    Returns the modified text with HTML tags.
+
+    Matching priority:
+    1. Hoofdtermen (longest first)
+    2. Hoofdtermen meervoudsvormen (longest first)
+    3. Alternatieve spellingen (longest first)
+    4. Alternatieve termen (longest first)
+
+    Matching is case-insensitive, EXCEPT for terms that are all uppercase in the
+    begrippenkader (e.g. "DAT") — these only match when written in uppercase in
+    the text, to avoid false positives with common Dutch words.
+
+    Terms inside existing <span class="aiv-definition"> tags are NOT processed.
+    Also prevents adding overlapping or nested tags during the same processing run.
+
+    Args:
+        text: The text to process.
+        term_map: Dictionary mapping lowercase terms to their definitions.
+        already_matched_terms: Optional set of term keys already matched earlier
+            on the same page. When provided, each term is only enriched once per
+            page and newly matched terms are added to this set.
+    """
+    if not text or not isinstance(text, str):
+        return text
+
+    # Group terms by type
+    hoofdtermen = []
+    meervoudsvormen = []  # NEW: separate list for plural forms
+    alt_spellingen = []
+    alt_termen = []
+
+    for term_key, term_data in term_map.items():
+        # Term keys are already lowercase from create_term_map
+        if term_data.get("is_meervoudsvorm", False):  # NEW: check for plural forms
+            meervoudsvormen.append(term_key)
+        elif term_data.get("is_alternatief_spelling", False):
+            alt_spellingen.append(term_key)
+        elif term_data.get("is_alternatief_term", False):
+            alt_termen.append(term_key)
+        else:
+            hoofdtermen.append(term_key)
+
+    # Sort each category by length (longest first)
+    hoofdtermen.sort(key=len, reverse=True)
+    meervoudsvormen.sort(key=len, reverse=True)  # NEW: sort plural forms
+    alt_spellingen.sort(key=len, reverse=True)
+    alt_termen.sort(key=len, reverse=True)
+
+    # Combine all term lists in processing order with the new priority
+    all_term_lists = [
+        hoofdtermen,
+        meervoudsvormen,
+        alt_spellingen,
+        alt_termen,
+    ]  # Updated order
+
+    # Create a record of all matched positions to prevent overlapping/nested tags
+    matched_positions = set()
+
+    # Create an array of characters to be modified
+    # This approach allows us to mark positions as "processed" to avoid overlapping tags
+    chars = list(text)
+
+    # Find all existing aiv-definition spans first and mark their positions as matched
+    span_pattern = r'<span class="aiv-definition">.*?</span></span>'
+    for match in re.finditer(span_pattern, text, re.DOTALL):
+        start, end = match.span()
+        # Mark all positions in this span as already matched
+        for pos in range(start, end):
+            matched_positions.add(pos)
+
+    # Mark positions inside any HTML tag (<...>) so terms in attributes
+    # (e.g. href URLs) are not enriched.
+    for match in re.finditer(r"<[^>]+>", text, re.DOTALL):
+        start, end = match.span()
+        for pos in range(start, end):
+            matched_positions.add(pos)
+
+    # Process each term list in order
+    for _term_list_index, term_list in enumerate(all_term_lists):
+        if not term_list:
+            continue
+
+        # Process each term in the current list
+        for term in term_list:
+            # Skip terms already matched on this page (once-per-page logic)
+            if already_matched_terms is not None and term in already_matched_terms:
+                continue
+
+            # Determine case sensitivity: terms that are all uppercase in the
+            # begrippenkader (e.g. "DAT") are matched case-sensitively to avoid
+            # false positives with common Dutch words like "dat".
+            original_term = term_map.get(term, {}).get("term", term)
+            if len(original_term) > 1 and original_term.isupper():
+                # Use the original uppercase term in the pattern
+                term_pattern = r"\b" + re.escape(original_term) + r"\b"
+                regex_flags = 0  # case-sensitive
+            else:
+                term_pattern = r"\b" + re.escape(term) + r"\b"
+                regex_flags = re.IGNORECASE
+
+            # Find all matches for this term in the current state of the text
+            current_text = "".join(chars)
+            for match in re.finditer(term_pattern, current_text, regex_flags):
+                start, end = match.span()
+
+                # Skip if any part of this match overlaps with positions already matched
+                overlap = False
+                for pos in range(start, end):
+                    if pos in matched_positions:
+                        overlap = True
+                        break
+
+                if overlap:
+                    continue
+
+                # This is a valid match that doesn't overlap with existing spans
+                matched_text = current_text[start:end]
+                term_lower = matched_text.lower()
+
+                # Get the term data
+                term_data = term_map.get(term_lower)
+                if not term_data:
+                    # Try again with case-insensitive lookup
+                    for key in term_map:
+                        if key.lower() == term_lower:
+                            term_data = term_map[key]
+                            break
+
+                if not term_data:
+                    continue
+
+                # Begrippenkader content is (partly) synced from external
+                # sources and must not be trusted as HTML: escape every text
+                # field before interpolating it into the tooltip markup.
+                definition = html.escape(term_data["definition"])
+                hoofdterm = html.escape(term_data.get("hoofdterm") or "")
+
+                # Create the HTML with the original matched text
+                term_html = (
+                    f'<span class="aiv-definition">{html.escape(matched_text)}'
+                    f'<span class="aiv-definition-text">{definition}'
+                )
+
+                # Add toelichting if available
+                toelichting = html.escape(term_data.get("toelichting", ""))
+                if toelichting:
+                    term_html += f"\n<br><strong>Toelichting</strong>: {toelichting}"
+
+                # Add voorbeelden if available
+                voorbeelden = term_data.get("voorbeelden", [])
+                if voorbeelden:
+                    if isinstance(voorbeelden, list):
+                        voorbeelden_text = html.escape("; ".join(voorbeelden))
+                        term_html += f"\n<br><strong>Voorbeeld(en)</strong>: {voorbeelden_text}"
+                    elif isinstance(voorbeelden, str):
+                        voorbeelden_text = html.escape(voorbeelden)
+                        term_html += f"\n<br><strong>Voorbeeld(en)</strong>: {voorbeelden_text}"
+
+                # Add alternative term information
+                if term_data.get("is_alternatief_term", False) and hoofdterm:
+                    term_html += f"\n<br><i>Dit is een alternatieve term van {hoofdterm}</i>"
+
+                if term_data.get("is_alternatief_spelling", False) and hoofdterm:
+                    term_html += f"\n<br><i>Dit is een alternatieve spelling van {hoofdterm}</i>"
+
+                # Add plural form information - NEW CODE
+                if term_data.get("is_meervoudsvorm", False) and hoofdterm:
+                    term_html += f"\n<br><i>Dit is een meervoudsvorm van {hoofdterm}</i>"
+
+                term_html += "</span></span>"
+
+                # Replace the matched text with the HTML in chars list
+                chars[start:end] = list(term_html)
+
+                # Mark these positions as matched
+                for i in range(start, start + len(term_html)):
+                    matched_positions.add(i)
+
+                # Update the text based on the current state of chars
+                current_text = "".join(chars)
+
+                # We need to re-find all spans after this replacement
+                # to properly update matched_positions for the next iterations
+                updated_matched_positions = set()
+                for span_match in re.finditer(span_pattern, current_text, re.DOTALL):
+                    s, e = span_match.span()
+                    for pos in range(s, e):
+                        updated_matched_positions.add(pos)
+
+                # Re-mark positions inside HTML tags to keep protecting URLs in attributes
+                for html_match in re.finditer(r"<[^>]+>", current_text, re.DOTALL):
+                    s, e = html_match.span()
+                    for pos in range(s, e):
+                        updated_matched_positions.add(pos)
+
+                # Add the original matched positions that weren't part of spans
+                for pos in matched_positions:
+                    if pos < start or pos >= start + len(term_html):
+                        updated_matched_positions.add(pos)
+
+                # Update with the new positions
+                matched_positions = updated_matched_positions
+                chars = list(current_text)
+
+                # Record this term so it is only enriched once per page
+                if already_matched_terms is not None:
+                    already_matched_terms.add(term)
+                    break  # stop after first match for this term on this page
+
+    # Return the final text with all replacements
+    return "".join(chars)
@@ -1,15 +1,538 @@
 #!/usr/bin/env python3
 import argparse
+import hashlib
+import json
 import logging
+import os
 import sys
+import tempfile
+import time
+from dataclasses import dataclass, replace
 from pathlib import Path
 
-from definition_enricher import DefinitionEnricher
-from generate_md_table_tasks import generate_markdown_table, process_yaml_file
+from build_cache import content_hash, write_atomic
+from definition_enricher import OUTPUT_MODES, DefinitionEnricher, TooltipBudget, load_yaml
+from file_watcher import FileWatcher
+from generate_md_table_tasks import TaskRowVisitor, generate_markdown_table
 from schema_validator import SchemaValidator
 
 logger = logging.getLogger(__name__)
 
+LOG_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
+
+# Arguments that describe a single assessment; replaced by --manifest in batch mode
+_SINGLE_BUILD_ARGS = ("schema", "source", "begrippen_yaml", "output_json", "output_md")
+
+_MANIFEST_KEYS = {
+    "name",
+    "source",
+    "schema",
+    "begrippenkader",
+    "output_json",
+    "output_md",
+    "definitions_once_per_page",
+    "profile_terms",
+}
+
+
+# Modules whose code determines the generated outputs, see pipeline_version
+_PIPELINE_MODULES = (
+    "run_all.py",
+    "definition_enricher.py",
+    "build_cache.py",
+    "task_tree.py",
+    "generate_md_table_tasks.py",
+    "schema_validator.py",
+)
+
+# Build options that change the outputs; jobs and cache_dir only change how
+# they are computed
+_FINGERPRINT_OPTIONS = (
+    "skip_validation",
+    "output_mode",
+    "inflections",
+    "tooltip_limits",
+    "markdown",
+)
+
+
+@dataclass(frozen=True, slots=True)
+class Assessment:
+    """One assessment to build: its inputs, outputs and enrichment mode."""
+
+    name: str
+    source: Path
+    schema: Path
+    begrippenkader: Path
+    output_json: Path
+    output_md: Path | None = None
+    once_per_page: bool = False
+    profile_terms: Path | None = None
+
+
+def assessment_from_entry(entry: dict, base_dir: Path, where: str = "assessment") -> Assessment:
+    """
+    Create an Assessment from one manifest entry.
+
+    Args:
+        entry: The manifest entry, see load_manifest
+        base_dir: Directory that relative paths are resolved against
+        where: Description of the entry in error messages
+
+    Raises:
+        ValueError: If the entry has unknown or missing keys
+    """
+    unknown = set(entry) - _MANIFEST_KEYS
+    missing = {"name", "source", "schema", "begrippenkader", "output_json"} - {
+        key for key, value in entry.items() if value is not None
+    }
+    if unknown or missing:
+        raise ValueError(
+            f"{where}: "
+            + "; ".join(
+                part
+                for part in (
+                    f"unknown keys {sorted(unknown)}" if unknown else "",
+                    f"missing keys {sorted(missing)}" if missing else "",
+                )
+                if part
+            )
+        )
+
+    def path(key):
+        return Path(base_dir) / entry[key] if entry.get(key) is not None else None
+
+    return Assessment(
+        name=str(entry["name"]),
+        source=path("source"),
+        schema=path("schema"),
+        begrippenkader=path("begrippenkader"),
+        output_json=path("output_json"),
+        output_md=path("output_md"),
+        once_per_page=bool(entry.get("definitions_once_per_page", False)),
+        profile_terms=path("profile_terms"),
+    )
+
+
+def load_manifest(manifest_path: Path) -> list[Assessment]:
+    """
+    Read a batch build manifest.
+
+    The manifest is a YAML file with a list of ``assessments``, each with a
+    ``name``, ``source``, ``schema``, ``begrippenkader`` and ``output_json``,
+    and optionally ``output_md``, ``profile_terms`` and
+    ``definitions_once_per_page``. Paths are relative to the manifest.
+
+    Raises:
+        ValueError: If the manifest is malformed
+    """
+    manifest = load_yaml(manifest_path)
+    entries = manifest.get("assessments") if isinstance(manifest, dict) else None
+    if not isinstance(entries, list) or not entries:
+        raise ValueError(f"{manifest_path}: expected a non-empty list of 'assessments'")
+
+    base_dir = Path(manifest_path).parent
+    assessments = []
+    for index, entry in enumerate(entries):
+        if not isinstance(entry, dict):
+            raise ValueError(f"{manifest_path}: assessment {index} is not a mapping")
+        assessments.append(
+            assessment_from_entry(
+                entry, base_dir, f"{manifest_path}: assessment {entry.get('name', index)}"
+            )
+        )
+    names = [assessment.name for assessment in assessments]
+    if len(set(names)) != len(names):
+        raise ValueError(f"{manifest_path}: assessment names must be unique")
+    return assessments
+
+
+def _file_hash(path: Path) -> str:
+    return hashlib.sha256(Path(path).read_bytes()).hexdigest()
+
+
+def pipeline_version() -> str:
+    """Return a hash of the pipeline code and the Python, PyYAML and jsonschema versions."""
+    from importlib import metadata
+
+    import yaml
+
+    # Read from the package metadata: importing jsonschema is slow, and only
+    # validation needs it
+    try:
+        jsonschema_version = metadata.version("jsonschema")
+    except metadata.PackageNotFoundError:
+        jsonschema_version = None
+    script_dir = Path(__file__).parent
+    return content_hash(
+        {name: _file_hash(script_dir / name) for name in _PIPELINE_MODULES},
+        list(sys.version_info[:2]),
+        yaml.__version__,
+        jsonschema_version,
+    )
+
+
+def _outputs(assessment: Assessment, options: dict) -> list[Path]:
+    """Return the files a build of ``assessment`` writes."""
+    if options["markdown"] and assessment.output_md is not None:
+        return [assessment.output_json, assessment.output_md]
+    return [assessment.output_json]
+
+
+def _fingerprint_path(assessment: Assessment) -> Path:
+    return assessment.output_json.with_name(assessment.output_json.name + ".fingerprint")
+
+
+def assessment_fingerprint(assessment: Assessment, options: dict) -> str:
+    """
+    Return the fingerprint of everything the outputs of ``assessment`` depend on.
+
+    The fingerprint covers the contents of the source, schema and
+    begrippenkader, the options that affect the output, which outputs are
+    written and the pipeline version. Paths are not part of it, so the same
+    inputs give the same fingerprint in every checkout.
+
+    Raises:
+        OSError: If an input file cannot be read
+    """
+    return content_hash(
+        pipeline_version(),
+        [
+            _file_hash(path)
+            for path in (assessment.source, assessment.schema, assessment.begrippenkader)
+        ],
+        {key: options[key] for key in _FINGERPRINT_OPTIONS},
+        assessment.once_per_page,
+        len(_outputs(assessment, options)),
+    )
+
+
+def is_up_to_date(assessment: Assessment, options: dict, fingerprint: str) -> bool:
+    """
+    Check whether the outputs of ``assessment`` were built from ``fingerprint``.
+
+    The outputs must also still be the files that build wrote; an output that
+    is missing or was changed since makes the assessment out of date.
+    """
+    try:
+        recorded = json.loads(_fingerprint_path(assessment).read_text(encoding="utf-8"))
+        outputs = {str(path): _file_hash(path) for path in _outputs(assessment, options)}
+    except (OSError, ValueError) as e:
+        logger.debug("%s is out of date: %s", assessment.name, e)
+        return False
+    return (
+        isinstance(recorded, dict)
+        and recorded.get("fingerprint") == fingerprint
+        and recorded.get("outputs") == outputs
+    )
+
+
+def record_fingerprint(assessment: Assessment, options: dict, fingerprint: str) -> None:
+    """Write ``fingerprint`` and the hashes of the outputs next to the JSON output."""
+    recorded = {
+        "fingerprint": fingerprint,
+        "outputs": {str(path): _file_hash(path) for path in _outputs(assessment, options)},
+    }
+    write_atomic(_fingerprint_path(assessment), json.dumps(recorded, indent=2) + "\n")
+
+
+def _needs_build(assessment: Assessment, options: dict) -> bool:
+    """Return False if build_assessment would skip ``assessment``."""
+    if options["force"] or assessment.profile_terms is not None:
+        return True
+    try:
+        fingerprint = assessment_fingerprint(assessment, options)
+    except OSError:
+        # Let the build report the missing input
+        return True
+    return not is_up_to_date(assessment, options, fingerprint)
+
+
+def build_assessment(
+    assessment: Assessment,
+    options: dict,
+    enricher: DefinitionEnricher,
+    validator: SchemaValidator,
+    profile_path: Path | None = None,
+) -> str:
+    """
+    Validate, enrich and render one assessment.
+
+    The build is skipped when the fingerprint recorded by the previous build
+    (``<output_json>.fingerprint``) matches the current inputs, unless
+    ``options["force"]`` is set or a term profile is requested.
+
+    Args:
+        assessment: The assessment to build
+        options: Build options shared by all assessments (see main)
+        enricher: DefinitionEnricher; its compiled term indexes are reused
+        validator: SchemaValidator; its loaded schemas are reused
+        profile_path: Term profile path, overriding assessment.profile_terms
+
+    Returns:
+        "built", or "skipped" if the outputs were up to date
+
+    Raises:
+        ValueError: If the source does not match its schema
+    """
+    profile_path = profile_path or assessment.profile_terms
+    fingerprint = assessment_fingerprint(assessment, options)
+    if (
+        not options["force"]
+        and profile_path is None
+        and is_up_to_date(assessment, options, fingerprint)
+    ):
+        logger.info("%s is up to date (fingerprint %s), skipped", assessment.name, fingerprint)
+        return "skipped"
+
+    logger.info("Reading source YAML from %s", assessment.source)
+    source_data = load_yaml(assessment.source)
+
+    # Step 1: Validate YAML against schema (unless skipped)
+    if not options["skip_validation"]:
+        logger.info("Validating %s against schema %s...", assessment.source, assessment.schema)
+        is_valid, errors, _validated_data = validator.validate_data(
+            source_data, assessment.schema, assessment.source.name
+        )
+
+        if not is_valid:
+            raise ValueError(f"Validation failed: {errors}")
+
+        logger.info("Validation successful")
+    else:
+        logger.info("Validation step skipped.")
+
+    # The task rows for the questions MD file are collected from the
+    # source during the enrichment traversal
+    output_md = assessment.output_md if options["markdown"] else None
+    task_rows = TaskRowVisitor()
+
+    # Step 2: Enrich with definitions
+    logger.info(
+        "Enriching %s with definitions from %s...", assessment.source, assessment.begrippenkader
+    )
+    limits = options["tooltip_limits"]
+    enricher.enrich_and_export(
+        assessment.source,
+        assessment.begrippenkader,
+        assessment.output_json,
+        once_per_page=assessment.once_per_page,
+        jobs=options["jobs"],
+        cache_dir=options["cache_dir"],
+        output_mode=options["output_mode"],
+        inflections=options["inflections"],
+        tooltip_budget=TooltipBudget(*limits) if any(x is not None for x in limits) else None,
+        profile_path=profile_path,
+        source_data=source_data,
+        visitors=[task_rows] if output_md else [],
+    )
+
+    logger.info("Successfully processed data. Output saved to %s", assessment.output_json)
+
+    # Step 3: Generate questions MD file (if specified)
+    if output_md:
+        logger.info("Generating questions MD file...")
+
+        # Generate the markdown content
+        file_name = source_data.get("name", assessment.source.name)
+        md_content = generate_markdown_table(task_rows.rows, file_name)
+
+        # Write the markdown content to the specified file
+        write_atomic(Path(output_md), md_content)
+
+        logger.info("Questions markdown file generated: %s", output_md)
+
+    record_fingerprint(assessment, options, fingerprint)
+    return "built"
+
+
+# Per-process state of the batch workers, see _init_batch_worker
+_batch_worker = {}
+
+
+def _init_batch_worker(script_dir, term_indexes, schemas, configure_logging):
+    """Give a batch worker the term indexes and schemas loaded by the parent."""
+    if configure_logging:
+        logging.basicConfig(level=logging.INFO, format=LOG_FORMAT)
+    enricher = DefinitionEnricher(script_dir)
+    enricher.term_indexes.update(term_indexes)
+    validator = SchemaValidator(script_dir)
+    validator.schemas.update(schemas)
+    _batch_worker["enricher"] = enricher
+    _batch_worker["validator"] = validator
+
+
+def build_and_report(assessment, options, enricher, validator):
+    """Build one assessment and report its status and duration instead of raising."""
+    started = time.perf_counter()
+    status = None
+    try:
+        status = build_assessment(assessment, options, enricher, validator)
+    except Exception as e:
+        logger.error("%s failed: %s", assessment.name, e)
+        error = str(e)
+    else:
+        error = None
+    return {
+        "name": assessment.name,
+        "ok": error is None,
+        "skipped": status == "skipped",
+        "seconds": time.perf_counter() - started,
+        "error": error,
+    }
+
+
+def _run_batch_build(assessment, options):
+    """Build one assessment in a batch worker, see build_and_report."""
+    return build_and_report(
+        assessment, options, _batch_worker["enricher"], _batch_worker["validator"]
+    )
+
+
+def run_batch(assessments, options, workers, script_dir):
+    """
+    Build several assessments, sharing schemas and compiled term indexes.
+
+    Every distinct schema and begrippenkader is loaded once, by this process,
+    and handed to the workers; the assessments are then built concurrently in
+    a pool of ``workers`` processes (0: one per assessment, at most one per
+    CPU core; 1: in this process). Logs a combined status and timing summary.
+
+    Returns:
+        List of per-assessment results (name, ok, skipped, seconds, error), in
+        manifest order
+    """
+    started = time.perf_counter()
+
+    # Load every shared input once, for the assessments that are out of date
+    pending = [assessment for assessment in assessments if _needs_build(assessment, options)]
+    enricher = DefinitionEnricher(script_dir)
+    validator = SchemaValidator(script_dir)
+    for begrippenkader in dict.fromkeys(assessment.begrippenkader for assessment in pending):
+        enricher.load_term_index(begrippenkader, options["inflections"], options["cache_dir"])
+    if not options["skip_validation"]:
+        for schema in dict.fromkeys(assessment.schema for assessment in pending):
+            validator.load_schema(schema)
+    load_seconds = time.perf_counter() - started
+
+    if workers == 0:
+        workers = max(1, min(len(pending), os.cpu_count() or 1))
+    initargs = (script_dir, enricher.term_indexes, validator.schemas)
+    if workers == 1:
+        _init_batch_worker(*initargs, configure_logging=False)
+        results = [_run_batch_build(assessment, options) for assessment in assessments]
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_batch_worker,
+            initargs=(*initargs, True),
+        ) as executor:
+            results = list(
+                executor.map(_run_batch_build, assessments, [options] * len(assessments))
+            )
+
+    total = time.perf_counter() - started
+    failed = [result for result in results if not result["ok"]]
+    skipped = [result for result in results if result["skipped"]]
+    summary = [
+        f"Batch build: {len(results) - len(failed) - len(skipped)} of {len(results)} "
+        f"assessments built, {len(skipped)} up to date, in {total:.2f}s "
+        f"({workers} worker{'s' if workers != 1 else ''}; shared inputs loaded in "
+        f"{load_seconds:.2f}s)"
+    ]
+    width = max(len(result["name"]) for result in results)
+    for result in results:
+        status = "skipped" if result["skipped"] else "ok" if result["ok"] else "FAILED"
+        line = f"  {result['name']:<{width}}  {status:<7}  {result['seconds']:6.2f}s"
+        if result["error"]:
+            line += f"  {result['error']}"
+        summary.append(line)
+    (logger.error if failed else logger.info)("\n".join(summary))
+    return results
+
+
+def rebuild_changed(assessments, changed, options, script_dir):
+    """
+    Rebuild, in this process, the assessments that use one of the ``changed`` files.
+
+    Returns:
+        The run_batch results of the rebuilt assessments; empty if none uses them
+    """
+    affected = [
+        assessment
+        for assessment in assessments
+        if changed & {assessment.source, assessment.schema, assessment.begrippenkader}
+    ]
+    if not affected:
+        return []
+    logger.info(
+        "Changed: %s; rebuilding %s",
+        ", ".join(sorted(str(path) for path in changed)),
+        ", ".join(assessment.name for assessment in affected),
+    )
+    return run_batch(affected, options, 1, script_dir)
+
+
+def watch(assessments, options, workers, script_dir, manifest_path=None):
+    """
+    Build ``assessments``, then rebuild them whenever their inputs change.
+
+    Runs until interrupted. Only the assessments that use a changed source,
+    schema or begrippenkader are rebuilt. With a build cache (``cache_dir``;
+    a temporary one for the session otherwise) only the pages that changed
+    are enriched again, and a begrippenkader is only recompiled when it
+    changed. When the manifest changes, it is reloaded and the assessments it
+    lists are brought up to date.
+    """
+    session_cache = None
+    if options["cache_dir"] is None:
+        session_cache = tempfile.TemporaryDirectory(prefix="run_all-watch-")
+        options = {**options, "cache_dir": Path(session_cache.name)}
+    try:
+        while True:
+            watched = [
+                path
+                for assessment in assessments
+                for path in (assessment.source, assessment.schema, assessment.begrippenkader)
+            ]
+            if manifest_path is not None:
+                watched.append(manifest_path)
+            # Watch before building, so changes saved during the build are seen
+            with FileWatcher(watched) as watcher:
+                run_batch(assessments, options, workers, script_dir)
+                logger.info(
+                    "Watching %d files for changes%s (Ctrl+C to stop)",
+                    len(watcher.paths),
+                    " with inotify" if watcher.inotify_fd is not None else "",
+                )
+                while manifest_path not in (changed := watcher.wait()):
+                    rebuild_changed(assessments, changed, options, script_dir)
+
+            logger.info("Manifest %s changed, reloading", manifest_path)
+            try:
+                assessments = load_manifest(manifest_path)
+            except (OSError, ValueError) as e:
+                logger.error("Keeping the previous manifest: %s", e)
+    except KeyboardInterrupt:
+        logger.info("Stopped watching")
+    finally:
+        if session_cache is not None:
+            session_cache.cleanup()
+
+
+def print_cache_key(assessments: list[Assessment], options: dict) -> None:
+    """Print the fingerprint of ``assessments`` (combined if several) and exit."""
+    try:
+        fingerprints = [assessment_fingerprint(assessment, options) for assessment in assessments]
+    except OSError as e:
+        logger.error("Error: %s", e)
+        sys.exit(1)
+    key = fingerprints[0] if len(fingerprints) == 1 else content_hash(*fingerprints)
+    sys.stdout.write(key + "\n")
+    sys.exit(0)
+
 
 def main() -> None:
     """
@@ -17,29 +540,70 @@ def main() -> None:
     1. Validate YAML against schema
     2. Enrich with definitions
     3. Generate questions MD file
+
+    The source YAML is parsed once; every step works on the loaded document.
+    With --manifest, all listed assessments are built in one run, see run_batch.
+    Assessments whose inputs are unchanged since their last build are skipped,
+    see build_assessment. With --watch, the run continues and rebuilds
+    assessments as their inputs change, see watch.
     """
     # Get the script's directory
     script_dir = Path(__file__).parent
 
     # Set up argument parser
     parser = argparse.ArgumentParser(description="YAML Validator and Definition Enricher")
-    parser.add_argument("--schema", type=Path, required=True, help="Path to the JSON schema file")
+    parser.add_argument(
+        "--manifest",
+        type=Path,
+        help="Batch mode: build all assessments listed in this manifest (e.g. "
+        "sources/assessments.yaml) instead of the single one given by --schema, --source, "
+        "--begrippen-yaml and --output-json/--output-md.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=0,
+        help="Batch mode: number of assessments built concurrently; 0 (default) builds "
+        "each in its own process, up to the number of CPU cores, 1 builds them one by one.",
+    )
+    parser.add_argument(
+        "--no-markdown",
+        action="store_true",
+        help="Do not write the questions Markdown files (output_md in the manifest).",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="Keep running and rebuild an assessment whenever its source YAML, "
+        "begrippenkader or schema (or the manifest) changes; outputs are replaced "
+        "atomically, for dev servers with hot reload.",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Rebuild even if the fingerprint recorded next to the outputs shows they are "
+        "up to date.",
+    )
+    parser.add_argument(
+        "--print-cache-key",
+        action="store_true",
+        help="Print the fingerprint of the inputs, options and pipeline code (combined over "
+        "all assessments with --manifest) and exit without building, e.g. as a CI cache key.",
+    )
+    parser.add_argument("--schema", type=Path, help="Path to the JSON schema file")
     parser.add_argument(
         "--source",
         type=Path,
-        required=True,
         help="Path to the source YAML file (DPIA.yaml)",
     )
     parser.add_argument(
         "--begrippen-yaml",
         type=Path,
-        required=True,
         help="Path to the output/existing begrippenkader YAML file",
     )
     parser.add_argument(
         "--output-json",
         type=Path,
-        required=True,
         help="Path to the final enriched output JSON file",
     )
     parser.add_argument(
@@ -56,57 +620,127 @@ def main() -> None:
         "at every occurrence. Used for the IAMA; DPIA and pre-scan enrich every "
         "occurrence.",
     )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of worker processes that enrich the top-level tasks (pages) in "
+        "parallel; 0 uses all CPU cores. Defaults to 1 (sequential); the output is "
+        "identical either way.",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        type=Path,
+        help="Directory for the persistent enrichment cache (e.g. .cache/build). Pages "
+        "that are unchanged since an earlier run are copied from the cache.",
+    )
+    parser.add_argument(
+        "--definitions-output",
+        choices=OUTPUT_MODES,
+        default="inline",
+        help="'inline' (default) embeds the full tooltip at every matched term; "
+        "'references' emits a compact marker per term and writes each definition once "
+        "into a top-level 'definitions' table.",
+    )
+    parser.add_argument(
+        "--definitions-inflections",
+        action="store_true",
+        help="Also enrich regular Dutch plural and diminutive forms of the hoofdtermen "
+        "(e.g. 'partijen', 'risico's') that the begrippenkader does not list. Explicit "
+        "meervoudsvormen take precedence.",
+    )
+    parser.add_argument(
+        "--max-tooltips-per-field",
+        type=int,
+        help="Inject at most N definition tooltips into a single field.",
+    )
+    parser.add_argument(
+        "--max-tooltips-per-page",
+        type=int,
+        help="Inject at most N definition tooltips per page (deel).",
+    )
+    parser.add_argument(
+        "--max-tooltips-per-term-per-page",
+        type=int,
+        help="Inject the tooltip of a single term at most N times per page (deel). "
+        "Suppressed matches are counted and reported.",
+    )
+    parser.add_argument(
+        "--profile-terms",
+        type=Path,
+        help="Write a per-term profile (attempted, accepted and rejected matches, matching "
+        "time) to this JSON file, with a text version (.txt) next to it.",
+    )
 
     args = parser.parse_args()
 
-    try:
-        # Step 1: Validate YAML against schema (unless skipped)
-        if not args.skip_validation:
-            logger.info("Validating %s against schema %s...", args.source, args.schema)
-            validator = SchemaValidator(script_dir)
-            is_valid, errors, _validated_data = validator.validate_yaml(args.source, args.schema)
-
-            if not is_valid:
-                logger.error("Validation failed: %s", errors)
-                sys.exit(1)
-
-            logger.info("Validation successful")
-        else:
-            logger.info("Validation step skipped.")
-
-        # Step 2: Enrich with definitions
-        logger.info("Enriching %s with definitions from %s...", args.source, args.begrippen_yaml)
-        enricher = DefinitionEnricher(script_dir)
-        enricher.enrich_and_export(
-            args.source,
-            args.begrippen_yaml,
-            args.output_json,
-            once_per_page=args.definitions_once_per_page,
-        )
-
-        logger.info("Successfully processed data. Output saved to %s", args.output_json)
-
-        # Step 3: Generate questions MD file (if specified)
-        if args.output_md:
-            logger.info("Generating questions MD file...")
-
-            # Process the source YAML file
-            tasks, file_name = process_yaml_file(args.source)
+    if args.manifest is not None:
+        if any(getattr(args, name) is not None for name in _SINGLE_BUILD_ARGS):
+            parser.error(
+                "--manifest cannot be combined with --schema/--source/--begrippen-yaml/--output-*"
+            )
+        if args.profile_terms is not None:
+            parser.error("--profile-terms is set per assessment in the manifest (profile_terms)")
+    else:
+        missing = [name for name in _SINGLE_BUILD_ARGS[:4] if getattr(args, name) is None]
+        if missing:
+            parser.error(
+                "the following arguments are required without --manifest: "
+                + ", ".join("--" + name.replace("_", "-") for name in missing)
+            )
 
-            # Generate the markdown content
-            md_content = generate_markdown_table(tasks, file_name)
+    options = {
+        "skip_validation": args.skip_validation,
+        "jobs": args.jobs,
+        "cache_dir": args.cache_dir,
+        "output_mode": args.definitions_output,
+        "inflections": args.definitions_inflections,
+        "tooltip_limits": (
+            args.max_tooltips_per_field,
+            args.max_tooltips_per_page,
+            args.max_tooltips_per_term_per_page,
+        ),
+        "markdown": not args.no_markdown,
+        "force": args.force,
+    }
 
-            # Create output directory if it doesn't exist
-            output_dir = args.output_md.parent
-            if not output_dir.exists():
-                output_dir.mkdir(parents=True, exist_ok=True)
-
-            # Write the markdown content to the specified file
-            with Path(args.output_md).open("w", encoding="utf-8") as f:
-                f.write(md_content)
-
-            logger.info("Questions markdown file generated: %s", args.output_md)
+    if args.manifest is not None:
+        try:
+            assessments = load_manifest(args.manifest)
+        except (OSError, ValueError) as e:
+            logger.error("Error: %s", e)
+            sys.exit(1)
+        if args.print_cache_key:
+            print_cache_key(assessments, options)
+        if args.watch:
+            watch(assessments, options, args.workers, script_dir, args.manifest)
+            sys.exit(0)
+        results = run_batch(assessments, options, args.workers, script_dir)
+        sys.exit(0 if all(result["ok"] for result in results) else 1)
 
+    assessment = Assessment(
+        name=args.source.stem,
+        source=args.source,
+        schema=args.schema,
+        begrippenkader=args.begrippen_yaml,
+        output_json=args.output_json,
+        output_md=args.output_md,
+        once_per_page=args.definitions_once_per_page,
+        profile_terms=None,
+    )
+    if args.print_cache_key:
+        print_cache_key([assessment], options)
+    if args.watch:
+        watch([replace(assessment, profile_terms=args.profile_terms)], options, 1, script_dir)
+        sys.exit(0)
+    try:
+        build_assessment(
+            assessment,
+            options,
+            DefinitionEnricher(script_dir),
+            SchemaValidator(script_dir),
+            profile_path=args.profile_terms,
+        )
     except Exception as e:
         logger.error("Error: %s", e)
         sys.exit(1)
@@ -115,5 +749,5 @@ def main() -> None:
 
 
 if __name__ == "__main__":
-    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    logging.basicConfig(level=logging.INFO, format=LOG_FORMAT)
     main()
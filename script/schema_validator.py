@@ -3,40 +3,54 @@ import argparse
 import json
 import logging
 import sys
+from collections import deque
 from pathlib import Path
 from typing import Any
 
-import jsonschema
-import yaml
-from jsonschema import validate
+logger = logging.getLogger("SchemaValidator")
+
+
+def schema_errors(data: Any, schema: dict[str, Any], name: str = "<data>") -> list[str]:
+    """
+    Validate data against an already loaded schema.
+
+    Args:
+        data: The parsed document
+        schema: The JSON schema
+        name: Name of the document in the messages
+
+    Returns:
+        The validation error messages; empty if the data is valid
+    """
+    # jsonschema (with referencing, rpds and attrs) is the most expensive
+    # import of the pipeline; runs that skip validation never load it
+    import jsonschema
+
+    try:
+        jsonschema.validate(instance=data, schema=schema)
+    except jsonschema.exceptions.ValidationError as e:
+        error_path = " -> ".join(str(x) for x in e.path)
+        return [f"Validation error in {name} at {error_path}: {e.message}"]
+    return []
 
 
 class SchemaValidator:
-    def __init__(self, base_dir: Path) -> None:
+    def __init__(self, base_dir: Path, max_results: int | None = 100) -> None:
         """
-        Initialize validator with base directory and logging configuration.
+        Initialize validator with base directory.
+
+        Logging is left to the application: the validator logs to the
+        "SchemaValidator" logger without adding handlers.
 
         Args:
             base_dir: Base directory of the project
+            max_results: Number of recent outcomes kept in validation_results;
+                None keeps all of them
         """
         self.base_dir = base_dir
-        self.logger = self._setup_logger()
+        self.logger = logger
         self.schemas = {}
-        self.validation_results = []
-
-    def _setup_logger(self) -> logging.Logger:
-        """Set up logging configuration."""
-        logger = logging.getLogger("SchemaValidator")
-        logger.setLevel(logging.INFO)
-
-        # Create console handler with formatting
-        handler = logging.StreamHandler()
-        handler.setLevel(logging.INFO)
-        formatter = logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")
-        handler.setFormatter(formatter)
-        logger.addHandler(handler)
-
-        return logger
+        self.validation_results = deque(maxlen=max_results)
 
     def load_schema(self, schema_path: Path) -> dict[str, Any]:
         """Load a JSON schema file."""
@@ -55,6 +69,8 @@ class SchemaValidator:
 
     def load_yaml(self, yaml_path: Path) -> dict[str, Any]:
         """Load a YAML file."""
+        import yaml
+
         try:
             with yaml_path.open("r", encoding="utf-8") as f:
                 data = yaml.safe_load(f)
@@ -79,6 +95,28 @@ class SchemaValidator:
             - list[str]: List of error messages if validation failed
             - dict[str, Any]: The loaded YAML data if validation succeeded, otherwise an empty dict
         """
+        try:
+            data = self.load_yaml(yaml_path)
+        except Exception as e:
+            error_msg = f"Error validating {yaml_path.name}: {e!s}"
+            self._record(yaml_path.name, schema_path, [error_msg])
+            return False, [error_msg], {}
+        return self.validate_data(data, schema_path, yaml_path.name)
+
+    def validate_data(
+        self, data: Any, schema_path: Path, name: str = "<data>"
+    ) -> tuple[bool, list[str], dict[str, Any]]:
+        """
+        Validate already loaded data against a schema.
+
+        Args:
+            data: The parsed document
+            schema_path: Path to the JSON schema file
+            name: Name of the document in messages and validation results
+
+        Returns:
+            Same as validate_yaml
+        """
         try:
             # Load schema if not already loaded
             if schema_path.stem not in self.schemas:
@@ -86,39 +124,25 @@ class SchemaValidator:
             else:
                 schema = self.schemas[schema_path.stem]
 
-            # Load and validate YAML
-            data = self.load_yaml(yaml_path)
-            validate(instance=data, schema=schema)
-
-            result = {
-                "file": yaml_path.name,
-                "schema": schema_path.name,
-                "success": True,
-                "errors": [],
-            }
-            self.validation_results.append(result)
-            return True, [], data
-        except jsonschema.exceptions.ValidationError as e:
-            error_path = " -> ".join(str(x) for x in e.path)
-            error_msg = f"Validation error in {yaml_path.name} at {error_path}: {e.message}"
-            result = {
-                "file": yaml_path.name,
-                "schema": schema_path.name,
-                "success": False,
-                "errors": [error_msg],
-            }
-            self.validation_results.append(result)
-            return False, [error_msg], {}
+            errors = schema_errors(data, schema, name)
         except Exception as e:
-            error_msg = f"Error validating {yaml_path.name}: {e!s}"
-            result = {
-                "file": yaml_path.name,
+            errors = [f"Error validating {name}: {e!s}"]
+
+        self._record(name, schema_path, errors)
+        if errors:
+            return False, errors, {}
+        return True, [], data
+
+    def _record(self, name: str, schema_path: Path, errors: list[str]) -> None:
+        """Add the outcome of a validation to validation_results, dropping the oldest."""
+        self.validation_results.append(
+            {
+                "file": name,
                 "schema": schema_path.name,
-                "success": False,
-                "errors": [error_msg],
+                "success": not errors,
+                "errors": errors,
             }
-            self.validation_results.append(result)
-            return False, [error_msg], {}
+        )
 
 
 def main() -> None:
@@ -167,4 +191,5 @@ def main() -> None:
 
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
     main()
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""Startup-time budget for the pipeline scripts.
+
+The pipeline runs several times per build, so interpreter startup and module
+imports are a visible share of its wall time. The heavy dependencies
+(jsonschema, PyYAML, multiprocessing) are imported by the stages that need
+them, not when a script starts. This benchmark guards that:
+
+- it imports each entry point in a fresh interpreter with ``-X importtime``
+  and fails if a module listed in DEFERRED_MODULES was imported at startup,
+- it takes the median cumulative import time of the entry point over a number
+  of runs and fails if it exceeds the budget (--budget-ms).
+
+Wall-clock times vary on shared machines, so CI runs with a generous
+--budget-ms 300: it still catches a heavy import added at startup, without
+failing on a slow runner. --report-only-time logs the times without any budget.
+Bytecode is compiled first, so the measurement does not include compiling
+the sources.
+"""
+
+from __future__ import annotations
+
+import argparse
+import compileall
+import logging
+import os
+import statistics
+import subprocess
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+SCRIPT_DIR = Path(__file__).parent
+
+# Entry points whose import (i.e. startup) time is measured
+ENTRY_POINTS = ("run_all", "definition_enricher", "pipeline_api")
+
+# Modules that must only be imported by the stages that use them
+DEFERRED_MODULES = ("jsonschema", "yaml", "concurrent.futures.process", "ctypes")
+
+# Median cumulative import time of an entry point, in milliseconds. Importing
+# run_all takes about 40 ms with the deferred imports and about 180 ms without.
+DEFAULT_BUDGET_MS = 100.0
+
+
+@dataclass(frozen=True, slots=True)
+class ImportTime:
+    """One line of ``-X importtime`` output, in microseconds."""
+
+    module: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+
+def parse_importtime(output: str) -> list[ImportTime]:
+    """Parse the ``-X importtime`` lines of ``output``, in the order printed."""
+    entries = []
+    for line in output.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        self_us, cumulative_us, name = line.removeprefix("import time:").split("|", 2)
+        if not self_us.strip().isdigit():
+            # The header line
+            continue
+        depth = (len(name) - len(name.lstrip())) // 2
+        entries.append(ImportTime(name.strip(), int(self_us), int(cumulative_us), depth))
+    return entries
+
+
+def measure(module: str, python: str = sys.executable) -> list[ImportTime]:
+    """Import ``module`` in a fresh interpreter and return its import times."""
+    env = {**os.environ, "PYTHONPATH": str(SCRIPT_DIR)}
+    result = subprocess.run(  # noqa: S603 - fixed arguments, our own interpreter
+        [python, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        env=env,
+        cwd=SCRIPT_DIR,
+        check=True,
+    )
+    return parse_importtime(result.stderr)
+
+
+def check_entry_point(module: str, runs: int, budget_ms: float | None) -> list[str]:
+    """
+    Measure the startup of ``module`` and return the budget violations.
+
+    Logs the median import time and the slowest imports of the median run.
+    With ``budget_ms`` None the import time is only reported.
+    """
+    measurements = [measure(module) for _ in range(runs)]
+    totals = [
+        next(entry.cumulative_us for entry in entries if entry.module == module)
+        for entries in measurements
+    ]
+    median_us = statistics.median(totals)
+    median_run = measurements[min(range(runs), key=lambda i: abs(totals[i] - median_us))]
+
+    slowest = sorted(median_run, key=lambda entry: entry.self_us, reverse=True)[:8]
+    logger.info(
+        "%s: %.1f ms (median of %d; budget %s); slowest imports: %s",
+        module,
+        median_us / 1000,
+        runs,
+        "not enforced" if budget_ms is None else f"{budget_ms:.0f} ms",
+        ", ".join(f"{entry.module} {entry.self_us / 1000:.1f} ms" for entry in slowest),
+    )
+
+    violations = []
+    imported = {entry.module for entry in median_run}
+    for deferred in DEFERRED_MODULES:
+        if deferred in imported:
+            violations.append(f"{module} imports {deferred} at startup")
+    if budget_ms is not None and median_us / 1000 > budget_ms:
+        violations.append(
+            f"{module} takes {median_us / 1000:.1f} ms to import, over the budget of "
+            f"{budget_ms:.0f} ms"
+        )
+    return violations
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Check the startup time of the pipeline scripts")
+    parser.add_argument(
+        "--budget-ms",
+        type=float,
+        default=DEFAULT_BUDGET_MS,
+        help=f"Maximum median import time per entry point (default {DEFAULT_BUDGET_MS:.0f})",
+    )
+    parser.add_argument(
+        "--report-only-time",
+        action="store_true",
+        help="Log the import times without enforcing --budget-ms",
+    )
+    parser.add_argument(
+        "--runs", type=int, default=7, help="Number of measurements per entry point"
+    )
+    parser.add_argument(
+        "modules",
+        nargs="*",
+        default=list(ENTRY_POINTS),
+        help=f"Entry points to measure (default: {', '.join(ENTRY_POINTS)})",
+    )
+    args = parser.parse_args()
+
+    compileall.compile_dir(SCRIPT_DIR, maxlevels=0, quiet=1)
+    violations = [
+        violation
+        for module in args.modules
+        for violation in check_entry_point(
+            module, args.runs, None if args.report_only_time else args.budget_ms
+        )
+    ]
+    for violation in violations:
+        logger.error("%s", violation)
+    sys.exit(1 if violations else 0)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    main()
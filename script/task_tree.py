@@ -0,0 +1,98 @@
+"""Single-pass traversal of the task tree of an assessment source.
+
+Enrichment, the rows of the questions table and the task indexes all visit
+the same tree, in the same order. Instead of each stage recursing on its own,
+stages implement TaskVisitor and walk_document visits every task once,
+calling every registered visitor at each node.
+
+Visitors are called in registration order for each node, and a node's
+visitors all run before its subtasks are visited. A visitor that only reads
+the source (e.g. the table rows) must therefore be registered before one
+that modifies nodes in place (enrichment).
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any
+
+
+@dataclass(frozen=True, slots=True)
+class TaskContext:
+    """Position of a visited task in the tree."""
+
+    level: int
+    """Nesting level, 0 for the top-level tasks (delen/pages)."""
+    page: int
+    """Index of the top-level task the task belongs to."""
+    parent: dict[str, Any] | None
+    """The parent task, None at the top level."""
+
+
+class TaskVisitor:
+    """Base class for a stage that visits the task tree; all hooks are optional."""
+
+    def enter_document(self, document: dict[str, Any]) -> None:
+        """Called once, before the first task."""
+
+    def enter_task(self, task: dict[str, Any], context: TaskContext) -> None:
+        """Called for every task, before its subtasks."""
+
+    def leave_task(self, task: dict[str, Any], context: TaskContext) -> None:
+        """Called for every task, after its subtasks."""
+
+    def leave_document(self, document: dict[str, Any]) -> None:
+        """Called once, after the last task."""
+
+
+def walk_tasks(
+    tasks: Any,
+    visitors: list[TaskVisitor],
+    level: int = 0,
+    page: int = 0,
+    parent: dict[str, Any] | None = None,
+) -> None:
+    """Visit ``tasks`` and their subtasks depth first (pre-order)."""
+    if not isinstance(tasks, list):
+        return
+    for index, task in enumerate(tasks):
+        if not isinstance(task, dict):
+            continue
+        context = TaskContext(level, index if level == 0 else page, parent)
+        for visitor in visitors:
+            visitor.enter_task(task, context)
+        walk_tasks(task.get("tasks"), visitors, level + 1, context.page, task)
+        for visitor in visitors:
+            visitor.leave_task(task, context)
+
+
+def walk_document(document: dict[str, Any], visitors: list[TaskVisitor]) -> None:
+    """Visit ``document`` and every task in it once, calling all ``visitors``."""
+    for visitor in visitors:
+        visitor.enter_document(document)
+    walk_tasks(document.get("tasks"), visitors)
+    for visitor in visitors:
+        visitor.leave_document(document)
+
+
+class TaskIndexVisitor(TaskVisitor):
+    """Builds the task id index and the dependency index.
+
+    Attributes:
+        tasks: Task id to task; the first task wins when an id is repeated
+        dependents: Referenced task id to the ``(task, dependency)`` pairs of
+            the tasks that depend on it
+    """
+
+    def __init__(self) -> None:
+        self.tasks: dict[Any, dict[str, Any]] = {}
+        self.dependents: dict[Any, list[tuple[dict[str, Any], dict[str, Any]]]] = {}
+
+    def enter_task(self, task: dict[str, Any], context: TaskContext) -> None:
+        self.tasks.setdefault(task.get("id"), task)
+        for dependency in task.get("dependencies") or ():
+            if not isinstance(dependency, dict):
+                continue
+            target = dependency.get("condition") or dependency.get("source")
+            if isinstance(target, dict):
+                self.dependents.setdefault(target.get("id"), []).append((task, dependency))
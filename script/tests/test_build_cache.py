@@ -0,0 +1,136 @@
+"""Tests for the on-disk build caches.
+
+Covers:
+- PageCache keys depend on the task content and on the cache context,
+- stored pages are reused, and unreadable entries are treated as misses,
+- process_pages only re-enriches the pages that changed,
+- pruning after a build removes the outdated pages of its own scope only,
+- TermIndexCache entries are keyed on the begrippenkader content, and corrupt
+  or outdated entries are detected and rebuilt, without evicting the entries
+  of other files or other contexts.
+"""
+
+import definition_enricher
+import pytest
+from build_cache import PageCache, TermIndexCache
+from definition_enricher import DefinitionEnricher, TermIndex, create_term_map, process_pages
+
+TASK = {"id": "1", "description": "Een dpia", "tasks": []}
+
+
+def test_page_cache_key_depends_on_task_and_context(tmp_path):
+    cache = PageCache(tmp_path, "v1", "begrippen", {"once_per_page": False})
+
+    assert cache.key(TASK) == cache.key(dict(TASK))
+    assert cache.key(TASK) != cache.key({**TASK, "description": "Een andere dpia"})
+    other_mode = PageCache(tmp_path, "v1", "begrippen", {"once_per_page": True})
+    assert cache.key(TASK) != other_mode.key(TASK)
+
+
+def test_page_cache_round_trip_and_corrupt_entry(tmp_path):
+    cache = PageCache(tmp_path, "context")
+    key = cache.key(TASK)
+
+    assert cache.get(key) is None
+    cache.put(key, {"id": "1", "description": "verrijkt"})
+    assert cache.get(key) == {"id": "1", "description": "verrijkt"}
+    assert (cache.reused, cache.recomputed) == (1, 1)
+
+    next(cache.directory.rglob("*.json")).write_text("{kapot", encoding="utf-8")
+    assert cache.get(key) is None
+
+
+def test_process_pages_reenriches_only_changed_pages(tmp_path):
+    term_map = create_term_map(
+        {"definitions": [{"id": "dpia", "term": "dpia", "definition": "een beoordeling"}]}
+    )
+    pages = [
+        {"id": "1", "description": "Deel over de dpia"},
+        {"id": "2", "description": "Nog een dpia"},
+    ]
+
+    first = process_pages(pages, term_map, page_cache=PageCache(tmp_path, "context"))
+
+    edited = [pages[0], {"id": "2", "description": "Gewijzigde dpia"}]
+    cache = PageCache(tmp_path, "context")
+    second = process_pages(edited, term_map, page_cache=cache)
+
+    assert (cache.reused, cache.recomputed) == (1, 1)
+    assert second[0] == first[0]
+    assert "Gewijzigde" in second[1]["description"]
+    assert "aiv-definition" in second[1]["description"]
+
+
+def test_page_cache_prune_keeps_used_entries_and_other_scopes(tmp_path):
+    other = PageCache(tmp_path, "context", scope="iama.yaml")
+    other.put(other.key(TASK), TASK)
+    first = PageCache(tmp_path, "context", scope="dpia.yaml")
+    first.put(first.key(TASK), TASK)
+    edited = {**TASK, "description": "Een andere dpia"}
+    first.put(first.key(edited), edited)
+
+    rebuild = PageCache(tmp_path, "context", scope="dpia.yaml")
+    assert rebuild.get(rebuild.key(edited)) == edited
+    assert rebuild.prune() == 1
+
+    assert rebuild.get(rebuild.key(TASK)) is None
+    assert rebuild.get(rebuild.key(edited)) == edited
+    assert other.get(other.key(TASK)) == TASK
+
+
+BEGRIPPENKADER = """\
+definitions:
+  - id: dpia
+    term: DPIA
+    definition: een beoordeling
+"""
+
+
+def test_term_index_cache_detects_corruption_and_drops_outdated_entries(tmp_path):
+    cache = TermIndexCache(tmp_path, "v1")
+    key = cache.key("begrippenkader_dpia.yaml", b"versie 1")
+    cache.put(key, {"index": 1})
+    assert cache.get(key) == {"index": 1}
+
+    path = next(cache.directory.glob("*.pickle"))
+    path.write_bytes(path.read_bytes()[:-1] + b"!")
+    assert cache.get(key) is None
+
+    new_key = cache.key("begrippenkader_dpia.yaml", b"versie 2")
+    assert new_key != key
+    cache.put(new_key, {"index": 2})
+    assert [p.stem for p in cache.directory.glob("*.pickle")] == [new_key]
+
+
+def test_term_index_cache_keeps_other_contexts_and_directories(tmp_path):
+    plain = TermIndexCache(tmp_path, "v1", {"inflections": False})
+    inflected = TermIndexCache(tmp_path, "v1", {"inflections": True})
+    dpia = tmp_path / "dpia" / "begrippenkader.yaml"
+    iama = tmp_path / "iama" / "begrippenkader.yaml"
+
+    keys = [
+        plain.key(dpia, b"versie 1"),
+        inflected.key(dpia, b"versie 1"),
+        plain.key(iama, b"versie 1"),
+    ]
+    for cache, key, index in zip((plain, inflected, plain), keys, range(3), strict=True):
+        cache.put(key, {"index": index})
+
+    assert plain.get(keys[0]) == {"index": 0}
+    assert inflected.get(keys[1]) == {"index": 1}
+    assert plain.get(keys[2]) == {"index": 2}
+
+
+def test_enricher_loads_term_index_from_cache_without_parsing(tmp_path, monkeypatch):
+    begrippenkader = tmp_path / "begrippenkader_dpia.yaml"
+    begrippenkader.write_text(BEGRIPPENKADER, encoding="utf-8")
+    built = DefinitionEnricher().load_term_index(begrippenkader, cache_dir=tmp_path / "cache")
+
+    def fail(path):
+        pytest.fail(f"{path} parsed again")
+
+    monkeypatch.setattr(definition_enricher, "load_yaml", fail)
+    loaded = DefinitionEnricher().load_term_index(begrippenkader, cache_dir=tmp_path / "cache")
+
+    assert isinstance(loaded, TermIndex)
+    assert loaded.fingerprint == built.fingerprint
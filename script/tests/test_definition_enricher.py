@@ -7,15 +7,45 @@ Covers the core enrichment behavior:
 - terms inside existing HTML tags / URLs are not enriched,
 - definition/toelichting/voorbeelden fields are HTML-escaped before they are
   interpolated into tooltip markup (stored-XSS guard for synced content),
+- single-pass matching keeps priority (longest first), word boundaries and
+  enriches terms that follow earlier tooltips in the same text,
 - once_per_page injects a repeated term only once per top-level deel, while
-  the default mode enriches every occurrence.
+  the default mode enriches every occurrence,
+- the "references" output mode expands back to exactly the inline output and
+  its definitions table holds only the referenced definitions, once per
+  definition for all variants of a term,
+- optional inflection matching enriches regular Dutch plurals and diminutives
+  of hoofdtermen, while explicit meervoudsvormen keep precedence,
+- tooltip budgets cap the tooltips per field, per page and per term per page
+  and count the suppressed matches, and fields after an exhausted page
+  budget are not matched at all,
+- the term profiler classifies every candidate match per term,
+- "contains" conditions are resolved to the index of the option they select,
+  also when the option comes later in the document and in the enrichment
+  walk itself, take the enriched value of that option and fail the build
+  when they match no option.
 """
 
+import definition_enricher
+import pytest
+from build_cache import PageCache
 from definition_enricher import (
+    DefinitionEnricher,
+    EnrichmentMemo,
+    ProtectedRanges,
+    TermIndex,
+    TermProfiler,
+    TooltipBudget,
+    build_definitions_table,
     create_term_map,
+    dutch_inflections,
+    enrich_document,
+    expand_definition_references,
     inject_terms,
     process_dpia,
     process_tasks,
+    resolve_contains_conditions,
+    segment_text_nodes,
 )
 
 
@@ -62,6 +92,98 @@ def test_create_term_map_registers_meervoudsvormen_and_alt_spellingen():
     assert term_map["persoons-gegeven"]["is_alternatief_spelling"] is True
 
 
+def test_create_term_map_variants_share_one_definition_record():
+    begrippenkader = {
+        "definitions": [
+            {
+                "id": "persoonsgegeven",
+                "term": "Persoonsgegeven",
+                "definition": "een gegeven",
+                "metadata": {"meervoudsvormen": "persoonsgegevens", "toelichting": "uitleg"},
+            }
+        ],
+        "alternative_terms": [{"term": "PII", "voorkeur_id": "persoonsgegeven"}],
+    }
+    term_map = create_term_map(begrippenkader)
+
+    main, plural, alternative = term_map.values()
+    assert plural.record is main.record is alternative.record
+    assert (plural.term, plural.alt_type, plural.hoofdterm) == (
+        "persoonsgegevens",
+        "meervoud",
+        "Persoonsgegeven",
+    )
+    assert alternative.get("is_alternatief_term") is True
+    assert alternative["id"] == ""
+    assert dict(main)["toelichting"] == "uitleg"
+
+
+# --- TermIndex -------------------------------------------------------------
+
+
+def test_term_index_sorts_categories_longest_first_and_looks_up_any_casing():
+    begrippenkader = {
+        "definitions": [
+            {
+                "id": "gegeven",
+                "term": "Gegeven",
+                "definition": "een feit",
+                "metadata": {"meervoudsvormen": ["gegevens"]},
+            },
+            {"id": "persoonsgegeven", "term": "Persoonsgegeven", "definition": "een gegeven"},
+        ]
+    }
+    term_index = TermIndex.from_begrippenkader(begrippenkader)
+
+    assert term_index.categories["hoofdtermen"] == ["persoonsgegeven", "gegeven"]
+    assert term_index.categories["meervoudsvormen"] == ["gegevens"]
+    assert term_index.terms == ["persoonsgegeven", "gegeven", "gegevens"]
+    assert term_index.lookup("PersoonsGegeven")["term"] == "Persoonsgegeven"
+    assert term_index.lookup("onbekend") is None
+
+
+def test_inject_terms_accepts_term_index_and_term_map_alike():
+    term_map = create_term_map(make_begrippenkader(("persoonsgegeven", "een gegeven")))
+    text = "Dit is een persoonsgegeven."
+
+    assert inject_terms(text, TermIndex(term_map)) == inject_terms(text, term_map)
+
+
+def test_enricher_builds_term_index_once_per_begrippenkader(tmp_path):
+    begrippen_path = tmp_path / "begrippen.yaml"
+    begrippen_path.write_text(
+        "definitions:\n  - id: dpia\n    term: DPIA\n    definition: een beoordeling\n",
+        encoding="utf-8",
+    )
+    enricher = DefinitionEnricher(tmp_path)
+
+    first = enricher.load_term_index(begrippen_path)
+
+    assert enricher.load_term_index(tmp_path / "." / "begrippen.yaml") is first
+
+
+def test_term_index_renders_each_tooltip_body_once(monkeypatch):
+    rendered = []
+    render = definition_enricher.render_tooltip_text
+
+    def counting_render(term_data):
+        rendered.append(term_data["term"])
+        return render(term_data)
+
+    monkeypatch.setattr(definition_enricher, "render_tooltip_text", counting_render)
+    term_index = TermIndex(create_term_map(make_begrippenkader(("Cloud", "<b>opslag</b>"))))
+
+    first = term_index.tooltip("cloud")
+    second = term_index.tooltip("CLOUD")
+
+    assert rendered == ["Cloud"]
+    # Only the matched text differs between occurrences.
+    assert first.startswith('<span class="aiv-definition">cloud<span')
+    assert second.startswith('<span class="aiv-definition">CLOUD<span')
+    assert first.endswith("&lt;b&gt;opslag&lt;/b&gt;</span></span>")
+    assert term_index.tooltip("onbekend") is None
+
+
 # --- inject_terms: basic wrapping -----------------------------------------
 
 
@@ -166,6 +288,89 @@ def test_inject_terms_escapes_html_in_definition_fields():
     assert "&lt;b&gt;vet&lt;/b&gt;; gewoon voorbeeld" in result
 
 
+# --- EnrichmentMemo --------------------------------------------------------
+
+
+def test_memo_returns_same_result_and_counts_hits():
+    term_index = TermIndex(create_term_map(make_begrippenkader(("dpia", "een beoordeling"))))
+    memo = EnrichmentMemo()
+
+    first = inject_terms("Start de dpia.", term_index, memo=memo)
+    second = inject_terms("Start de dpia.", term_index, memo=memo)
+
+    assert first == second == inject_terms("Start de dpia.", term_index)
+    assert memo.stats()["hits"] == 1
+    assert memo.stats()["misses"] == 1
+
+
+def test_memo_respects_page_state_in_once_per_page_mode():
+    term_index = TermIndex(
+        create_term_map(make_begrippenkader(("dpia", "een beoordeling"), ("risico", "een kans")))
+    )
+    memo = EnrichmentMemo()
+
+    page_one = set()
+    enriched = inject_terms("De dpia.", term_index, page_one, memo=memo)
+    assert "aiv-definition" in enriched
+    # Same text on the same page: the term was already matched, so no tooltip.
+    assert inject_terms("De dpia.", term_index, page_one, memo=memo) == "De dpia."
+
+    # A fresh page whose state only differs in terms absent from the text
+    # reuses the first result and records the matched term.
+    page_two = {"risico"}
+    assert inject_terms("De dpia.", term_index, page_two, memo=memo) == enriched
+    assert page_two == {"risico", "dpia"}
+    assert memo.hits == 1
+
+
+# --- ProtectedRanges -------------------------------------------------------
+
+
+def test_protected_ranges_merges_touching_ranges_and_detects_overlap():
+    ranges = ProtectedRanges()
+    ranges.add(10, 20)
+    ranges.add(30, 40)
+    ranges.add(20, 30)  # bridges both neighbours into one range
+
+    assert ranges.overlaps(15, 16)
+    assert ranges.overlaps(39, 50)
+    assert not ranges.overlaps(0, 10)  # ranges are half-open
+    assert not ranges.overlaps(40, 45)
+
+
+def test_inject_terms_enriches_text_between_existing_markup():
+    term_map = create_term_map(make_begrippenkader(("dpia", "een beoordeling")))
+
+    text = '<a href="https://example.com/dpia">link</a> over de dpia <br>'
+    result = inject_terms(text, term_map)
+
+    assert result.count('<span class="aiv-definition">') == 1
+    assert 'href="https://example.com/dpia"' in result
+    assert "over de <span" in result
+
+
+def test_segment_text_nodes_skips_markup_entities_and_definition_spans():
+    text = (
+        'Zie <a href="https://example.com/dpia">de dpia</a> &amp; '
+        '<span class="aiv-definition">term<span class="aiv-definition-text">'
+        "<strong>uitleg</strong></span></span> en verder<br/>einde"
+    )
+
+    nodes = [text[start:end] for start, end in segment_text_nodes(text)]
+
+    assert nodes == ["Zie ", "de dpia", " ", " ", " en verder", "einde"]
+
+
+def test_inject_terms_enriches_link_text_but_not_its_href():
+    term_map = create_term_map(make_begrippenkader(("dpia", "een beoordeling")))
+
+    text = 'Zie <a href="https://example.com/dpia">de dpia</a>.'
+    result = inject_terms(text, term_map)
+
+    assert 'href="https://example.com/dpia"' in result
+    assert '>de <span class="aiv-definition">dpia<span' in result
+
+
 # --- once_per_page via process_tasks --------------------------------------
 
 
@@ -247,3 +452,401 @@ def test_process_dpia_enriches_top_level_description():
     result = process_dpia(dpia, term_map)
 
     assert "aiv-definition" in result["description"]
+
+
+# --- inject_terms: single-pass matching -----------------------------------
+
+
+def test_inject_terms_enriches_terms_after_earlier_replacements():
+    """Every term gets its own tooltip, regardless of how many tooltips were
+    inserted before it in the same text."""
+    term_map = create_term_map(
+        make_begrippenkader(
+            ("gegevensverwerking", "een verwerking " * 10),
+            ("betrokkene", "een persoon " * 10),
+            ("dpia", "een beoordeling"),
+        )
+    )
+
+    result = inject_terms("De betrokkene en de dpia bij de gegevensverwerking.", term_map)
+
+    assert '<span class="aiv-definition">betrokkene' in result
+    assert '<span class="aiv-definition">dpia' in result
+    assert '<span class="aiv-definition">gegevensverwerking' in result
+
+
+def test_inject_terms_prefers_longest_term_and_respects_word_boundaries():
+    term_map = create_term_map(
+        make_begrippenkader(("gegevens", "data"), ("persoonsgegevens", "data over personen"))
+    )
+
+    result = inject_terms("Persoonsgegevens zijn geen metagegevens.", term_map)
+
+    # The longer term wins the overlapping occurrence...
+    assert '<span class="aiv-definition">Persoonsgegevens' in result
+    assert '<span class="aiv-definition">gegevens' not in result
+    # ...and "gegevens" inside "metagegevens" is not a whole word.
+    assert "metagegevens." in result
+
+
+def test_process_dpia_copies_by_default_and_enriches_in_place_on_request():
+    term_map = create_term_map(make_begrippenkader(("persoonsgegeven", "een gegeven")))
+    dpia = {"name": "DPIA", "description": "", "tasks": _deel_with_repeated_term()}
+    original_task = dpia["tasks"][0]["tasks"][0]["task"]
+
+    copied = process_dpia(dpia, term_map)
+    assert dpia["tasks"][0]["tasks"][0]["task"] == original_task
+
+    in_place = process_dpia(dpia, term_map, in_place=True)
+    assert in_place is dpia
+    assert in_place == copied
+    assert "aiv-definition" in dpia["tasks"][0]["tasks"][0]["task"]
+
+
+# --- parallel page enrichment ---------------------------------------------
+
+
+def test_parallel_pages_match_sequential_output_in_both_modes():
+    term_map = create_term_map(
+        make_begrippenkader(("persoonsgegeven", "een gegeven"), ("dpia", "een beoordeling"))
+    )
+    dpia = {
+        "name": "DPIA",
+        "description": "Een dpia over een persoonsgegeven.",
+        "tasks": _deel_with_repeated_term() + _deel_with_repeated_term(),
+    }
+
+    for once_per_page in (False, True):
+        sequential = process_dpia(dpia, term_map, once_per_page)
+        parallel = process_dpia(dpia, term_map, once_per_page, jobs=2)
+        assert parallel == sequential
+
+
+# --- references output mode -----------------------------------------------
+
+
+def test_references_mode_expands_to_inline_output_with_used_terms_only():
+    term_map = create_term_map(
+        make_begrippenkader(
+            ("persoonsgegeven", "een <gegeven>"),
+            ("dpia", "een beoordeling"),
+            ("iama", "ongebruikt"),
+        )
+    )
+    dpia = {
+        "name": "DPIA",
+        "description": "Een dpia over een persoonsgegeven.",
+        "tasks": _deel_with_repeated_term(),
+    }
+
+    inline = process_dpia(dpia, term_map)
+    references = process_dpia(dpia, term_map, output_mode="references")
+
+    assert references != inline
+    assert 'data-definition="dpia"' in references["description"]
+    assert expand_definition_references(references, term_map) == inline
+    table = build_definitions_table(references, term_map)
+    assert set(table) == {"persoonsgegeven", "dpia"}
+    assert table["persoonsgegeven"]["text"].startswith("een &lt;gegeven&gt;")
+
+
+def test_references_mode_keys_table_by_definition_for_all_variants():
+    term_map = create_term_map(
+        {
+            "definitions": [
+                {
+                    "id": "pg",
+                    "term": "Persoonsgegeven",
+                    "definition": "een gegeven",
+                    "metadata": {
+                        "meervoudsvormen": ["persoonsgegevens"],
+                        "alternatieve_spellingen": ["persoons-gegeven"],
+                    },
+                }
+            ]
+        }
+    )
+    dpia = {
+        "name": "DPIA",
+        "description": "Persoonsgegevens, een persoons-gegeven en een persoonsgegeven.",
+        "tasks": [],
+    }
+
+    references = process_dpia(dpia, term_map, output_mode="references")
+
+    assert (
+        'data-definition="pg" data-variant="meervoud">Persoonsgegevens'
+        in (references["description"])
+    )
+    table = build_definitions_table(references, term_map)
+    assert table == {"pg": {"term": "Persoonsgegeven", "text": "een gegeven"}}
+    assert expand_definition_references(references, term_map) == process_dpia(dpia, term_map)
+
+
+# --- inflection matching ---------------------------------------------------
+
+
+def test_dutch_inflections_cover_plurals_diminutives_and_stem_changes():
+    def forms(term):
+        return {stem + suffix for stem, suffixes in dutch_inflections(term) for suffix in suffixes}
+
+    assert {"partijen", "partijtje", "partijtjes"} <= forms("partij")
+    assert {"risico's", "risicootje"} & forms("risico") == {"risico's"}
+    assert {"derden", "functies"} <= forms("derde") | forms("functie")
+    assert {"systemen", "bewijzen", "gebruikers", "bakken"} <= (
+        forms("systeem") | forms("bewijs") | forms("gebruiker") | forms("bak")
+    )
+
+
+def test_inflections_are_opt_in_and_use_the_hoofdterm_definition():
+    begrippenkader = make_begrippenkader(
+        ("Partij", "een deelnemer"), ("DPIA", "een beoordeling"), ("Systeem", "een geheel")
+    )
+    text = "De partijen voeren DPIA's uit op systemen, niet op partijenoverleg."
+
+    plain = inject_terms(text, TermIndex.from_begrippenkader(begrippenkader))
+    assert "De partijen" in plain
+    assert "op systemen" in plain
+
+    result = inject_terms(text, TermIndex.from_begrippenkader(begrippenkader, inflections=True))
+    assert '<span class="aiv-definition">partijen<span class="aiv-definition-text">' in result
+    assert '<span class="aiv-definition">DPIA&#x27;s<span' in result
+    assert '<span class="aiv-definition">systemen<span' in result
+    assert "partijenoverleg" in result
+    assert "meervoudsvorm" not in result
+
+
+def test_explicit_meervoudsvorm_overrides_inflection():
+    begrippenkader = {
+        "definitions": [
+            {
+                "id": "partij",
+                "term": "Partij",
+                "definition": "een deelnemer",
+                "metadata": {"meervoudsvormen": ["Partijen"]},
+            }
+        ]
+    }
+    term_index = TermIndex.from_begrippenkader(begrippenkader, inflections=True)
+
+    result = inject_terms("Alle partijen en één partijtje.", term_index)
+
+    assert "Dit is een meervoudsvorm van Partij" in result
+    assert '<span class="aiv-definition">partijtje<span' in result
+    assert term_index.regular_variants() == ["partijen"]
+
+
+# --- tooltip budgets -------------------------------------------------------
+
+
+def test_budget_per_field_keeps_first_matches_in_text_order():
+    term_map = create_term_map(
+        make_begrippenkader(("dpia", "d"), ("persoonsgegeven", "p"), ("iama", "i"))
+    )
+    budget = TooltipBudget(per_field=2)
+
+    result = inject_terms("Een iama, een dpia en een persoonsgegeven.", term_map, budget=budget)
+
+    assert result.count('class="aiv-definition"') == 2
+    assert "een persoonsgegeven." in result
+    assert budget.suppressed == 1
+
+
+def test_budget_per_term_per_page_resets_at_every_page():
+    term_map = create_term_map(make_begrippenkader(("persoonsgegeven", "een gegeven")))
+    budget = TooltipBudget(per_term_per_page=1)
+
+    result = process_tasks(
+        _deel_with_repeated_term() + _deel_with_repeated_term(), term_map, budget=budget
+    )
+
+    for page in result:
+        assert "aiv-definition" in page["tasks"][0]["task"]
+        assert "aiv-definition" not in page["tasks"][1]["task"]
+    assert budget.suppressed == 2
+
+
+def test_budget_per_page_gives_same_result_with_memo_and_in_parallel():
+    term_map = create_term_map(
+        make_begrippenkader(("persoonsgegeven", "een gegeven"), ("dpia", "een beoordeling"))
+    )
+    dpia = {
+        "name": "DPIA",
+        "description": "Een dpia over een persoonsgegeven.",
+        "tasks": _deel_with_repeated_term() + _deel_with_repeated_term(),
+    }
+
+    budgets = [TooltipBudget(per_page=1) for _ in range(3)]
+    plain = process_dpia(dpia, term_map, budget=budgets[0])
+    memoized = process_dpia(dpia, term_map, memo=EnrichmentMemo(), budget=budgets[1])
+    parallel = process_dpia(dpia, term_map, jobs=2, budget=budgets[2])
+
+    assert plain["description"].count('class="aiv-definition"') == 1
+    assert plain["tasks"][0]["tasks"][1]["task"] == "Nog een persoonsgegeven daar"
+    assert memoized == plain
+    assert parallel == plain
+    assert [(budget.suppressed, budget.skipped_fields) for budget in budgets] == [(1, 2)] * 3
+
+
+def test_exhausted_page_budget_skips_matching(monkeypatch):
+    term_index = TermIndex(create_term_map(make_begrippenkader(("persoonsgegeven", "p"))))
+    budget = TooltipBudget(per_page=1)
+    calls = []
+    find_all = term_index.find_all
+    monkeypatch.setattr(term_index, "find_all", lambda *args: calls.append(args) or find_all(*args))
+
+    first = inject_terms("Een persoonsgegeven.", term_index, budget=budget)
+    second = inject_terms("Nog een persoonsgegeven.", term_index, budget=budget)
+
+    assert "aiv-definition" in first
+    assert second == "Nog een persoonsgegeven."
+    assert len(calls) == 1
+    assert (budget.suppressed, budget.skipped_fields) == (0, 1)
+
+
+# --- term profiler ---------------------------------------------------------
+
+
+def test_term_profiler_classifies_every_candidate_match():
+    term_index = TermIndex(
+        create_term_map(
+            make_begrippenkader(
+                ("persoonlijk gegeven", "p"), ("gegeven", "g"), ("dpia", "d"), ("iama", "i")
+            )
+        )
+    )
+    profiler = TermProfiler()
+    page = set()
+
+    inject_terms("Een dpia.", term_index, page, profiler=profiler)
+    inject_terms(
+        "Een persoonlijk gegeven, een gegeven, nog een gegeven en een dpia.",
+        term_index,
+        page,
+        profiler=profiler,
+        budget=TooltipBudget(per_field=1),
+    )
+
+    report = profiler.report(term_index)
+    stats = {entry["term"]: entry for entry in report["terms"]}
+    assert report["fields"] == 2
+    assert stats["dpia"]["attempted"] == 2
+    assert stats["dpia"]["accepted"] == 1
+    assert stats["dpia"]["rejected"]["once_per_page"] == 1
+    assert stats["gegeven"]["rejected"] == {
+        "overlap": 1,
+        "once_per_page": 0,
+        "repeat_in_field": 1,
+        "budget": 1,
+    }
+    assert report["never_matched"] == ["iama"]
+    text = TermProfiler.format_report(report)
+    assert "Never matched (1):\n  iama" in text
+
+
+# --- contains conditions ---------------------------------------------------
+
+
+def _document_with_contains_condition(value):
+    return {
+        "tasks": [
+            {
+                "id": "1",
+                "description": "Deel 1",
+                "tasks": [
+                    {"id": "1.1", "task": "Een persoonsgegeven"},
+                    {
+                        "id": "1.2",
+                        "task": "Welke gegevens?",
+                        "type": ["checkbox_option"],
+                        "options": [
+                            {"value": "Naam"},
+                            {"value": "Categorie: persoonsgegeven"},
+                        ],
+                    },
+                    {
+                        "id": "1.3",
+                        "task": "Specificeer",
+                        "dependencies": [
+                            {
+                                "type": "conditional",
+                                "condition": {"id": "1.2", "operator": "contains", "value": value},
+                                "action": "show",
+                            }
+                        ],
+                    },
+                ],
+            }
+        ]
+    }
+
+
+def test_contains_condition_takes_the_enriched_value_of_its_option():
+    term_map = create_term_map(make_begrippenkader(("persoonsgegeven", "een gegeven")))
+    document = _document_with_contains_condition("'Categorie: persoonsgegeven'")
+
+    assert resolve_contains_conditions(document) == 1
+    condition = document["tasks"][0]["tasks"][2]["dependencies"][0]["condition"]
+    assert condition["option_index"] == 1
+    assert condition["value"] == "Categorie: persoonsgegeven"
+
+    for once_per_page in (False, True):
+        result = process_dpia(document, term_map, once_per_page)
+        option = result["tasks"][0]["tasks"][1]["options"][1]["value"]
+        condition = result["tasks"][0]["tasks"][2]["dependencies"][0]["condition"]
+        # In once-per-page mode the option is not enriched (the term occurs
+        # earlier on the page); the condition still equals the option
+        assert ("aiv-definition" in option) is not once_per_page
+        assert condition["value"] == option
+    assert document["tasks"][0]["tasks"][2]["dependencies"][0]["condition"]["value"] == (
+        "Categorie: persoonsgegeven"
+    )
+
+
+def test_enrich_document_resolves_contains_conditions_in_its_walk(tmp_path, monkeypatch):
+    term_map = create_term_map(make_begrippenkader(("persoonsgegeven", "een gegeven")))
+    walks = []
+    walk_document = definition_enricher.walk_document
+    monkeypatch.setattr(
+        definition_enricher,
+        "walk_document",
+        lambda document, visitors: walks.append(visitors) or walk_document(document, visitors),
+    )
+
+    for page_cache in (None, PageCache(tmp_path, "context")):
+        walks.clear()
+        document = _document_with_contains_condition("'Categorie: persoonsgegeven'")
+        # The condition comes before the task with the option
+        tasks = document["tasks"][0]["tasks"]
+        tasks.insert(1, tasks.pop())
+        enrich_document(document, term_map, page_cache=page_cache)
+
+        # With a page cache the enriched pages are walked again to sync the
+        # conditions, as cached pages replace the source tasks
+        assert len(walks) == (1 if page_cache is None else 2)
+        condition = tasks[1]["dependencies"][0]["condition"]
+        assert condition["option_index"] == 1
+        assert condition["value"] == tasks[2]["options"][1]["value"]
+        assert "aiv-definition" in condition["value"]
+
+
+def test_contains_condition_without_matching_option_fails():
+    document = _document_with_contains_condition("'Categorie: bestaat niet'")
+
+    with pytest.raises(ValueError, match=r"task 1\.3: value .* matches no option of task '1\.2'"):
+        resolve_contains_conditions(document)
+
+
+def test_contains_condition_with_invalid_option_index_fails():
+    term_map = create_term_map(make_begrippenkader(("persoonsgegeven", "een gegeven")))
+    document = _document_with_contains_condition("'Naam'")
+    condition = document["tasks"][0]["tasks"][2]["dependencies"][0]["condition"]
+    condition["option_index"] = 1
+
+    with pytest.raises(ValueError, match=r"option_index 1 does not match value \"'Naam'\""):
+        resolve_contains_conditions(document)
+
+    # An option_index set in the source for a task that does not exist
+    condition["id"] = "9.9"
+    with pytest.raises(ValueError, match=r"task 1\.3: option_index 1 refers to no option of task"):
+        process_dpia(document, term_map)
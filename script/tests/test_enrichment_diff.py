@@ -0,0 +1,299 @@
+"""Tests for the differential check against the reference enricher.
+
+Covers:
+- iter_enrichable_fields visits exactly the fields process_dpia enriches, with
+  the same page rules,
+- on randomized begrippenkaders and documents the active engine matches an
+  independent oracle, and compare_engines reports exactly the fields on which
+  the reference engine deviates from it, in both definition modes,
+- minimize_divergence shrinks a divergent field to the terms and text needed,
+- divergences are classified by the terms only one engine enriched and only
+  divergences missing from the baseline, including changed outputs of an
+  accepted field, are reported as new,
+- the real sources have no divergences beyond the checked-in baseline.
+"""
+
+import copy
+import random
+import re
+from pathlib import Path
+
+import pytest
+import reference_enricher
+from definition_enricher import (
+    TermIndex,
+    create_term_map,
+    inject_terms,
+    load_yaml,
+    process_dpia,
+)
+from enrichment_diff import (
+    DEFAULT_BASELINE,
+    MODES,
+    compare_engines,
+    iter_enrichable_fields,
+    load_baseline,
+    minimize_divergence,
+    new_divergences,
+    write_baseline,
+)
+
+SOURCES_DIR = Path(__file__).resolve().parents[2] / "sources"
+
+LETTERS = "abdeklmnoprstuv"
+ALT_TYPE_PRIORITY = {"": 0, "meervoud": 1, "spelling": 2, "term": 3}
+
+
+def _set_path(document, path, value):
+    for key in path[:-1]:
+        document = document[key]
+    document[path[-1]] = value
+
+
+def _random_begrippenkader(rng):
+    words = sorted({"".join(rng.choices(LETTERS, k=rng.randint(2, 5))) for _ in range(10)})
+    phrases = iter(dict.fromkeys(" ".join(rng.sample(words, rng.randint(1, 2))) for _ in range(40)))
+    definitions = []
+    alternative_terms = []
+    for index in range(rng.randint(3, 6)):
+        term = next(phrases, None)
+        if term is None:
+            break
+        metadata = {"toelichting": f"toelichting {index}" if rng.random() < 0.5 else ""}
+        if rng.random() < 0.4:
+            metadata["meervoudsvormen"] = [p for p in [next(phrases, None)] if p]
+        if rng.random() < 0.3:
+            metadata["alternatieve_spellingen"] = [p for p in [next(phrases, None)] if p]
+        definitions.append(
+            {"id": term, "term": term, "definition": f"omschrijving {index}", "metadata": metadata}
+        )
+        if rng.random() < 0.3 and (alternative := next(phrases, None)):
+            alternative_terms.append({"term": alternative, "voorkeur_id": term})
+    return words, {"definitions": definitions, "alternative_terms": alternative_terms}
+
+
+def _random_document(rng, words):
+    def text():
+        return " ".join(rng.choices(words, k=rng.randint(1, 12)))
+
+    def subtask():
+        return {
+            "id": "x",
+            "task": text(),
+            "description": text(),
+            "type": ["radio_option"],
+            "options": [{"value": text(), "label": text()} for _ in range(rng.randint(0, 2))],
+            "dependencies": [
+                {"type": "conditional", "condition": {"operator": "contains", "value": text()}}
+            ],
+            "tasks": [],
+        }
+
+    return {
+        "description": text(),
+        "tasks": [
+            {"id": str(page), "description": text(), "tasks": [subtask() for _ in range(2)]}
+            for page in range(3)
+        ],
+    }
+
+
+def _oracle(text, term_map, term_index, already_matched):
+    """Independent model of the matching rules on plain text.
+
+    In priority order, every term claims its first occurrence that does not
+    overlap a higher priority match.
+    """
+    ordered = sorted(
+        term_map, key=lambda key: (ALT_TYPE_PRIORITY[term_map[key].alt_type], -len(key))
+    )
+    accepted = []
+    taken = set()
+    for key in ordered:
+        if already_matched is not None and key in already_matched:
+            continue
+        for match in re.finditer(r"\b" + re.escape(key) + r"\b", text, re.IGNORECASE):
+            span = set(range(*match.span()))
+            if span & taken:
+                continue
+            accepted.append((match.start(), match.end(), key))
+            taken |= span
+            if already_matched is not None:
+                already_matched.add(key)
+            break
+    for start, end, key in sorted(accepted, reverse=True):
+        text = text[:start] + term_index.tooltip(text[start:end], "inline", key) + text[end:]
+    return text
+
+
+def _run_per_field(engine, document, term_map, once_per_page):
+    pages = {}
+    results = {}
+    for path, text, page in iter_enrichable_fields(document):
+        matched = pages.setdefault(page, set()) if once_per_page and page is not None else None
+        results[path] = engine(text, matched)
+    return results
+
+
+def test_iter_enrichable_fields_follows_process_dpia():
+    term_map = create_term_map(
+        {"definitions": [{"id": "dpia", "term": "dpia", "definition": "een beoordeling"}]}
+    )
+    document = {
+        "description": "Over de dpia",
+        "tasks": [
+            {
+                "id": "1",
+                "description": "Deel over de dpia",
+                "tasks": [
+                    {
+                        "id": "1.1",
+                        "task": "Is er een dpia?",
+                        "description": "De dpia",
+                        "type": ["radio_option"],
+                        "options": [{"value": "dpia", "label": "Een dpia"}],
+                    },
+                    {
+                        "id": "1.2",
+                        "task": "Toelichting dpia",
+                        "dependencies": [
+                            {
+                                "type": "conditional",
+                                "condition": {"operator": "contains", "value": "'dpia'"},
+                            }
+                        ],
+                        "tasks": [{"id": "1.2.1", "task": "Nog een dpia"}],
+                    },
+                ],
+            },
+            {"id": "2", "description": "Tweede dpia"},
+        ],
+    }
+    term_index = TermIndex(term_map)
+
+    for once_per_page in (False, True):
+        expected = process_dpia(copy.deepcopy(document), term_index, once_per_page)
+        walked = copy.deepcopy(document)
+        results = _run_per_field(
+            lambda text, matched: inject_terms(text, term_index, matched),
+            document,
+            term_map,
+            once_per_page,
+        )
+        for path, value in results.items():
+            _set_path(walked, path, value.strip("'") if "dependencies" in path else value)
+        assert walked == expected
+
+
+@pytest.mark.parametrize("seed", range(25))
+def test_compare_engines_on_random_begrippenkaders(seed):
+    rng = random.Random(seed)  # noqa: S311 - reproducible test data, not crypto
+    words, begrippenkader = _random_begrippenkader(rng)
+    term_map = create_term_map(begrippenkader)
+    term_index = TermIndex(term_map)
+    reference_map = {key: dict(entry) for key, entry in term_map.items()}
+    document = _random_document(rng, words)
+
+    for once_per_page in (False, True):
+        oracle = _run_per_field(
+            lambda text, matched: _oracle(text, term_map, term_index, matched),
+            document,
+            term_map,
+            once_per_page,
+        )
+        active = _run_per_field(
+            lambda text, matched: inject_terms(text, term_index, matched),
+            document,
+            term_map,
+            once_per_page,
+        )
+        reference = _run_per_field(
+            lambda text, matched: reference_enricher.inject_terms(text, reference_map, matched),
+            document,
+            term_map,
+            once_per_page,
+        )
+        assert active == oracle
+
+        result = compare_engines(document, term_map, once_per_page, minimize=False)
+        diverging = {tuple(divergence["path"]) for divergence in result["divergences"]}
+        assert diverging == {path for path in oracle if reference[path] != oracle[path]}
+        assert result["fields"] == len(oracle)
+        for divergence in result["divergences"]:
+            assert divergence["active"] == oracle[tuple(divergence["path"])]
+
+
+def test_minimize_divergence_keeps_only_what_is_needed():
+    term_map = create_term_map(
+        {
+            "definitions": [
+                {"id": term, "term": term, "definition": "een omschrijving"}
+                for term in ("verwerking", "dpia", "avg", "iama")
+            ]
+        }
+    )
+    # After enriching "verwerking" and then "dpia", the reference engine still
+    # protects the old (unshifted) offsets of the first tooltip, which now
+    # cover "avg"
+    text = "Bij de dpia is volgens de avg de verwerking vastgelegd, los van de iama."
+
+    repro = minimize_divergence(text, term_map)
+
+    assert repro["text"] == "dpia avg verwerking"
+    assert list(repro["terms"]) == ["verwerking", "dpia", "avg"]
+    assert repro["already_matched"] is None
+    assert repro["reference"].count('class="aiv-definition"') == 2
+    assert repro["active"].count('class="aiv-definition"') == 3
+    assert minimize_divergence("Alleen een iama.", term_map) is None
+
+
+def test_baseline_accepts_only_known_divergences(tmp_path):
+    term_map = create_term_map(
+        {
+            "definitions": [
+                {"id": term, "term": term, "definition": "een omschrijving"}
+                for term in ("verwerking", "dpia", "avg", "iama")
+            ]
+        }
+    )
+    document = {"description": "dpia avg verwerking", "tasks": []}
+    result = compare_engines(document, term_map, minimize=False)
+    (divergence,) = result["divergences"]
+    assert divergence["terms"] == {"added": ["avg"], "removed": []}
+    assert divergence["classification"] == "missed-by-reference"
+
+    report = [{"source": "sources/dpia.yaml", **result}]
+    baseline_path = tmp_path / "baseline.json"
+    assert new_divergences(report, load_baseline(baseline_path)) == [
+        ("sources/dpia.yaml", "every-occurrence", divergence)
+    ]
+    write_baseline(baseline_path, report, {})
+    assert new_divergences(report, load_baseline(baseline_path)) == []
+
+    # The same field diverging on another term is new
+    document["description"] = "dpia iama verwerking"
+    changed = [{"source": "dpia.yaml", **compare_engines(document, term_map, minimize=False)}]
+    (new,) = new_divergences(changed, load_baseline(baseline_path))
+    assert new[2]["terms"] == {"added": ["iama"], "removed": []}
+
+    # So is any other change to the field, even with the same divergent terms
+    document["description"] = "Een dpia avg verwerking"
+    edited = [{"source": "dpia.yaml", **compare_engines(document, term_map, minimize=False)}]
+    (new,) = new_divergences(edited, load_baseline(baseline_path))
+    assert new[2]["terms"] == divergence["terms"]
+
+
+@pytest.mark.parametrize(
+    "entry",
+    load_yaml(SOURCES_DIR / "assessments.yaml")["assessments"],
+    ids=lambda entry: entry["name"],
+)
+def test_real_sources_have_no_divergences_beyond_baseline(entry):
+    term_map = create_term_map(load_yaml(SOURCES_DIR / entry["begrippenkader"]))
+    document = load_yaml(SOURCES_DIR / entry["source"])
+    report = [
+        {"source": entry["source"], **compare_engines(document, term_map, once, minimize=False)}
+        for once in MODES.values()
+    ]
+
+    assert new_divergences(report, load_baseline(DEFAULT_BASELINE)) == []
@@ -0,0 +1,33 @@
+"""Tests for the input file watcher of run_all --watch.
+
+Covers:
+- changed files are reported once, including files that appear or disappear,
+  both when polling only and with inotify where available,
+- wait returns an empty set when nothing changes before the timeout.
+"""
+
+import pytest
+from file_watcher import FileWatcher
+
+
+@pytest.mark.parametrize("use_inotify", [False, True])
+def test_watcher_reports_changed_files_once(tmp_path, use_inotify):
+    source = tmp_path / "dpia.yaml"
+    source.write_text("name: DPIA", encoding="utf-8")
+    begrippen = tmp_path / "begrippenkader.yaml"
+    begrippen.write_text("definitions: []", encoding="utf-8")
+    schema = tmp_path / "schema.json"
+
+    with FileWatcher([source, begrippen, schema], interval=0.01, debounce=0) as watcher:
+        assert watcher.wait(timeout=0.05) == set()
+
+        # An editor's save by writing a new file and renaming it over the old one
+        replacement = tmp_path / ".dpia.yaml.swp"
+        replacement.write_text("name: Gewijzigd", encoding="utf-8")
+        replacement.replace(source)
+        assert watcher.wait(timeout=5) == {source}
+        assert watcher.changed() == set()
+
+        schema.write_text("{}", encoding="utf-8")
+        begrippen.unlink()
+        assert watcher.wait(timeout=5) == {schema, begrippen}
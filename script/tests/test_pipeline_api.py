@@ -0,0 +1,141 @@
+"""Tests for the in-process pipeline API.
+
+Covers:
+- build returns the same document and Markdown as run_all writes, without
+  touching the caller's source, the file system or the logging handlers,
+- invalid documents are reported as error diagnostics instead of raised,
+- SchemaValidator adds no logging handlers and keeps a bounded history,
+- process_yaml_file raises instead of exiting the process.
+"""
+
+import json
+import logging
+from pathlib import Path
+
+import pytest
+import run_all
+import yaml
+from generate_md_table_tasks import process_yaml_file
+from pipeline_api import build, compile_begrippenkader
+from schema_validator import SchemaValidator
+
+REPO_ROOT = Path(__file__).resolve().parent.parent.parent
+SCHEMA_PATH = REPO_ROOT / "schemas" / "assessment-definition.v2.schema.json"
+
+SOURCE = {
+    "name": "Mini DPIA",
+    "description": "Een minimale DPIA.",
+    "urn": "urn:nl:dpia",
+    "tasks": [
+        {
+            "id": "1",
+            "task": "Eerste taak",
+            "description": "Over de DPIA",
+            "type": ["open_text"],
+            "repeatable": False,
+        },
+    ],
+}
+
+BEGRIPPENKADER = {"definitions": [{"id": "dpia", "term": "DPIA", "definition": "Een beoordeling"}]}
+
+
+def _handlers():
+    loggers = [logging.getLogger(), *logging.Logger.manager.loggerDict.values()]
+    return sum(len(getattr(logger, "handlers", ())) for logger in loggers)
+
+
+def test_build_matches_run_all_without_side_effects(tmp_path, monkeypatch):
+    (tmp_path / "dpia.yaml").write_text(yaml.safe_dump(SOURCE), encoding="utf-8")
+    (tmp_path / "begrippenkader.yaml").write_text(yaml.safe_dump(BEGRIPPENKADER), encoding="utf-8")
+    assessment = run_all.Assessment(
+        name="DPIA",
+        source=tmp_path / "dpia.yaml",
+        schema=SCHEMA_PATH,
+        begrippenkader=tmp_path / "begrippenkader.yaml",
+        output_json=tmp_path / "out" / "DPIA.json",
+        output_md=tmp_path / "out" / "DPIA.md",
+    )
+    options = {
+        "skip_validation": False,
+        "jobs": 1,
+        "cache_dir": None,
+        "output_mode": "inline",
+        "inflections": False,
+        "tooltip_limits": (None, None, None),
+        "markdown": True,
+        "force": True,
+    }
+    script_dir = Path(run_all.__file__).parent
+    run_all.build_assessment(
+        assessment,
+        options,
+        run_all.DefinitionEnricher(script_dir),
+        SchemaValidator(script_dir),
+    )
+
+    schema = json.loads(SCHEMA_PATH.read_text(encoding="utf-8"))
+    term_index = compile_begrippenkader(BEGRIPPENKADER)
+    workdir = tmp_path / "empty"
+    workdir.mkdir()
+    monkeypatch.chdir(workdir)
+    handlers = _handlers()
+
+    results = [build(SOURCE, term_index, schema, name="dpia.yaml") for _ in range(50)]
+
+    result = results[0]
+    assert result.ok, result.errors
+    assert result.document == json.loads(assessment.output_json.read_text(encoding="utf-8"))
+    assert result.markdown == assessment.output_md.read_text(encoding="utf-8")
+    assert all(other.document == result.document for other in results)
+    assert "aiv-definition" not in SOURCE["tasks"][0]["description"]
+    assert list(workdir.iterdir()) == []
+    assert _handlers() == handlers
+
+
+def test_build_reports_invalid_documents_as_diagnostics():
+    schema = json.loads(SCHEMA_PATH.read_text(encoding="utf-8"))
+
+    result = build({"name": "Kapot"}, BEGRIPPENKADER, schema)
+    assert not result.ok
+    assert result.document is None
+    assert "Validation error" in result.errors[0]
+
+    source = {
+        "tasks": [
+            {"id": "1", "type": ["radio_option"], "options": [{"value": "Ja"}]},
+            {
+                "id": "2",
+                "dependencies": [
+                    {
+                        "type": "conditional",
+                        "condition": {"id": "1", "operator": "contains", "value": "Misschien"},
+                    }
+                ],
+            },
+        ]
+    }
+    result = build(source, BEGRIPPENKADER, markdown=False)
+    assert not result.ok
+    assert "Misschien" in result.errors[0]
+
+
+def test_schema_validator_adds_no_handlers_and_keeps_a_bounded_history():
+    handlers = _handlers()
+    validators = [SchemaValidator(REPO_ROOT, max_results=3) for _ in range(5)]
+    assert _handlers() == handlers
+
+    validator = validators[0]
+    for _ in range(5):
+        validator.validate_data({"name": "Kapot"}, SCHEMA_PATH)
+    assert len(validator.validation_results) == 3
+
+
+def test_process_yaml_file_raises_instead_of_exiting(tmp_path):
+    broken = tmp_path / "broken.yaml"
+    broken.write_text("tasks: [", encoding="utf-8")
+
+    with pytest.raises(yaml.YAMLError):
+        process_yaml_file(broken)
+    with pytest.raises(FileNotFoundError):
+        process_yaml_file(tmp_path / "missing.yaml")
@@ -0,0 +1,208 @@
+"""Tests for the pipeline server and its client.
+
+Covers:
+- snippets and documents are enriched with the loaded term index, which is
+  loaded again after the begrippenkader changes on disk,
+- validate and build requests, over a Unix domain socket and over localhost
+  HTTP, and concurrent requests,
+- invalid requests are answered with 400 and the error,
+- requests a web page could forge (non-JSON bodies, foreign Host headers) and
+  paths outside the allowed directories are refused,
+- the Unix socket is created accessible to the current user only, and the
+  client waits for room in its full listen queue.
+"""
+
+import http.client
+import json
+import os
+import shutil
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+import yaml
+from pipeline_client import PipelineClient, PipelineError, _UnixHTTPConnection
+from pipeline_server import Pipeline, create_server
+
+REPO_ROOT = Path(__file__).resolve().parent.parent.parent
+SCHEMA_PATH = REPO_ROOT / "schemas" / "assessment-definition.v2.schema.json"
+SOURCE = {
+    "name": "Mini DPIA",
+    "description": "Een minimale DPIA.",
+    "urn": "urn:nl:dpia",
+    "tasks": [
+        {
+            "id": "1",
+            "task": "Eerste taak",
+            "description": "Over de DPIA",
+            "type": ["open_text"],
+            "repeatable": False,
+        },
+    ],
+}
+BEGRIPPENKADER = {"definitions": [{"id": "dpia", "term": "DPIA", "definition": "Een beoordeling"}]}
+
+
+@pytest.fixture
+def inputs(tmp_path):
+    shutil.copy(SCHEMA_PATH, tmp_path / "schema.json")
+    (tmp_path / "dpia.yaml").write_text(yaml.safe_dump(SOURCE), encoding="utf-8")
+    (tmp_path / "begrippenkader.yaml").write_text(yaml.safe_dump(BEGRIPPENKADER), encoding="utf-8")
+    return tmp_path
+
+
+@pytest.fixture(params=["unix", "http"])
+def client(request, tmp_path):
+    pipeline = Pipeline(tmp_path, root=tmp_path)
+    if request.param == "unix":
+        server = create_server(pipeline, socket_path=tmp_path / "pipeline.sock")
+        client = PipelineClient(socket_path=tmp_path / "pipeline.sock", timeout=30)
+    else:
+        server = create_server(pipeline, port=0)
+        client = PipelineClient(port=server.server_address[1], timeout=30)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield client
+    server.shutdown()
+    server.server_close()
+
+
+def test_enrich_reloads_a_changed_begrippenkader(inputs):
+    pipeline = Pipeline(inputs, root=inputs)
+    begrippen = inputs / "begrippenkader.yaml"
+
+    result = pipeline.enrich({"begrippenkader": str(begrippen), "text": "De DPIA en de taak"})
+    assert result["matched"] == ["dpia"]
+    tooltip = pipeline.term_index(begrippen).tooltip("DPIA", "inline", "dpia")
+    assert pipeline.enrich({"begrippenkader": str(begrippen), "text": "Een DPIA"})["text"] == (
+        "Een " + tooltip
+    )
+    assert pipeline.reloads == 0
+
+    begrippen.write_text(
+        yaml.safe_dump({"definitions": [{"id": "taak", "term": "taak", "definition": "Werk"}]}),
+        encoding="utf-8",
+    )
+    result = pipeline.enrich({"begrippenkader": str(begrippen), "text": "De DPIA en de taak"})
+    assert result["matched"] == ["taak"]
+    assert pipeline.reloads == 1
+
+    document = pipeline.enrich(
+        {"begrippenkader": str(begrippen), "document": {"description": "Een taak", "tasks": []}}
+    )["document"]
+    assert "aiv-definition" in document["description"]
+
+
+def test_client_requests(client, inputs):
+    begrippen = str(inputs / "begrippenkader.yaml")
+    schema = str(inputs / "schema.json")
+
+    assert client.validate(schema=schema, source=str(inputs / "dpia.yaml"))["valid"]
+    result = client.validate(schema=schema, data={"name": "Kapot"})
+    assert not result["valid"]
+    assert result["errors"]
+
+    [result] = client.build(
+        assessment={
+            "name": "DPIA",
+            "source": str(inputs / "dpia.yaml"),
+            "schema": schema,
+            "begrippenkader": begrippen,
+            "output_json": str(inputs / "DPIA.json"),
+        }
+    )
+    assert (result["name"], result["ok"], result["skipped"]) == ("DPIA", True, False)
+    output = json.loads((inputs / "DPIA.json").read_text(encoding="utf-8"))
+    assert "aiv-definition" in output["tasks"][0]["description"]
+
+    texts = [f"Snippet {index} over de DPIA" for index in range(20)]
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(
+            executor.map(lambda text: client.enrich(begrippenkader=begrippen, text=text), texts)
+        )
+    assert all("aiv-definition" in result["text"] for result in results)
+
+    status = client.status()
+    assert status["requests"] == 24
+    assert status["term_indexes"] == [str((inputs / "begrippenkader.yaml").resolve())]
+
+    with pytest.raises(PipelineError, match=r"400.*begrippenkader"):
+        client.enrich(text="Zonder begrippenkader")
+    with pytest.raises(PipelineError, match=r"400.*unknown build options"):
+        client.build(manifest=str(inputs / "assessments.yaml"), options={"jobs": 4})
+
+
+def test_forgeable_requests_and_outside_paths_are_refused(inputs):
+    pipeline = Pipeline(inputs, root=inputs)
+    server = create_server(pipeline, port=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.server_address[1]
+
+    def post(headers, body=b"{}"):
+        connection = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        try:
+            connection.request("POST", "/validate", body, headers)
+            return connection.getresponse().status
+        finally:
+            connection.close()
+
+    try:
+        # A cross-site form post, and a request after DNS rebinding
+        assert post({"Content-Type": "text/plain"}) == 415
+        assert post({"Content-Type": "application/json", "Host": "evil.example:8765"}) == 403
+
+        client = PipelineClient(port=port, timeout=30)
+        outside = inputs.parent / "elders.json"
+        with pytest.raises(PipelineError, match=r"403.*outside"):
+            client.build(
+                assessment={
+                    "name": "DPIA",
+                    "source": str(inputs / "dpia.yaml"),
+                    "schema": str(inputs / "schema.json"),
+                    "begrippenkader": str(inputs / "begrippenkader.yaml"),
+                    "output_json": str(inputs / "sub" / ".." / ".." / outside.name),
+                }
+            )
+        assert not outside.exists()
+        with pytest.raises(PipelineError, match=r"403.*outside"):
+            client.validate(schema=str(inputs / "schema.json"), source="/etc/passwd")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_unix_socket_is_created_for_the_current_user_only(tmp_path):
+    umask = os.umask(0)
+    try:
+        server = create_server(Pipeline(tmp_path, root=tmp_path), socket_path=tmp_path / "s.sock")
+        server.server_close()
+        assert os.umask(0) == 0
+    finally:
+        os.umask(umask)
+
+    assert (tmp_path / "s.sock").stat().st_mode & 0o777 == 0o600
+
+
+def test_unix_client_waits_for_a_full_listen_queue(tmp_path):
+    socket_path = tmp_path / "full.sock"
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as listener:
+        listener.bind(str(socket_path))
+        listener.listen(0)
+        waiting = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        waiting.connect(str(socket_path))
+
+        with pytest.raises(BlockingIOError):
+            _UnixHTTPConnection(socket_path, timeout=0.05).connect()
+
+        accepted = []
+        timer = threading.Timer(0.1, lambda: accepted.append(listener.accept()[0]))
+        timer.start()
+        connection = _UnixHTTPConnection(socket_path, timeout=30)
+        connection.connect()
+        timer.join()
+        connection.close()
+        waiting.close()
+        for accepted_socket in accepted:
+            accepted_socket.close()
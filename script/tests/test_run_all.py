@@ -0,0 +1,248 @@
+"""Tests for the run_all pipeline.
+
+Covers:
+- a run parses the source YAML once and validates, enriches and renders the
+  same loaded document,
+- batch manifests resolve paths relative to the manifest and reject unknown
+  keys,
+- a batch build compiles a shared begrippenkader once, in-process and with a
+  worker pool, and reports failed assessments without stopping the others,
+- a rebuild is skipped while the recorded fingerprint matches, and happens
+  again after an input or output changes or with --force; --print-cache-key
+  prints the same fingerprint without building,
+- the pipeline version includes the jsonschema version without importing it,
+- in watch mode a change rebuilds only the assessments that use the changed
+  file.
+"""
+
+import importlib.metadata
+import json
+import sys
+from pathlib import Path
+
+import definition_enricher
+import pytest
+import run_all
+import yaml
+
+REPO_ROOT = Path(__file__).resolve().parent.parent.parent
+SCHEMA_PATH = REPO_ROOT / "schemas" / "assessment-definition.v2.schema.json"
+
+SOURCE = {
+    "name": "Mini DPIA",
+    "description": "Een minimale DPIA.",
+    "urn": "urn:nl:dpia",
+    "tasks": [
+        {
+            "id": "1",
+            "task": "Eerste taak",
+            "description": "Over de DPIA",
+            "type": ["open_text"],
+            "repeatable": False,
+        },
+    ],
+}
+
+BEGRIPPENKADER = {"definitions": [{"id": "dpia", "term": "DPIA", "definition": "Een beoordeling"}]}
+
+
+def test_run_all_parses_the_source_once(tmp_path, monkeypatch):
+    source = tmp_path / "dpia.yaml"
+    source.write_text(yaml.safe_dump(SOURCE, allow_unicode=True), encoding="utf-8")
+    begrippen = tmp_path / "begrippenkader.yaml"
+    begrippen.write_text(yaml.safe_dump(BEGRIPPENKADER), encoding="utf-8")
+
+    parsed = []
+    safe_load = yaml.safe_load
+
+    def counting_safe_load(stream):
+        parsed.append(Path(getattr(stream, "name", "")).name)
+        return safe_load(stream)
+
+    monkeypatch.setattr(yaml, "safe_load", counting_safe_load)
+    monkeypatch.setattr(
+        sys,
+        "argv",
+        [
+            "run_all.py",
+            "--schema",
+            str(SCHEMA_PATH),
+            "--source",
+            str(source),
+            "--begrippen-yaml",
+            str(begrippen),
+            "--output-json",
+            str(tmp_path / "DPIA.json"),
+            "--output-md",
+            str(tmp_path / "DPIA.md"),
+        ],
+    )
+
+    with pytest.raises(SystemExit) as exit_info:
+        run_all.main()
+
+    assert exit_info.value.code == 0
+    assert parsed.count("dpia.yaml") == 1
+    output = json.loads((tmp_path / "DPIA.json").read_text(encoding="utf-8"))
+    assert "aiv-definition" in output["tasks"][0]["description"]
+    markdown = (tmp_path / "DPIA.md").read_text(encoding="utf-8")
+    assert "| 1 | Eerste taak | Over de DPIA |" in markdown
+
+
+def _write_manifest(tmp_path, assessments):
+    (tmp_path / "dpia.yaml").write_text(yaml.safe_dump(SOURCE), encoding="utf-8")
+    (tmp_path / "begrippenkader.yaml").write_text(yaml.safe_dump(BEGRIPPENKADER), encoding="utf-8")
+    manifest = tmp_path / "assessments.yaml"
+    manifest.write_text(yaml.safe_dump({"assessments": assessments}), encoding="utf-8")
+    return manifest
+
+
+def _manifest_entry(name, **extra):
+    return {
+        "name": name,
+        "source": "dpia.yaml",
+        "schema": str(SCHEMA_PATH),
+        "begrippenkader": "begrippenkader.yaml",
+        "output_json": f"generated/{name}.json",
+        **extra,
+    }
+
+
+OPTIONS = {
+    "skip_validation": False,
+    "jobs": 1,
+    "cache_dir": None,
+    "output_mode": "inline",
+    "inflections": False,
+    "tooltip_limits": (None, None, None),
+    "markdown": True,
+    "force": False,
+}
+
+
+def test_load_manifest_resolves_paths_and_rejects_unknown_keys(tmp_path):
+    manifest = _write_manifest(
+        tmp_path,
+        [_manifest_entry("DPIA", output_md="questions.md", definitions_once_per_page=True)],
+    )
+
+    [assessment] = run_all.load_manifest(manifest)
+    assert assessment.source == tmp_path / "dpia.yaml"
+    assert assessment.output_md == tmp_path / "questions.md"
+    assert assessment.once_per_page is True
+
+    manifest = _write_manifest(tmp_path, [_manifest_entry("DPIA", outptu_md="typo.md")])
+    with pytest.raises(ValueError, match="unknown keys"):
+        run_all.load_manifest(manifest)
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_batch_build_shares_term_index_and_reports_failures(tmp_path, monkeypatch, workers):
+    (tmp_path / "broken.yaml").write_text(yaml.safe_dump({"name": "Kapot"}), encoding="utf-8")
+    manifest = _write_manifest(
+        tmp_path,
+        [
+            _manifest_entry("DPIA"),
+            _manifest_entry("PreScan", definitions_once_per_page=True),
+            _manifest_entry("Broken", source="broken.yaml"),
+        ],
+    )
+    builds = []
+    from_begrippenkader = definition_enricher.TermIndex.from_begrippenkader
+
+    def counting_from_begrippenkader(*args):
+        builds.append(args)
+        return from_begrippenkader(*args)
+
+    monkeypatch.setattr(
+        definition_enricher.TermIndex, "from_begrippenkader", counting_from_begrippenkader
+    )
+    results = run_all.run_batch(
+        run_all.load_manifest(manifest), OPTIONS, workers, run_all.Path(run_all.__file__).parent
+    )
+
+    assert [(result["name"], result["ok"]) for result in results] == [
+        ("DPIA", True),
+        ("PreScan", True),
+        ("Broken", False),
+    ]
+    assert "Validation failed" in results[2]["error"]
+    assert len(builds) == 1
+    output = json.loads((tmp_path / "generated" / "DPIA.json").read_text(encoding="utf-8"))
+    assert "aiv-definition" in output["tasks"][0]["description"]
+
+
+def test_unchanged_assessment_is_skipped_until_inputs_change(tmp_path, monkeypatch, capsys):
+    manifest = _write_manifest(tmp_path, [_manifest_entry("DPIA", output_md="questions.md")])
+    [assessment] = run_all.load_manifest(manifest)
+    script_dir = run_all.Path(run_all.__file__).parent
+
+    def build(**options):
+        [result] = run_all.run_batch([assessment], {**OPTIONS, **options}, 1, script_dir)
+        assert result["ok"]
+        return result["skipped"]
+
+    assert build() is False
+    assert build() is True
+    assert build(force=True) is False
+    # Options that change the output change the fingerprint
+    assert build(output_mode="references") is False
+    assert build() is False
+
+    # So does a change to an input file or an output that was changed since
+    (tmp_path / "begrippenkader.yaml").write_text(
+        yaml.safe_dump({"definitions": [{"id": "taak", "term": "taak", "definition": "Werk"}]}),
+        encoding="utf-8",
+    )
+    assert build() is False
+    (tmp_path / "questions.md").write_text("Handmatig aangepast", encoding="utf-8")
+    assert build() is False
+    assert build() is True
+
+    fingerprint = run_all.assessment_fingerprint(assessment, OPTIONS)
+    monkeypatch.setattr(
+        sys, "argv", ["run_all.py", "--manifest", str(manifest), "--print-cache-key"]
+    )
+    with pytest.raises(SystemExit) as exit_info:
+        run_all.main()
+    assert exit_info.value.code == 0
+    assert capsys.readouterr().out.strip() == fingerprint
+    assert fingerprint != run_all.assessment_fingerprint(assessment, {**OPTIONS, "markdown": False})
+
+
+def test_pipeline_version_includes_the_jsonschema_version(monkeypatch):
+    monkeypatch.delitem(sys.modules, "jsonschema", raising=False)
+    version = run_all.pipeline_version()
+    assert "jsonschema" not in sys.modules
+
+    package_version = importlib.metadata.version
+    monkeypatch.setattr(
+        importlib.metadata,
+        "version",
+        lambda name: "0.0" if name == "jsonschema" else package_version(name),
+    )
+    assert run_all.pipeline_version() != version
+
+
+def test_rebuild_changed_only_rebuilds_affected_assessments(tmp_path):
+    (tmp_path / "prescan.yaml").write_text(yaml.safe_dump(SOURCE), encoding="utf-8")
+    manifest = _write_manifest(
+        tmp_path, [_manifest_entry("DPIA"), _manifest_entry("PreScan", source="prescan.yaml")]
+    )
+    assessments = run_all.load_manifest(manifest)
+    script_dir = run_all.Path(run_all.__file__).parent
+    options = {**OPTIONS, "cache_dir": tmp_path / "cache"}
+    run_all.run_batch(assessments, options, 1, script_dir)
+
+    source = tmp_path / "dpia.yaml"
+    source.write_text(
+        yaml.safe_dump({**SOURCE, "description": "Een gewijzigde DPIA."}), encoding="utf-8"
+    )
+    results = run_all.rebuild_changed(assessments, {source}, options, script_dir)
+
+    assert [(result["name"], result["skipped"]) for result in results] == [("DPIA", False)]
+    output = json.loads((tmp_path / "generated" / "DPIA.json").read_text(encoding="utf-8"))
+    assert output["description"].startswith("Een gewijzigde")
+    assert (
+        run_all.rebuild_changed(assessments, {tmp_path / "other.yaml"}, options, script_dir) == []
+    )
@@ -72,3 +72,17 @@ def test_validator_rejects_urn_violating_pattern(tmp_path):
 
     assert is_valid is False
     assert errors
+
+
+def test_validator_validates_already_loaded_data():
+    validator = SchemaValidator(REPO_ROOT)
+
+    is_valid, errors, data = validator.validate_data(VALID_SOURCE, SCHEMA_PATH, "mini.yaml")
+    assert is_valid is True, errors
+    assert data is VALID_SOURCE
+
+    broken = {key: value for key, value in VALID_SOURCE.items() if key != "tasks"}
+    is_valid, errors, _data = validator.validate_data(broken, SCHEMA_PATH, "mini.yaml")
+    assert is_valid is False
+    assert errors[0].startswith("Validation error in mini.yaml")
+    assert [result["success"] for result in validator.validation_results] == [True, False]
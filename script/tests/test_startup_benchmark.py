@@ -0,0 +1,36 @@
+"""Tests for the startup-time budget check.
+
+Covers:
+- parsing of ``-X importtime`` output, including the header and nesting,
+- the entry points import none of the deferred modules at startup. This
+  part of the budget does not depend on the speed of the machine.
+"""
+
+import pytest
+from startup_benchmark import DEFERRED_MODULES, ENTRY_POINTS, measure, parse_importtime
+
+IMPORTTIME_OUTPUT = """\
+import time: self [us] | cumulative | imported package
+import time:       120 |        120 |   _io
+import time:       300 |        450 |     json.decoder
+import time:       200 |        650 |   json
+import time:      1000 |       1770 | run_all
+Traceback lines and other output are ignored
+"""
+
+
+def test_parse_importtime():
+    entries = parse_importtime(IMPORTTIME_OUTPUT)
+
+    assert [entry.module for entry in entries] == ["_io", "json.decoder", "json", "run_all"]
+    assert [entry.depth for entry in entries] == [1, 2, 1, 0]
+    assert entries[-1].self_us == 1000
+    assert entries[-1].cumulative_us == 1770
+
+
+@pytest.mark.parametrize("module", ENTRY_POINTS)
+def test_entry_points_defer_heavy_imports(module):
+    imported = {entry.module for entry in measure(module)}
+
+    assert module in imported
+    assert imported.isdisjoint(DEFERRED_MODULES)
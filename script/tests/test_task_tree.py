@@ -0,0 +1,132 @@
+"""Tests for the single-pass task tree traversal.
+
+Covers:
+- walk_document visits every task once, depth first, with its level, page
+  and parent, and calls the visitors in registration order,
+- TaskIndexVisitor indexes tasks by id and dependencies by referenced task,
+- TaskRowVisitor produces the questions table rows and skips tasks without
+  an id together with their subtasks,
+- enriching in place during the walk gives the same document as the
+  page-by-page enrichment, while earlier visitors see the source text.
+"""
+
+import copy
+
+from definition_enricher import TermIndex, create_term_map, process_dpia
+from generate_md_table_tasks import TaskRowVisitor
+from task_tree import TaskIndexVisitor, TaskVisitor, walk_document
+
+DOCUMENT = {
+    "name": "Mini DPIA",
+    "description": "Over de dpia",
+    "tasks": [
+        {
+            "id": "1",
+            "description": "Deel over de dpia",
+            "tasks": [
+                {
+                    "id": "1.1",
+                    "task": "Welke dpia?",
+                    "type": ["radio_option"],
+                    "options": [{"value": "Nieuwe dpia"}, {"value": "Bestaande dpia"}],
+                },
+                {
+                    "id": "1.2",
+                    "task": "Toelichting",
+                    "dependencies": [
+                        {
+                            "type": "conditional",
+                            "condition": {
+                                "id": "1.1",
+                                "operator": "contains",
+                                "value": "Bestaande dpia",
+                                "option_index": 1,
+                            },
+                        }
+                    ],
+                    "tasks": [{"task": "Zonder id", "tasks": [{"id": "1.2.1.1", "task": "Diep"}]}],
+                },
+            ],
+        },
+        {"id": "2", "description": "Tweede deel", "tasks": [{"id": "2.1", "task": "Nog een dpia"}]},
+    ],
+}
+
+
+class _Recorder(TaskVisitor):
+    def __init__(self, name, events):
+        self.name = name
+        self.events = events
+
+    def enter_task(self, task, context):
+        parent = context.parent.get("id") if context.parent else None
+        self.events.append((self.name, task.get("id"), context.level, context.page, parent))
+
+    def leave_task(self, task, context):
+        self.events.append((self.name, "leave", task.get("id")))
+
+
+def test_walk_document_visits_every_task_once_in_order():
+    events = []
+    walk_document(DOCUMENT, [_Recorder("a", events), _Recorder("b", events)])
+
+    entered = [event[1:] for event in events if event[0] == "a" and event[1] != "leave"]
+    assert entered == [
+        ("1", 0, 0, None),
+        ("1.1", 1, 0, "1"),
+        ("1.2", 1, 0, "1"),
+        (None, 2, 0, "1.2"),
+        ("1.2.1.1", 3, 0, None),
+        ("2", 0, 1, None),
+        ("2.1", 1, 1, "2"),
+    ]
+    assert events[:4] == [
+        ("a", "1", 0, 0, None),
+        ("b", "1", 0, 0, None),
+        ("a", "1.1", 1, 0, "1"),
+        ("b", "1.1", 1, 0, "1"),
+    ]
+    assert events.index(("a", "leave", "1.2.1.1")) < events.index(("a", "leave", "1.2"))
+
+
+def test_task_index_visitor_indexes_ids_and_dependencies():
+    index = TaskIndexVisitor()
+    walk_document(DOCUMENT, [index])
+
+    assert index.tasks["1.1"] is DOCUMENT["tasks"][0]["tasks"][0]
+    assert [task["id"] for task, _dependency in index.dependents["1.1"]] == ["1.2"]
+
+
+def test_task_row_visitor_skips_tasks_without_id_and_their_subtasks():
+    rows = TaskRowVisitor()
+    walk_document(DOCUMENT, [rows])
+
+    assert [row["id"] for row in rows.rows] == ["1", "1.1", "1.2", "2", "2.1"]
+    row = rows.rows[1]
+    # The top-level task has no text, so its subtasks start a new path
+    assert (row["text"], row["depth"], row["options"]) == (
+        "Welke dpia?",
+        0,
+        "Nieuwe dpia; Bestaande dpia",
+    )
+    assert rows.rows[2]["related"] == "Show if 1.1"
+
+
+def test_enrichment_in_the_walk_matches_page_by_page_enrichment():
+    term_index = TermIndex(
+        create_term_map(
+            {"definitions": [{"id": "dpia", "term": "dpia", "definition": "een beoordeling"}]}
+        )
+    )
+
+    for once_per_page in (False, True):
+        expected = process_dpia(copy.deepcopy(DOCUMENT), term_index, once_per_page, jobs=2)
+        rows = TaskRowVisitor()
+        fused = process_dpia(
+            copy.deepcopy(DOCUMENT), term_index, once_per_page, in_place=True, visitors=[rows]
+        )
+
+        assert fused == expected
+        condition = fused["tasks"][0]["tasks"][1]["dependencies"][0]["condition"]
+        assert condition["value"] == fused["tasks"][0]["tasks"][0]["options"][1]["value"]
+        assert rows.rows[1]["options"] == "Nieuwe dpia; Bestaande dpia"